@@ -0,0 +1,90 @@
+"""Recall@k and queries/sec of the ANN indexes against exact search.
+
+The corpus is a synthetic mixture of gaussian clusters, which is closer to
+sentence embeddings than uniform noise.
+
+    python -m benchmarks.bench_ann --vectors 200000 --dim 768 --top-k 100
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from src.agentic_rag.vector_stores.numpy_vector_store import NumpyVectorStore
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.6 * rng.standard_normal((n, dim), dtype=np.float32)
+
+
+def run(store: NumpyVectorStore, queries: np.ndarray, k: int) -> List[List[str]]:
+    return [
+        store.query(VectorStoreQuery(query_embedding=q.tolist(), similarity_top_k=k)).ids
+        for q in queries
+    ]
+
+
+def timed(fn: Callable[[], List[List[str]]], n: int) -> tuple:
+    start = time.perf_counter()
+    result = fn()
+    return result, n / (time.perf_counter() - start)
+
+
+def recall(exact: List[List[str]], approx: List[List[str]]) -> float:
+    return float(np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(exact, approx)]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--ef", type=int, nargs="+", default=[100, 200, 400])
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.vectors + args.queries, args.dim, args.clusters)
+    queries, vectors = vectors[: args.queries], vectors[args.queries :]
+
+    with tempfile.TemporaryDirectory() as persist_dir:
+        store = NumpyVectorStore()
+        store.add([TextNode(text="", id_=str(i), embedding=v.tolist()) for i, v in enumerate(vectors)])
+        store.persist(os.path.join(persist_dir, "default__vector_store.json"))
+        store = NumpyVectorStore.from_persist_dir(persist_dir)
+
+        exact, qps = timed(lambda: run(store, queries, args.top_k), len(queries))
+        print(f"exact                recall@{args.top_k}=1.000  qps={qps:9.1f}")
+
+        start = time.perf_counter()
+        store.build_ann("ivf")
+        print(f"ivf built in {time.perf_counter() - start:.1f}s")
+        for nprobe in args.nprobe:
+            store.nprobe = nprobe
+            approx, qps = timed(lambda: run(store, queries, args.top_k), len(queries))
+            print(f"ivf  nprobe={nprobe:<4d}     recall@{args.top_k}={recall(exact, approx):.3f}  qps={qps:9.1f}")
+
+        try:
+            start = time.perf_counter()
+            store.build_ann("hnsw")
+        except ImportError as exc:
+            print(f"skipping hnsw: {exc}")
+            return
+        print(f"hnsw built in {time.perf_counter() - start:.1f}s")
+        for ef in args.ef:
+            store.ef = ef
+            approx, qps = timed(lambda: run(store, queries, args.top_k), len(queries))
+            print(f"hnsw ef={ef:<4d}         recall@{args.top_k}={recall(exact, approx):.3f}  qps={qps:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Query embedding latency under N concurrent async callers.
+
+Compares the blocking path (what ``_aget_query_embedding`` used to do, which
+serializes every caller on the event loop) with the native async path.
+
+    python -m benchmarks.bench_async_embedding --concurrency 1 8 32 128
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+from benchmarks.fake_servers import FakeEmbeddingServer
+from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run(n: int, embed: Callable[[str], Awaitable[List[float]]]) -> None:
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        start = time.perf_counter()
+        await embed(f"what is the bias variance tradeoff? #{i}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - start
+    print(
+        f"  n={n:<4d} wall={wall * 1000:8.1f}ms "
+        f"p50={statistics.median(latencies) * 1000:8.1f}ms "
+        f"p95={percentile(latencies, 0.95) * 1000:8.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    with FakeEmbeddingServer(latency_ms=args.latency_ms) as server:
+        embed_model = HuggingFaceEmbedding(
+            embed_dim=768,
+            server_url=server.url,
+            max_concurrency=args.max_concurrency,
+            pool_maxsize=args.max_concurrency,
+        )
+
+        async def blocking(text: str) -> List[float]:
+            return embed_model._get_vector(text)
+
+        async def bench() -> None:
+            print("blocking")
+            for n in args.concurrency:
+                await run(n, blocking)
+            print("async")
+            for n in args.concurrency:
+                await run(n, embed_model.aget_query_embedding)
+            await embed_model.aclose()
+
+        asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
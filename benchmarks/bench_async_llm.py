@@ -0,0 +1,48 @@
+"""Completion latency under N concurrent async callers.
+
+Compares the sync ``complete`` run in the default thread pool (one thread per
+request) with the native ``acomplete`` on the shared async client.
+
+    python -m benchmarks.bench_async_llm --concurrency 1 8 32 128
+"""
+import argparse
+import asyncio
+
+from benchmarks.bench_async_embedding import run
+from benchmarks.fake_servers import FakeLLMServer
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--ttft-ms", type=float, default=100.0)
+    parser.add_argument("--token-ms", type=float, default=2.0)
+    parser.add_argument("--tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    with FakeLLMServer(ttft_ms=args.ttft_ms, token_ms=args.token_ms, tokens=args.tokens) as server:
+        llm = HuggingFaceLLM(
+            server_url=server.url,
+            max_concurrency=args.max_concurrency,
+            pool_maxsize=args.max_concurrency,
+        )
+
+        async def threaded(prompt: str) -> None:
+            await asyncio.get_running_loop().run_in_executor(None, llm.complete, prompt)
+
+        async def bench() -> None:
+            print("threaded")
+            for n in args.concurrency:
+                await run(n, threaded)
+            print("async")
+            for n in args.concurrency:
+                await run(n, llm.acomplete)
+            await llm.aclose()
+
+        asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
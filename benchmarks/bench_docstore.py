@@ -0,0 +1,88 @@
+"""Size and load time of the JSON docstore vs. the sentence docstore.
+
+The synthetic lecture notes of ``corpus`` are split by the indexer's
+``SentenceWindowNodeParser`` (no embeddings needed: only the docstore is
+measured), persisted as ``docstore.json`` and migrated with
+``sentence_store.migrate``. For both stores: the bytes on disk, the time to
+load them, the Python heap they hold after loading (``tracemalloc``; the
+memory-mapped arrays of the sentence store are page cache, shared between
+processes and not counted) and the time to fetch the 20 nodes of a query.
+
+    python -m benchmarks.bench_docstore --documents 1000
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+from llama_index.core import Document
+from llama_index.core.storage.docstore.simple_docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+
+from benchmarks.bench_async_embedding import percentile
+from benchmarks.corpus import synthetic_documents
+from src.agentic_rag.indexer.indexer import sentence_node_parser
+from src.agentic_rag.vector_stores.sentence_store import SentenceDocumentStore, migrate
+
+
+def measure(name: str, size: int, load: Callable[[], BaseDocumentStore], node_ids: List[str],
+            queries: int, seed: int) -> None:
+    seconds = []
+    for _ in range(5):
+        gc.collect()
+        start = time.perf_counter()
+        load()
+        seconds.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    store = load()
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    rng = random.Random(seed)
+    fetch = []
+    for _ in range(queries):
+        batch = rng.sample(node_ids, 20)
+        start = time.perf_counter()
+        store.get_nodes(batch)
+        fetch.append(time.perf_counter() - start)
+    print(f"  {name:9s} disk={size / 1e6:7.2f}MB  load={min(seconds) * 1000:8.1f}ms  "
+          f"heap={heap / 1e6:7.2f}MB  "
+          f"fetch 20 nodes p50={percentile(fetch, 0.5) * 1000:5.2f}ms p95={percentile(fetch, 0.95) * 1000:5.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    documents = [
+        Document(text=text, metadata={"file_name": name}, id_=f"{name}_part_0")
+        for name, text in synthetic_documents(args.documents, seed=args.seed)
+    ]
+    nodes = sentence_node_parser.get_nodes_from_documents(documents)
+    node_ids = [node.node_id for node in nodes]
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "docstore.json")
+        simple = SimpleDocumentStore()
+        simple.add_documents(nodes)
+        simple.persist(json_path)
+        del simple
+
+        start = time.perf_counter()
+        old_size, new_size = migrate(tmp, keep_json=True)
+        print(f"{args.documents} documents, {len(nodes)} nodes; migrated in {time.perf_counter() - start:.1f}s")
+        measure("json", old_size, lambda: SimpleDocumentStore.from_persist_path(json_path + ".bak"),
+                node_ids, args.queries, args.seed)
+        measure("sentences", new_size, lambda: SentenceDocumentStore.from_persist_dir(tmp),
+                node_ids, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Embedding throughput (texts/sec) versus batch size against the fake server.
+
+    python -m benchmarks.bench_embedding_batch --texts 2000 --batch-sizes 1 8 32 128
+"""
+import argparse
+import time
+
+from benchmarks.fake_servers import FakeEmbeddingServer
+from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--per-item-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    texts = [f"sentence number {i} about gradient boosting" for i in range(args.texts)]
+    with FakeEmbeddingServer(
+        latency_ms=args.latency_ms, per_item_ms=args.per_item_ms
+    ) as server:
+        # the per-text path is the old behaviour: one POST per sentence
+        embed_model = HuggingFaceEmbedding(embed_dim=768, server_url=server.url)
+        start = time.perf_counter()
+        for text in texts[: min(len(texts), 200)]:
+            embed_model.get_text_embedding(text)
+        elapsed = time.perf_counter() - start
+        print(f"unbatched   {min(len(texts), 200) / elapsed:10.1f} texts/sec")
+
+        for batch_size in args.batch_sizes:
+            embed_model = HuggingFaceEmbedding(
+                embed_dim=768, server_url=server.url, embed_batch_size=batch_size
+            )
+            start = time.perf_counter()
+            embed_model.get_text_embedding_batch(texts)
+            elapsed = time.perf_counter() - start
+            print(f"batch={batch_size:<5d} {len(texts) / elapsed:10.1f} texts/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Latency of running code agent snippets cold vs. in the warm executor pool.
+
+``cold`` starts a fresh interpreter per snippet that imports what the snippet
+needs, ``warm`` sends it to an ``ExecutorPool`` whose workers imported numpy
+and scikit-learn at startup. ``--concurrency`` runs several snippets at once
+(warm: over ``--workers`` processes).
+
+    python -m benchmarks.bench_executor --runs 20 --workers 2
+"""
+import argparse
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from benchmarks.bench_async_embedding import percentile
+from src.agentic_rag.ml_agent.executor import ExecutorPool
+
+SNIPPETS = (
+    "X, y = datasets.load_iris(return_X_y=True)\n"
+    "from sklearn.linear_model import LogisticRegression\n"
+    "LogisticRegression(max_iter=500).fit(X, y).score(X, y)",
+    "X, y = datasets.load_digits(return_X_y=True)\n"
+    "from sklearn.decomposition import PCA\n"
+    "PCA(n_components=10).fit(X).explained_variance_ratio_.sum()",
+    "X, y = datasets.load_wine(return_X_y=True)\n"
+    "from sklearn.model_selection import cross_val_score\n"
+    "from sklearn.tree import DecisionTreeClassifier\n"
+    "print(cross_val_score(DecisionTreeClassifier(max_depth=3), X, y, cv=5).mean())",
+    "X, y = datasets.make_classification(n_samples=500, random_state=0)\n"
+    "from sklearn.ensemble import RandomForestClassifier\n"
+    "RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y).score(X, y)",
+)
+COLD_PRELUDE = "import numpy as np\nimport sklearn\nfrom sklearn import datasets\n"
+
+
+def cold(code: str) -> None:
+    # the last expression is not printed, which only favours ``cold``
+    subprocess.run([sys.executable, "-c", COLD_PRELUDE + code], check=True, capture_output=True)
+
+
+def run(n: int, runs: int, execute: Callable[[str], None]) -> str:
+    def one(i: int) -> float:
+        start = time.perf_counter()
+        execute(SNIPPETS[i % len(SNIPPETS)])
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        latencies: List[float] = list(pool.map(one, range(runs)))
+    wall = time.perf_counter() - start
+    return (
+        f"n={n:<3d} snippets/s={runs / wall:7.2f} "
+        f"p50={percentile(latencies, 0.5) * 1000:8.1f}ms "
+        f"p95={percentile(latencies, 0.95) * 1000:8.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-runs", type=int, default=50)
+    args = parser.parse_args()
+
+    print("cold")
+    for n in args.concurrency:
+        print("  " + run(n, args.runs, cold))
+
+    with ExecutorPool(workers=args.workers, max_runs=args.max_runs) as pool:
+        start = time.perf_counter()
+        pool.warm_up()
+        print(f"warm ({args.workers} workers ready in {time.perf_counter() - start:.1f}s)")
+
+        def warm(code: str) -> None:
+            result = pool.run(code)
+            if not result.ok:
+                raise RuntimeError(result.error)
+
+        for n in args.concurrency:
+            print("  " + run(n, args.runs, warm))
+        print("  " + " ".join(f"{k}={v:g}" for k, v in pool.stats().items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Recall and latency of dense-only vs. hybrid (dense + BM25) retrieval.
+
+The synthetic lecture notes of ``corpus`` get one extra sentence per
+(estimator, hyperparameter) pair, e.g. "The max_depth parameter of
+GradientBoostingClassifier ...", and every question asks about one pair, so
+its answer is a single known sentence. The corpus is indexed with
+``build_index`` (which also builds the BM25 index) against the bag of words
+fake embedding server in ``subword`` mode: like a wordpiece model it sees
+``GradientBoostingClassifier`` as gradient, boosting, classifier, close to
+every other gradient boosting sentence. The reranker is the simulated
+cross-encoder of ``bench_rerank``.
+
+For each configuration: the recall of the answer among the reranker
+candidates (after window replacement and candidate filtering), the number
+of candidates the cross-encoder scores, and the retrieval latency
+including the rerank.
+
+    python -m benchmarks.bench_hybrid --documents 200 --queries 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import List, Tuple
+
+from llama_index.core import Settings
+from llama_index.core.llms import MockLLM
+
+from benchmarks.bench_async_embedding import percentile
+from benchmarks.bench_rerank import fake_scorer
+from benchmarks.corpus import TOPICS, synthetic_documents
+from benchmarks.fake_servers import FakeEmbeddingServer
+from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+from src.agentic_rag.indexer.indexer import build_index
+from src.agentic_rag.retrieval import registry
+from src.agentic_rag.retrieval.rerank import RerankService
+from src.agentic_rag.retrieval.retrieval import Engine
+
+ESTIMATORS = (
+    "GradientBoostingClassifier", "HistGradientBoostingRegressor", "RandomForestClassifier",
+    "ExtraTreesRegressor", "LogisticRegression", "SGDClassifier", "KMeans", "MiniBatchKMeans",
+    "SVC", "LinearSVC", "DecisionTreeClassifier", "MLPClassifier", "Ridge", "Lasso", "PCA",
+)
+PARAMETERS = (
+    "n_estimators", "max_depth", "learning_rate", "min_samples_leaf", "max_features", "alpha",
+    "l1_ratio", "n_clusters", "max_iter", "tol", "n_components", "class_weight", "subsample",
+)
+FACT = "The {parameter} parameter of {estimator} is set to {value} in the lab {i}."
+QUESTION = "What does {parameter} control in {estimator}?"
+CONFIGS = (
+    ("dense top-100", dict(similarity_top_k=100)),
+    ("dense top-20", dict(similarity_top_k=20)),
+    ("dense top-5", dict(similarity_top_k=5)),
+    ("hybrid 20+20", dict(similarity_top_k=20, hybrid=True, sparse_top_k=20)),
+    ("hybrid 10+10", dict(similarity_top_k=10, hybrid=True, sparse_top_k=10)),
+    ("hybrid 5+5", dict(similarity_top_k=5, hybrid=True, sparse_top_k=5)),
+)
+
+
+def write_corpus(root: str, documents: int, seed: int) -> List[Tuple[str, str]]:
+    """Write the notes with the facts; return (question, fact) pairs."""
+    rng = random.Random(seed)
+    pairs = [(estimator, parameter) for estimator in ESTIMATORS for parameter in PARAMETERS]
+    rng.shuffle(pairs)
+    facts: List[Tuple[str, str]] = []
+    os.makedirs(root, exist_ok=True)
+    for i, (name, text) in enumerate(synthetic_documents(documents, seed=seed)):
+        if i < len(pairs):
+            estimator, parameter = pairs[i]
+            fact = FACT.format(parameter=parameter, estimator=estimator, value=rng.randint(1, 9), i=i)
+            text = f"{text}\n\n{fact} It matters for {TOPICS[i % len(TOPICS)]}."
+            facts.append((QUESTION.format(parameter=parameter, estimator=estimator), fact))
+        with open(os.path.join(root, name), "w") as f:
+            f.write(text)
+    return facts
+
+
+async def evaluate(engine: Engine, facts: List[Tuple[str, str]]) -> str:
+    hits = 0
+    candidates: List[int] = []
+    seconds: List[float] = []
+    postprocessors = engine.node_postprocessors
+    for question, fact in facts:
+        start = time.perf_counter()
+        query_bundle, _, _ = await engine.aretrieve(question)
+        seconds.append(time.perf_counter() - start)
+        # the reranker input: the nodes after window replacement and filtering
+        nodes = await engine.sentence_window_engine.retriever.aretrieve(query_bundle)
+        for postprocessor in postprocessors[:2]:
+            nodes = postprocessor.postprocess_nodes(nodes, query_bundle=query_bundle)
+        candidates.append(len(nodes))
+        hits += any(fact in node.node.get_content() for node in nodes)
+    n = len(facts)
+    return (
+        f"recall={hits / n:6.1%}  "
+        f"candidates={sum(candidates) / n:5.1f}  "
+        f"p50={percentile(seconds, 0.5) * 1000:6.1f}ms p95={percentile(seconds, 0.95) * 1000:6.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--embed-dim", type=int, default=256)
+    parser.add_argument("--rerank-call-ms", type=float, default=20.0)
+    parser.add_argument("--rerank-pair-ms", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with FakeEmbeddingServer(dim=args.embed_dim, latency_ms=5, per_item_ms=0.05, mode="subword") as embeddings, \
+            tempfile.TemporaryDirectory() as tmp:
+        Settings.embed_model = HuggingFaceEmbedding(embed_dim=args.embed_dim, server_url=embeddings.url)
+        Settings.llm = MockLLM(max_tokens=16)
+        root, persist_dir = os.path.join(tmp, "corpus"), os.path.join(tmp, "index")
+        facts = write_corpus(root, args.documents, args.seed)[: args.queries]
+        start = time.perf_counter()
+        build_index(root, persist_dir, embed_model=Settings.embed_model, required_exts=(".txt",),
+                    checkpoint_every=args.documents, vector_store="numpy")
+        seconds = time.perf_counter() - start
+        bm25_bytes = sum(
+            os.path.getsize(os.path.join(persist_dir, name)) for name in os.listdir(persist_dir)
+            if name.startswith("bm25")
+        )
+        stats = registry.get_bm25(persist_dir).stats()
+        print(f"indexed {args.documents} documents in {seconds:.1f}s; BM25 index "
+              + " ".join(f"{k}={v}" for k, v in stats.items()) + f", {bm25_bytes / 1e6:.2f}MB")
+
+        model = "fake-cross-encoder"
+        registry.set_rerank_service(
+            RerankService(fake_scorer(args.rerank_call_ms, args.rerank_pair_ms), cache_size=0), model=model)
+        print(f"{len(facts)} questions on one exact sentence each")
+        for name, kwargs in CONFIGS:
+            engine = Engine(persist_dir, rerank_model=model, **kwargs)
+            asyncio.run(engine.aretrieve("warm up"))
+            print(f"  {name:14s} " + asyncio.run(evaluate(engine, facts)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Completion throughput versus the client-side batch window.
+
+``--concurrency`` threads call ``HuggingFaceLLM.complete`` against a fake
+server with one GPU slot. Window 0 sends every prompt on its own to
+``/llm_complete``; larger windows coalesce prompts into
+``/llm_complete_batch`` requests. ``--duplicates`` is the share of prompts
+repeating an earlier one, which in-flight deduplication answers for free.
+
+    python -m benchmarks.bench_llm_batching --windows 0 2 5 10 20 50
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from benchmarks.bench_async_embedding import percentile
+from benchmarks.fake_servers import FakeLLMServer
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5, 10, 20, 50])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--prompts", type=int, default=256)
+    parser.add_argument("--duplicates", type=float, default=0.1)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--ttft-ms", type=float, default=50.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--tokens", type=int, default=16)
+    parser.add_argument("--batch-step-cost", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    prompts: List[str] = []
+    for i in range(args.prompts):
+        if prompts and rng.random() < args.duplicates:
+            prompts.append(rng.choice(prompts))
+        else:
+            prompts.append(f"What does regularization do to model #{i}?")
+
+    for window in args.windows:
+        with FakeLLMServer(
+            ttft_ms=args.ttft_ms, token_ms=args.token_ms, tokens=args.tokens,
+            gpu_slots=1, batch_step_cost=args.batch_step_cost,
+        ) as server:
+            llm = HuggingFaceLLM(
+                server_url=server.url,
+                batch_window_ms=window,
+                max_batch_size=args.max_batch_size,
+                pool_maxsize=args.concurrency,
+            )
+
+            def one(prompt: str) -> float:
+                start = time.perf_counter()
+                llm.complete(prompt)
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                latencies = list(pool.map(one, prompts))
+            wall = time.perf_counter() - start
+            batch_sizes = server.batch_sizes or [1]
+            print(
+                f"window={window:5.1f}ms prompts/s={len(prompts) / wall:7.1f} "
+                f"p50={percentile(latencies, 0.5) * 1000:8.1f}ms "
+                f"p95={percentile(latencies, 0.95) * 1000:8.1f}ms "
+                f"requests={server.requests:4d} "
+                f"mean_batch={sum(batch_sizes) / len(batch_sizes):5.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
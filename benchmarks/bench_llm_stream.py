@@ -0,0 +1,67 @@
+"""Time to first token and end-to-end latency of ``HuggingFaceLLM``.
+
+``complete`` waits for the whole answer, ``stream_complete`` yields tokens as
+the fake server generates them (SSE and JSON lines framing).
+
+    python -m benchmarks.bench_llm_stream --ttft-ms 200 --token-ms 20 --tokens 64
+"""
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+from benchmarks.bench_async_embedding import percentile
+from benchmarks.fake_servers import FakeLLMServer
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+
+PROMPT = "Explain the bias variance tradeoff of a decision tree in two sentences."
+
+
+def measure(call: Callable[[str], Tuple[float, float]], runs: int) -> str:
+    ttfts: List[float] = []
+    totals: List[float] = []
+    for i in range(runs):
+        ttft, total = call(f"{PROMPT} #{i}")
+        ttfts.append(ttft)
+        totals.append(total)
+    return (
+        f"ttft p50={percentile(ttfts, 0.5) * 1000:8.1f}ms p95={percentile(ttfts, 0.95) * 1000:8.1f}ms  "
+        f"total p50={percentile(totals, 0.5) * 1000:8.1f}ms p95={percentile(totals, 0.95) * 1000:8.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    for stream_format in ("sse", "jsonl"):
+        with FakeLLMServer(
+            ttft_ms=args.ttft_ms, token_ms=args.token_ms, tokens=args.tokens,
+            stream_format=stream_format,
+        ) as server:
+            llm = HuggingFaceLLM(server_url=server.url)
+
+            def complete(prompt: str) -> Tuple[float, float]:
+                start = time.perf_counter()
+                llm.complete(prompt)
+                total = time.perf_counter() - start
+                return total, total
+
+            def stream(prompt: str) -> Tuple[float, float]:
+                start = time.perf_counter()
+                first = None
+                for _ in llm.stream_complete(prompt):
+                    if first is None:
+                        first = time.perf_counter() - start
+                return first, time.perf_counter() - start
+
+            if stream_format == "sse":
+                print(f"complete       {measure(complete, args.runs)}")
+            print(f"stream ({stream_format:5s}) {measure(stream, args.runs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Memory, latency and recall of float16/int8 numpy vector stores.
+
+Every configuration is compared with the exact float32 store on the
+clustered synthetic corpus of ``bench_ann``. ``scan`` is the matrix (and
+int8 scales) a full-scan query reads, i.e. the memory that must stay
+resident to serve at full speed; ``disk`` includes the float32 copy that
+``keep_float32`` stores for rescoring, of which a query reads only its
+``rescore * k`` candidate rows.
+
+    python -m benchmarks.bench_quantization --vectors 100000 --dim 768
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from llama_index.core.schema import TextNode
+
+from benchmarks.bench_ann import recall, run, synthetic_corpus
+from benchmarks.bench_vector_store import dir_size
+from src.agentic_rag.vector_stores.numpy_vector_store import (
+    SCALES_FILENAME,
+    VECTORS_FILENAME,
+    NumpyVectorStore,
+)
+
+CONFIGS = (
+    ("float32", dict(dtype="float32")),
+    ("float16", dict(dtype="float16")),
+    ("float16+rescore", dict(dtype="float16", keep_float32=True)),
+    ("int8", dict(dtype="int8")),
+    ("int8+rescore", dict(dtype="int8", keep_float32=True)),
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--rescore", type=int, default=4, help="candidates per result rescored")
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.vectors + args.queries, args.dim, args.clusters)
+    queries, vectors = vectors[: args.queries], vectors[args.queries :]
+    exact = {}
+    print(f"{args.vectors} vectors of dim {args.dim}, {args.queries} queries")
+    for name, kwargs in CONFIGS:
+        with tempfile.TemporaryDirectory() as persist_dir:
+            store = NumpyVectorStore(**kwargs)
+            # nodes in batches: 768 Python floats per node add up
+            for start in range(0, len(vectors), 10_000):
+                store.add([
+                    TextNode(text="", id_=f"node-{i}", embedding=vector.tolist())
+                    for i, vector in enumerate(vectors[start:start + 10_000], start)
+                ])
+            store.persist(os.path.join(persist_dir, "default__vector_store.json"))
+            store = NumpyVectorStore.from_persist_dir(persist_dir, rescore=args.rescore)
+            scan = sum(
+                os.path.getsize(os.path.join(persist_dir, filename))
+                for filename in (VECTORS_FILENAME, SCALES_FILENAME)
+                if os.path.exists(os.path.join(persist_dir, filename))
+            )
+            line = f"  {name:16s} scan={scan / 2**20:7.1f}MiB disk={dir_size(persist_dir) / 2**20:7.1f}MiB"
+            for k in args.top_k:
+                run(store, queries[:5], k)
+                start = time.perf_counter()
+                ids = run(store, queries, k)
+                seconds = (time.perf_counter() - start) / len(queries)
+                exact.setdefault(k, ids)
+                line += f"  recall@{k}={recall(exact[k], ids):.4f} {seconds * 1000:6.2f}ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
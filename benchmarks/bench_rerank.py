@@ -0,0 +1,108 @@
+"""Rerank latency per query under N concurrent requests.
+
+Each request reranks ``--candidates`` passages. ``inline`` scores every
+request with its own model call (what ``SentenceTransformerRerank`` does),
+``batched`` goes through ``RerankService`` and ``cached`` repeats a small set
+of questions so most pairs come from the score cache.
+
+By default the cross-encoder is simulated by a scorer that holds one model
+lock for ``--call-ms`` plus ``--pair-ms`` per pair; ``--model`` (with
+``--backend`` / ``--quantize``) measures a real one instead.
+
+    python -m benchmarks.bench_rerank --concurrency 1 4 16 64
+    python -m benchmarks.bench_rerank --model BAAI/bge-reranker-base --backend onnx --quantize
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, Tuple
+
+from benchmarks.bench_async_embedding import percentile
+from src.agentic_rag.retrieval.rerank import RERANK_BACKENDS, RerankService
+
+PASSAGE = (
+    "Passage {i}: gradient boosting fits each new tree to the residuals of the "
+    "ensemble so far, and the learning rate shrinks the contribution of each tree."
+)
+
+
+def fake_scorer(call_ms: float, pair_ms: float) -> Callable[[List[Tuple[str, str]]], List[float]]:
+    lock = threading.Lock()
+
+    def score(pairs: List[Tuple[str, str]]) -> List[float]:
+        with lock:
+            time.sleep((call_ms + pair_ms * len(pairs)) / 1000.0)
+        return [float(len(passage) % 7) for _, passage in pairs]
+
+    return score
+
+
+def run(
+    n: int,
+    requests: int,
+    passages: Sequence[str],
+    rerank: Callable[[str, Sequence[str]], Sequence[float]],
+    distinct_queries: int,
+) -> str:
+    def one(i: int) -> float:
+        start = time.perf_counter()
+        rerank(f"how does boosting reduce bias? #{i % distinct_queries}", passages)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    return (
+        f"n={n:<4d} qps={requests / wall:8.1f} "
+        f"p50={percentile(latencies, 0.5) * 1000:8.1f}ms "
+        f"p95={percentile(latencies, 0.95) * 1000:8.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=0, help="per level, default 4 * concurrency (min 16)")
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--call-ms", type=float, default=15.0)
+    parser.add_argument("--pair-ms", type=float, default=1.0)
+    parser.add_argument("--max-batch-pairs", type=int, default=128)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--model")
+    parser.add_argument("--backend", choices=RERANK_BACKENDS, default="sentence-transformers")
+    parser.add_argument("--quantize", action="store_true")
+    args = parser.parse_args()
+
+    if args.model:
+        scorer = RerankService.from_model(
+            args.model, backend=args.backend, quantize=args.quantize, cache_size=0
+        ).scorer
+    else:
+        scorer = fake_scorer(args.call_ms, args.pair_ms)
+    passages = [PASSAGE.format(i=i) for i in range(args.candidates)]
+
+    def inline(query: str, passages: Sequence[str]) -> Sequence[float]:
+        return scorer([(query, passage) for passage in passages])
+
+    scenarios = [("inline", inline, None, 0)]
+    for name, cache_size in (("batched", 0), ("cached", 100_000)):
+        service = RerankService(
+            scorer, max_batch_pairs=args.max_batch_pairs, max_wait_ms=args.max_wait_ms,
+            cache_size=cache_size,
+        )
+        scenarios.append((name, service.score, service, cache_size))
+
+    for name, rerank, service, cache_size in scenarios:
+        print(name)
+        for n in args.concurrency:
+            requests = args.requests or max(16, 4 * n)
+            distinct = 4 if cache_size else requests
+            print("  " + run(n, requests, passages, rerank, distinct))
+        if service is not None:
+            print("  " + " ".join(f"{k}={v:g}" for k, v in service.stats().items()))
+
+
+if __name__ == "__main__":
+    main()
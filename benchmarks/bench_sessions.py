@@ -0,0 +1,107 @@
+"""History size and request-path latency of ``SessionStore`` per chat turn.
+
+``unbounded`` is what the chat engines did before: every turn sends the whole
+transcript. ``store`` sends the summary plus the recent turns within
+``--token-limit``; summaries are written in the background by the fake LLM
+server (``--ttft-ms`` per summary) while the student thinks (``--think-ms``),
+so the request path only pays for the SQLite writes. The second part spreads
+turns over ``--sessions`` sessions with at most ``--cached`` of them in memory.
+
+    python -m benchmarks.bench_sessions --turns 40 --sessions 5000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from llama_index.core import Settings
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+
+from benchmarks.bench_async_embedding import percentile
+from benchmarks.fake_servers import FakeLLMServer
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+from src.agentic_rag.memory.sessions import SessionStore
+
+QUESTION = "Turn {i}: how does {topic} behave when the training set is small and noisy?"
+ANSWER = (
+    "For {topic}, a small noisy training set raises variance: the model fits the noise. "
+    "Regularize, use cross-validation to pick the hyperparameters and prefer simpler models. "
+) * 3
+TOPICS = ("gradient boosting", "k-means", "logistic regression", "random forests", "PCA")
+
+
+def turn(i: int) -> List[ChatMessage]:
+    topic = TOPICS[i % len(TOPICS)]
+    return [
+        ChatMessage(role=MessageRole.USER, content=QUESTION.format(i=i, topic=topic)),
+        ChatMessage(role=MessageRole.ASSISTANT, content=ANSWER.format(topic=topic)),
+    ]
+
+
+def tokens(store: SessionStore, messages: List[ChatMessage]) -> int:
+    return sum(store.count_tokens(message.content or "") for message in messages)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--token-limit", type=int, default=1500)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--think-ms", type=float, default=100.0, help="pause between turns")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--session-turns", type=int, default=12_000)
+    parser.add_argument("--cached", type=int, default=500)
+    args = parser.parse_args()
+
+    with FakeLLMServer(ttft_ms=args.ttft_ms, token_ms=1, tokens=120) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        Settings.llm = HuggingFaceLLM(server_url=server.url)
+        store = SessionStore(os.path.join(tmp, "sessions.sqlite"), token_limit=args.token_limit)
+
+        transcript: List[ChatMessage] = []
+        step_seconds = []
+        print(f"{'turn':>5s} {'unbounded':>10s} {'store':>7s}  (history tokens sent)")
+        for i in range(args.turns):
+            start = time.perf_counter()
+            history = store.history("tutor")
+            for message in turn(i):
+                store.append("tutor", message)
+            step_seconds.append(time.perf_counter() - start)
+            if i % max(1, args.turns // 8) == 0 or i == args.turns - 1:
+                print(f"{i:5d} {tokens(store, transcript):10d} {tokens(store, history):7d}")
+            transcript.extend(turn(i))
+            time.sleep(args.think_ms / 1000.0)
+        store.wait()
+        print(
+            f"request path per turn: p50={percentile(step_seconds, 0.5) * 1000:.2f}ms "
+            f"p95={percentile(step_seconds, 0.95) * 1000:.2f}ms"
+        )
+        print("  " + " ".join(f"{k}={v:g}" for k, v in store.stats().items()))
+        store.close()
+
+        store = SessionStore(
+            os.path.join(tmp, "many.sqlite"), token_limit=args.token_limit,
+            max_cached_sessions=args.cached,
+        )
+        rng = random.Random(0)
+        start = time.perf_counter()
+        for i in range(args.session_turns):
+            session_id = f"student-{rng.randrange(args.sessions)}"
+            store.history(session_id)
+            for message in turn(i):
+                store.append(session_id, message)
+        seconds = time.perf_counter() - start
+        store.wait()
+        print(
+            f"{args.session_turns} turns over {args.sessions} sessions: "
+            f"{args.session_turns / seconds:.0f} turns/s, "
+            f"db {os.path.getsize(os.path.join(tmp, 'many.sqlite')) / 1e6:.1f}MB"
+        )
+        print("  " + " ".join(f"{k}={v:g}" for k, v in store.stats().items()))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
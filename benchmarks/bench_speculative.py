@@ -0,0 +1,151 @@
+"""End-to-end latency of ``Router.arun`` with and without speculative retrieval.
+
+Each labelled query of ``--data`` is routed by the LLM router and answered:
+``search`` queries are embedded, searched in a small numpy index, reranked
+and synthesized, the others get generated code. ``sequential`` routes first
+and retrieves afterwards, ``speculative`` retrieves while the router decides
+and cancels the retrieval of queries routed elsewhere.
+
+The embedding and LLM servers are the fake ones; the reranker is the
+simulated cross-encoder of ``bench_rerank``. The router LLM answers the
+labelled agent after ``--ttft-ms``; synthesis uses the mock LLM, so what is
+measured is routing plus retrieval.
+
+    python -m benchmarks.bench_speculative --concurrency 1 8
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.llms import MockLLM
+from llama_index.core.node_parser import SentenceWindowNodeParser
+from llama_index.core.schema import Document
+
+from benchmarks.bench_async_embedding import percentile
+from benchmarks.bench_rerank import fake_scorer
+from benchmarks.fake_servers import FakeEmbeddingServer, FakeLLMServer
+from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+from src.agentic_rag.ml_agent.fast_router import load_examples
+from src.agentic_rag.ml_agent.router import Router
+from src.agentic_rag.retrieval import registry
+from src.agentic_rag.retrieval.rerank import RerankService
+from src.agentic_rag.retrieval.retrieval import Engine
+from src.agentic_rag.vector_stores.storage import get_storage_context
+
+TOPICS = (
+    "gradient boosting", "random forests", "logistic regression", "the ROC curve",
+    "overfitting", "cross-validation", "naive Bayes", "k-means clustering",
+    "principal component analysis", "support vector machines",
+)
+SENTENCES = (
+    "{topic} is a standard technique in machine learning.",
+    "The main hyperparameters of {topic} control the bias and variance trade-off.",
+    "In practice {topic} is evaluated on a held-out test set.",
+    "A common pitfall with {topic} is leaking information from the test data.",
+    "Scikit-learn ships an implementation of {topic} with sensible defaults.",
+)
+
+
+def build_corpus(persist_dir: str, documents: int) -> None:
+    parser = SentenceWindowNodeParser.from_defaults(
+        window_size=3, window_metadata_key="window", original_text_metadata_key="original_text"
+    )
+    docs = []
+    for i in range(documents):
+        topic = TOPICS[i % len(TOPICS)]
+        text = " ".join(sentence.format(topic=topic) for sentence in SENTENCES)
+        docs.append(Document(text=f"Chapter {i}. {text}", doc_id=f"doc-{i}"))
+    storage_context = get_storage_context(persist_dir, "numpy")
+    index = VectorStoreIndex(
+        parser.get_nodes_from_documents(docs), storage_context=storage_context,
+        embed_model=Settings.embed_model,
+    )
+    index.storage_context.persist(persist_dir=persist_dir)
+
+
+async def run(router: Router, workload: List[Tuple[str, str]], n: int, speculative: bool) -> Dict[str, List[float]]:
+    semaphore = asyncio.Semaphore(n)
+    latencies: Dict[str, List[float]] = {}
+
+    async def one(query: str, label: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            result = await router.arun(query, speculative=speculative)
+            latencies.setdefault(result["agent"], []).append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(query, label) for query, label in workload))
+    return latencies
+
+
+def report(name: str, latencies: Dict[str, List[float]]) -> str:
+    everything = [s for seconds in latencies.values() for s in seconds]
+    parts = [f"{name:12s} all p50={percentile(everything, 0.5) * 1000:7.1f}ms "
+             f"p95={percentile(everything, 0.95) * 1000:7.1f}ms"]
+    for agent in sorted(latencies):
+        parts.append(f"{agent} p50={percentile(latencies[agent], 0.5) * 1000:7.1f}ms")
+    return "  ".join(parts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="benchmarks/data/router_queries.jsonl")
+    parser.add_argument("--queries", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--embed-dim", type=int, default=256)
+    parser.add_argument("--embed-ms", type=float, default=30.0)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--rerank-call-ms", type=float, default=40.0)
+    parser.add_argument("--rerank-pair-ms", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    labels = dict(examples)
+
+    def answer(prompt: str) -> str:
+        if "tools?" not in prompt:
+            return "print('hello')"
+        for query, agent in labels.items():
+            if query in prompt:
+                return json.dumps({"name": agent})
+        return json.dumps({"name": "search"})
+
+    rng = random.Random(args.seed)
+    workload = [rng.choice(examples) for _ in range(args.queries)]
+
+    with FakeEmbeddingServer(dim=args.embed_dim, latency_ms=args.embed_ms, per_item_ms=0.05, mode="bow") as embeddings, \
+            FakeLLMServer(ttft_ms=args.ttft_ms, token_ms=2, answer=answer) as llm_server, \
+            tempfile.TemporaryDirectory() as persist_dir:
+        Settings.embed_model = HuggingFaceEmbedding(embed_dim=args.embed_dim, server_url=embeddings.url)
+        Settings.llm = MockLLM(max_tokens=16)
+        build_corpus(persist_dir, args.documents)
+
+        model = "fake-cross-encoder"
+        service = RerankService(fake_scorer(args.rerank_call_ms, args.rerank_pair_ms), cache_size=0)
+        registry.set_rerank_service(service, model=model)
+        engine = Engine(persist_dir, similarity_top_k=20, rerank_model=model, debug=False)
+        router = Router(HuggingFaceLLM(server_url=llm_server.url, max_new_tokens=16), engine=engine)
+
+        async def bench() -> None:
+            await router.arun(workload[0][0])
+            print(f"{len(workload)} queries: " + ", ".join(
+                f"{agent} {sum(label == agent for _, label in workload)}" for agent in sorted(set(labels.values()))
+            ))
+            for n in args.concurrency:
+                print(f"concurrency {n}")
+                for name, speculative in (("sequential", False), ("speculative", True)):
+                    print("  " + report(name, await run(router, workload, n, speculative)))
+            print("  " + " ".join(f"{k}={v}" for k, v in router.speculations.items()))
+
+        asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
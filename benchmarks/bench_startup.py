@@ -0,0 +1,92 @@
+"""Cold-start time and resident memory of ``Engine``.
+
+Builds a synthetic index with the fake embedding server, then starts one
+fresh interpreter per scenario and reports the time to construct the engine,
+to warm it up, to answer the first retrieval, and the peak RSS.
+
+    python -m benchmarks.bench_startup --docs 200 --sentences 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.fake_servers import FakeEmbeddingServer
+
+CHILD = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+from llama_index.core import Settings
+from llama_index.core.llms import MockLLM
+from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+from src.agentic_rag.retrieval.retrieval import Engine
+db, url, scenario = sys.argv[1:4]
+Settings.embed_model = HuggingFaceEmbedding(embed_dim=768, server_url=url)
+Settings.llm = MockLLM()
+imported = time.perf_counter()
+engine = Engine(db, rerank_model=None, debug=False)
+constructed = time.perf_counter()
+if scenario == "eager":
+    engine.sentence_window_engine, engine.retriever_engine, engine.chat_engine
+else:
+    engine.warm_up()
+warmed = time.perf_counter()
+engine.retriever_engine.retrieve("how do decision trees split?")
+queried = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "construct_s": constructed - imported,
+    "warm_up_s": warmed - constructed,
+    "first_query_s": queried - warmed,
+    "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def build_corpus(root: str, docs: int, sentences: int) -> None:
+    for i in range(docs):
+        with open(os.path.join(root, f"doc{i}.txt"), "w") as f:
+            f.write(" ".join(
+                f"Document {i} sentence {j} explains a model parameter {i * j}."
+                for j in range(sentences)
+            ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--sentences", type=int, default=200)
+    args = parser.parse_args()
+
+    from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+    from src.agentic_rag.indexer.indexer import build_index
+
+    with tempfile.TemporaryDirectory() as tmp, FakeEmbeddingServer(
+        latency_ms=0, per_item_ms=0
+    ) as server:
+        root = os.path.join(tmp, "corpus")
+        os.makedirs(root)
+        build_corpus(root, args.docs, args.sentences)
+        for vector_store in ("simple", "numpy"):
+            db = os.path.join(tmp, vector_store)
+            build_index(
+                root, db,
+                embed_model=HuggingFaceEmbedding(embed_dim=768, server_url=server.url, embed_batch_size=256),
+                required_exts=[".txt"], vector_store=vector_store, checkpoint_every=10**9,
+            )
+            for scenario in ("eager", "lazy"):
+                output = subprocess.run(
+                    [sys.executable, "-c", CHILD, db, server.url, scenario],
+                    check=True, capture_output=True, text=True,
+                    env={**os.environ, "PYTHONPATH": os.getcwd()},
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{vector_store:7s} {scenario:6s} " + " ".join(
+                    f"{key}={value:.3f}" for key, value in result.items()
+                ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Cost of the stage timers, and where the time of a query goes.
+
+The first part times ``tracer.stage``, a ``TracingHandler`` event and the
+prompt token count of ``record_completion`` against an empty loop. The
+second answers ``--queries`` questions with ``Engine.aquery`` against the
+fake embedding and LLM servers and the simulated reranker of
+``bench_rerank``, then prints the mean of each stage from the
+``stage_seconds`` histogram the service exports.
+
+    python -m benchmarks.bench_tracing --queries 50
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from llama_index.core import Settings
+from llama_index.core.callbacks import CBEventType
+
+from benchmarks.bench_rerank import fake_scorer
+from benchmarks.bench_speculative import TOPICS, build_corpus
+from benchmarks.fake_servers import FakeEmbeddingServer, FakeLLMServer
+from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+from src.agentic_rag.retrieval import registry
+from src.agentic_rag.retrieval.rerank import RerankService
+from src.agentic_rag.retrieval.retrieval import Engine
+from src.utils.metrics import MetricsRegistry
+from src.utils.tracing import Tracer, TracingHandler, tracer
+
+
+def per_call(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def overhead(n: int) -> None:
+    scratch = Tracer(MetricsRegistry("scratch"))
+    handler = TracingHandler(scratch)
+    prompt = "The bias and variance trade-off of gradient boosting. " * 200
+
+    def stage() -> None:
+        with scratch.stage("x"):
+            pass
+
+    def event() -> None:
+        handler.on_event_end(CBEventType.LLM, event_id=handler.on_event_start(CBEventType.LLM, event_id="e"))
+
+    baseline = per_call(lambda: None, n)
+    print(f"stage timer        {(per_call(stage, n) - baseline) * 1e6:7.2f}us")
+    print(f"callback event     {(per_call(event, n) - baseline) * 1e6:7.2f}us")
+    print(f"completion record  {(per_call(lambda: scratch.record_completion(prompt, 32, 0.1), n // 100) - baseline) * 1e6:7.2f}us"
+          f"  ({len(Settings.tokenizer(prompt))} prompt tokens)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--embed-dim", type=int, default=256)
+    parser.add_argument("--ttft-ms", type=float, default=150.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    overhead(args.calls)
+
+    with FakeEmbeddingServer(dim=args.embed_dim, latency_ms=20, per_item_ms=0.05, mode="bow") as embeddings, \
+            FakeLLMServer(ttft_ms=args.ttft_ms, token_ms=args.token_ms, tokens=32) as llm_server, \
+            tempfile.TemporaryDirectory() as persist_dir:
+        Settings.embed_model = HuggingFaceEmbedding(embed_dim=args.embed_dim, server_url=embeddings.url)
+        Settings.llm = HuggingFaceLLM(server_url=llm_server.url, max_new_tokens=32)
+        build_corpus(persist_dir, args.documents)
+        registry.set_rerank_service(RerankService(fake_scorer(20, 0.5), cache_size=0), model="fake-cross-encoder")
+        engine = Engine(persist_dir, similarity_top_k=20, rerank_model="fake-cross-encoder")
+
+        async def run() -> float:
+            start = time.perf_counter()
+            for i in range(args.queries):
+                await engine.aquery(f"How is {TOPICS[i % len(TOPICS)]} evaluated? ({i})")
+            return time.perf_counter() - start
+
+        asyncio.run(engine.aquery("warm up"))
+        before = tracer.stage_seconds.totals()
+        seconds = asyncio.run(run())
+        print(f"{args.queries} queries, {seconds / args.queries * 1000:.1f}ms per query")
+        for (stage,), (count, total) in sorted(tracer.stage_seconds.totals().items()):
+            count -= before.get((stage,), (0, 0.0))[0]
+            total -= before.get((stage,), (0, 0.0))[1]
+            if count:
+                print(f"  {stage:<20s} {total / count * 1000:8.2f}ms x{count / args.queries:g}")
+        first_count, first_total = tracer.first_token_seconds.totals().get((), (0, 0.0))
+        if first_count:
+            print(f"  {'llm first token':<20s} {first_total / first_count * 1000:8.2f}ms")
+        print("  tokens " + " ".join(
+            f"{kind}={tracer.tokens.value(kind=kind):g}" for kind in ("prompt", "completion")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Load time, query latency and size of SimpleVectorStore vs NumpyVectorStore.
+
+    python -m benchmarks.bench_vector_store --vectors 100000 --dim 768
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from src.agentic_rag.vector_stores.numpy_vector_store import NumpyVectorStore
+
+
+def dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dim), dtype=np.float32)
+    nodes = [
+        TextNode(text="", id_=f"node-{i}", embedding=vector.tolist())
+        for i, vector in enumerate(vectors)
+    ]
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    stores = {
+        "simple": (SimpleVectorStore, SimpleVectorStore.from_persist_path),
+        "numpy-float32": (
+            lambda: NumpyVectorStore(dtype="float32"),
+            lambda path: NumpyVectorStore.from_persist_dir(os.path.dirname(path)),
+        ),
+        "numpy-float16": (
+            lambda: NumpyVectorStore(dtype="float16"),
+            lambda path: NumpyVectorStore.from_persist_dir(os.path.dirname(path)),
+        ),
+        "numpy-int8": (
+            lambda: NumpyVectorStore(dtype="int8"),
+            lambda path: NumpyVectorStore.from_persist_dir(os.path.dirname(path)),
+        ),
+    }
+    for name, (create, load) in stores.items():
+        with tempfile.TemporaryDirectory() as persist_dir:
+            path = os.path.join(persist_dir, "default__vector_store.json")
+            store = create()
+            store.add(nodes)
+            store.persist(path)
+
+            start = time.perf_counter()
+            store = load(path)
+            load_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for query in queries:
+                store.query(
+                    VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=args.top_k)
+                )
+            query_time = (time.perf_counter() - start) / len(queries)
+            print(
+                f"{name:14s} load={load_time * 1000:9.1f}ms "
+                f"query={query_time * 1000:8.2f}ms "
+                f"disk={dir_size(persist_dir) / 2**20:8.1f}MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare two result files of ``benchmarks.run``.
+
+Every numeric result is printed with its relative change; a change worse
+than ``--threshold`` percent is flagged as a regression, except latencies
+changing by less than ``--min-ms`` (timing noise of sub-millisecond stages).
+Throughputs (``*_per_second``) are better higher, latencies, durations and
+sizes (``*_ms``, ``seconds``, ``*_mb``, ``*_mib``) better lower; other
+values (counts) are informative. A differing ``config`` is reported, since such
+results are not comparable.
+
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Optional
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = float(value)
+    return values
+
+
+def direction(name: str) -> Optional[int]:
+    """+1 when higher is better, -1 when lower is better, None otherwise."""
+    leaf = name.rsplit(".", 1)[-1]
+    if leaf.endswith("_per_second"):
+        return 1
+    if leaf.endswith(("_ms", "_mb", "_mib")) or leaf == "seconds":
+        return -1
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold, percent")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="smallest latency change to flag")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base {base['meta']['commit']}  head {head['meta']['commit']}")
+    for key in sorted(set(base["config"]) | set(head["config"])):
+        if base["config"].get(key) != head["config"].get(key):
+            print(f"config differs: {key} {base['config'].get(key)} -> {head['config'].get(key)}")
+
+    old, new = flatten(base["results"]), flatten(head["results"])
+    regressions = 0
+    width = max(map(len, old.keys() | new.keys()), default=10)
+    for name in sorted(old.keys() | new.keys()):
+        if name not in old or name not in new:
+            print(f"{name:<{width}s} {old.get(name, float('nan')):12.2f} {new.get(name, float('nan')):12.2f}")
+            continue
+        change = (new[name] - old[name]) / old[name] * 100 if old[name] else 0.0
+        better = direction(name)
+        flag = ""
+        if name.endswith("_ms") and abs(new[name] - old[name]) < args.min_ms:
+            better = None
+        if better is not None and change * better < -args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif better is not None and change * better > args.threshold:
+            flag = "  improved"
+        print(f"{name:<{width}s} {old[name]:12.2f} {new[name]:12.2f} {change:+8.1f}%{flag}")
+    print(f"{regressions} regression(s) beyond {args.threshold:g}%")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Synthetic, deterministic course material and student questions.
+
+Documents are lecture notes on machine-learning topics: each is built from
+sentence templates filled with the topic, a method and a dataset drawn by a
+seeded RNG, so a seed always gives the same corpus byte for byte and the bag
+of words embeddings of the fake embedding server retrieve the notes of the
+topic a question is about.
+
+    python -m benchmarks.corpus /tmp/corpus --documents 500 --sentences 40
+"""
+import argparse
+import os
+import random
+from typing import Iterator, List, Tuple
+
+TOPICS = (
+    "gradient boosting", "random forests", "logistic regression", "linear regression",
+    "the ROC curve", "overfitting", "cross-validation", "naive Bayes", "k-means clustering",
+    "principal component analysis", "support vector machines", "decision trees",
+    "neural networks", "dropout", "batch normalization", "the bias-variance trade-off",
+    "regularization", "feature scaling", "gradient descent", "word embeddings",
+)
+METHODS = (
+    "early stopping", "grid search", "L2 regularization", "bagging", "stratified sampling",
+    "one-hot encoding", "standardization", "learning rate decay", "pruning", "ensembling",
+)
+DATASETS = ("MNIST", "CIFAR-10", "the iris dataset", "the Titanic dataset", "house prices", "IMDB reviews")
+SENTENCES = (
+    "{topic} is a standard technique in machine learning.",
+    "The main hyperparameters of {topic} control the trade-off between bias and variance.",
+    "On {dataset}, {topic} is usually combined with {method}.",
+    "A common pitfall with {topic} is leaking information from the test set.",
+    "Scikit-learn implements {topic} with sensible defaults.",
+    "Compared with {method}, {topic} needs more data to generalize.",
+    "Students often confuse {topic} with {method}.",
+    "The training time of {topic} grows with the number of samples in {dataset}.",
+    "To evaluate {topic}, hold out a validation split of {dataset}.",
+    "{method} reduces the variance of {topic} at the cost of some bias.",
+)
+QUESTIONS = (
+    "How does {topic} work?",
+    "When should I use {method} with {topic}?",
+    "What are the hyperparameters of {topic}?",
+    "Why does {topic} overfit on {dataset}?",
+    "Can you compare {topic} and {method}?",
+    "How do I evaluate {topic} on {dataset}?",
+)
+
+
+def _fill(template: str, rng: random.Random, topic: str) -> str:
+    text = template.format(topic=topic, method=rng.choice(METHODS), dataset=rng.choice(DATASETS))
+    return text[0].upper() + text[1:]
+
+
+def synthetic_documents(documents: int, sentences: int = 40, seed: int = 0) -> Iterator[Tuple[str, str]]:
+    """``(file name, text)`` of ``documents`` lecture notes of ``sentences``
+    sentences each, in paragraphs of five."""
+    rng = random.Random(seed)
+    for i in range(documents):
+        topic = TOPICS[i % len(TOPICS)]
+        lines = [f"Lecture {i}: {topic}."]
+        for j in range(sentences):
+            lines.append(_fill(rng.choice(SENTENCES), rng, topic) + ("\n" if j % 5 == 4 else ""))
+        yield f"lecture_{i:05d}.txt", " ".join(lines).replace("\n ", "\n\n")
+
+
+def write_corpus(root: str, documents: int, sentences: int = 40, seed: int = 0) -> List[str]:
+    """Write the documents to ``root`` as text files; returns their paths."""
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    for name, text in synthetic_documents(documents, sentences, seed):
+        path = os.path.join(root, name)
+        with open(path, "w") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+def synthetic_queries(queries: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [_fill(rng.choice(QUESTIONS), rng, rng.choice(TOPICS)) for _ in range(queries)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root")
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_corpus(args.root, args.documents, args.sentences, args.seed)
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f"{len(paths)} documents, {size / 1e6:.1f}MB in {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Routing latency and agreement of ``FastRouter`` with the LLM router.
+
+Trains the centroid classifier on a split of a labelled JSONL file, then
+routes the held-out queries with the LLM router and with the fast router
+(falling back to the LLM router when unsure). Without ``--embedding-url`` /
+``--llm-url`` it runs against the fake servers: bag-of-words embeddings and
+an LLM whose router answer is the labelled agent after ``--ttft-ms``.
+
+    python -m benchmarks.eval_router --data benchmarks/data/router_queries.jsonl
+"""
+import argparse
+import json
+import random
+import time
+from contextlib import ExitStack
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_async_embedding import percentile
+from benchmarks.fake_servers import FakeEmbeddingServer, FakeLLMServer
+from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+from src.agentic_rag.ml_agent.fast_router import FastRouter, KeywordRules, load_examples, train
+from src.agentic_rag.ml_agent.router import Router
+
+
+def latency_line(name: str, seconds: List[float]) -> str:
+    return (
+        f"{name:12s} p50={percentile(seconds, 0.5) * 1000:8.2f}ms "
+        f"p95={percentile(seconds, 0.95) * 1000:8.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="benchmarks/data/router_queries.jsonl")
+    parser.add_argument("--test-fraction", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-margin", type=float, default=0.05)
+    parser.add_argument("--no-rules", action="store_true")
+    parser.add_argument("--embedding-url")
+    parser.add_argument("--llm-url")
+    parser.add_argument("--embed-dim", type=int, default=768)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    random.Random(args.seed).shuffle(examples)
+    n_test = max(1, int(len(examples) * args.test_fraction))
+    test, train_set = examples[:n_test], examples[n_test:]
+    labels: Dict[str, str] = dict(examples)
+
+    def gold_answer(prompt: str) -> str:
+        for query, agent in labels.items():
+            if query in prompt:
+                return json.dumps({"name": agent})
+        return json.dumps({"name": "search"})
+
+    with ExitStack() as stack:
+        embedding_url, llm_url = args.embedding_url, args.llm_url
+        if embedding_url is None:
+            embedding_url = stack.enter_context(
+                FakeEmbeddingServer(dim=args.embed_dim, latency_ms=10, per_item_ms=0.1, mode="bow")
+            ).url
+        if llm_url is None:
+            llm_url = stack.enter_context(
+                FakeLLMServer(ttft_ms=args.ttft_ms, token_ms=5, answer=gold_answer)
+            ).url
+
+        embed_model = HuggingFaceEmbedding(embed_dim=args.embed_dim, server_url=embedding_url)
+        router = Router(HuggingFaceLLM(server_url=llm_url, max_new_tokens=16))
+        fast = FastRouter(
+            embed_model, train(embed_model, train_set),
+            rules=None if args.no_rules else KeywordRules(), min_margin=args.min_margin,
+        )
+
+        llm_seconds, fast_seconds = [], []
+        rows: List[Tuple[str, str, str, str]] = []
+        for query, label in test:
+            start = time.perf_counter()
+            llm_agent = router.llm_choose_agent(query)
+            llm_seconds.append(time.perf_counter() - start)
+            decision = fast.route(query, fallback=router.llm_choose_agent)
+            fast_seconds.append(decision.seconds)
+            rows.append((label, llm_agent, decision.agent, decision.source))
+
+        cached_seconds = [fast.route(query).seconds for query, _ in test]
+
+    n = len(rows)
+    print(f"{len(train_set)} training / {n} held-out queries")
+    print(latency_line("llm router", llm_seconds))
+    print(latency_line("fast router", fast_seconds))
+    print(latency_line("cached", cached_seconds))
+    print(f"agreement with llm router: {sum(r[1] == r[2] for r in rows) / n:.3f}")
+    print(f"accuracy  llm: {sum(r[0] == r[1] for r in rows) / n:.3f}  fast: {sum(r[0] == r[2] for r in rows) / n:.3f}")
+    for source in ("rules", "classifier", "llm"):
+        decided = [r for r in rows if r[3] == source]
+        if decided:
+            agree = sum(r[1] == r[2] for r in decided) / len(decided)
+            print(f"  {source:10s} decided {len(decided) / n:6.1%}  agreement {agree:.3f}")
+
+
+if __name__ == "__main__":
+    main()
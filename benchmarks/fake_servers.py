@@ -0,0 +1,357 @@
+"""Local stand-ins for the colab model servers.
+
+The servers speak the same JSON protocol as the real endpoints and return
+deterministic outputs, with a configurable per-request latency (the network
+round-trip) and per-item cost (the GPU work), so benchmarks run offline.
+
+    python -m benchmarks.fake_servers embedding --port 8000 --latency-ms 40
+    python -m benchmarks.fake_servers llm --port 8001 --ttft-ms 300 --token-ms 30
+    python -m benchmarks.fake_servers router --port 8002 --data benchmarks/data/router_queries.jsonl
+
+The ``router`` server is the LLM server answering router prompts with the
+labelled agent of the question (``router_answer``).
+"""
+import argparse
+import functools
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector derived from the text hash."""
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_vector(word: str, dim: int) -> np.ndarray:
+    return np.asarray(fake_embedding(word, dim))
+
+
+def fake_bow_embedding(text: str, dim: int) -> List[float]:
+    """Unit sum of per-word fake embeddings, so texts sharing words are close."""
+    vector = np.zeros(dim)
+    for word in re.findall(r"\w+", text.lower()):
+        vector += _word_vector(word, dim)
+    norm = float(np.linalg.norm(vector)) or 1.0
+    return (vector / norm).tolist()
+
+
+def fake_subword_embedding(text: str, dim: int) -> List[float]:
+    """Bag of words over identifiers split into their parts
+    (``GradientBoostingClassifier`` -> gradient boosting classifier,
+    ``max_depth`` -> max depth), as a wordpiece model sees them."""
+    words = []
+    for token in re.findall(r"[A-Za-z0-9]+", text):
+        words.extend(re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+", token))
+    return fake_bow_embedding(" ".join(words), dim)
+
+
+def fake_completion(prompt: str, tokens: int) -> List[str]:
+    """Deterministic answer of ``tokens`` word tokens derived from the prompt."""
+    words = prompt.split() or ["answer"]
+    rng = random.Random(hashlib.sha1(prompt.encode("utf-8")).digest())
+    return [("" if i == 0 else " ") + rng.choice(words) for i in range(tokens)]
+
+
+def router_answer(labels: Dict[str, str], default: str = "search") -> Callable[[str], Optional[str]]:
+    """``FakeLLMServer`` answer choosing the agent ``labels`` gives the
+    question of a router prompt (``default`` for unknown questions); other
+    prompts are answered with generated words."""
+
+    def answer(prompt: str) -> Optional[str]:
+        if "tools?" not in prompt:
+            return None
+        for query, agent in labels.items():
+            if query in prompt:
+                return json.dumps({"name": agent})
+        return json.dumps({"name": default})
+
+    return answer
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    """Dispatch POST bodies to ``server.routes[path](payload)``."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _read_json(self) -> Optional[Dict[str, Any]]:
+        """The JSON body, None if the client went away before sending it."""
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if len(body) < length:
+            return None
+        return json.loads(body or b"{}")
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        route = self.server.routes.get(self.path)
+        if route is None:
+            self._send_json(404, {"detail": "not found"})
+            return
+        self.server.requests += 1
+        payload = self._read_json()
+        if payload is None:
+            self.close_connection = True
+            return
+        try:
+            route(self, payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # a cancelled client request
+            self.close_connection = True
+
+    def _start_stream(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Threaded HTTP server running in a daemon thread."""
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), _JSONHandler)
+        self.routes: Dict[str, Callable[[_JSONHandler, Dict[str, Any]], None]] = {}
+        self.requests = 0
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+class FakeEmbeddingServer(FakeServer):
+    """Serves ``/get_embeddings`` and ``/get_embeddings_batch``.
+
+    ``mode="hash"`` embeds every text as an unrelated random vector,
+    ``mode="bow"`` as a bag of words, so texts sharing words are similar,
+    ``mode="subword"`` as a bag of words of the identifiers' parts.
+    """
+
+    def __init__(
+        self,
+        dim: int = 768,
+        latency_ms: float = 20.0,
+        per_item_ms: float = 1.0,
+        mode: str = "hash",
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.dim = dim
+        self.embed = {
+            "hash": fake_embedding, "bow": fake_bow_embedding, "subword": fake_subword_embedding,
+        }[mode]
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self.routes["/get_embeddings"] = self._single
+        self.routes["/get_embeddings_batch"] = self._batch
+
+    def _sleep(self, items: int) -> None:
+        time.sleep((self.latency_ms + self.per_item_ms * items) / 1000.0)
+
+    def _single(self, handler: _JSONHandler, payload: Dict[str, Any]) -> None:
+        self._sleep(1)
+        handler._send_json(200, {"embed": self.embed(payload["text"], self.dim)})
+
+    def _batch(self, handler: _JSONHandler, payload: Dict[str, Any]) -> None:
+        texts = payload["texts"]
+        self._sleep(len(texts))
+        handler._send_json(
+            200, {"embeds": [self.embed(text, self.dim) for text in texts]}
+        )
+
+
+class FakeLLMServer(FakeServer):
+    """Serves ``/llm_complete``, the token stream ``/llm_stream`` and the batch
+    endpoint ``/llm_complete_batch``.
+
+    Generation takes ``ttft_ms`` (prefill plus first token) and then
+    ``token_ms`` per further token; ``/llm_complete`` answers after the last
+    token, ``/llm_stream`` sends each token when it is generated, as
+    server-sent events (``stream_format="sse"``) or JSON lines (``"jsonl"``).
+
+    ``gpu_slots`` bounds the generations running at once (0: unbounded), like
+    a GPU serving one sequence or one batch at a time. A batch of n prompts is
+    generated together, each step costing ``1 + batch_step_cost * (n - 1)``
+    times a single prompt's step.
+
+    ``answer(prompt)`` replaces the generated words by a given answer (e.g.
+    the expected tool of a router prompt), streamed word by word; prompts it
+    answers with ``None`` get generated words.
+    """
+
+    def __init__(
+        self,
+        ttft_ms: float = 200.0,
+        token_ms: float = 20.0,
+        tokens: int = 64,
+        stream_format: str = "sse",
+        gpu_slots: int = 0,
+        batch_step_cost: float = 0.05,
+        answer: Optional[Callable[[str], Optional[str]]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.answer = answer
+        self.ttft_ms = ttft_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.stream_format = stream_format
+        self.gpu_slots = gpu_slots
+        self.batch_step_cost = batch_step_cost
+        self.batch_sizes: List[int] = []
+        self._gpu = threading.BoundedSemaphore(gpu_slots) if gpu_slots else None
+        self.routes["/llm_complete"] = self._complete
+        self.routes["/llm_stream"] = self._stream
+        self.routes["/llm_complete_batch"] = self._complete_batch
+
+    def _generate(self, prompts: List[str], max_new_tokens: int) -> Iterator[List[str]]:
+        """Yield the next token of every prompt at each decoding step."""
+        if self.answer is None:
+            answers = [fake_completion(prompt, max_new_tokens) for prompt in prompts]
+        else:
+            answers = []
+            for prompt in prompts:
+                answer = self.answer(prompt)
+                if answer is None:
+                    answers.append(fake_completion(prompt, max_new_tokens))
+                else:
+                    answers.append(re.findall(r"\s*\S+", answer)[:max_new_tokens])
+            max_new_tokens = max(len(answer) for answer in answers)
+            answers = [answer + [""] * (max_new_tokens - len(answer)) for answer in answers]
+        scale = 1.0 + self.batch_step_cost * (len(prompts) - 1)
+        if self._gpu is not None:
+            self._gpu.acquire()
+        try:
+            for step in range(max_new_tokens):
+                time.sleep((self.ttft_ms if step == 0 else self.token_ms) * scale / 1000.0)
+                yield [answer[step] for answer in answers]
+        finally:
+            if self._gpu is not None:
+                self._gpu.release()
+
+    def _complete(self, handler: _JSONHandler, payload: Dict[str, Any]) -> None:
+        steps = self._generate([payload["text"]], payload.get("max_new_tokens", self.tokens))
+        tokens = [step[0] for step in steps]
+        handler._send_json(200, {"text": "".join(tokens), "raw": tokens})
+
+    def _complete_batch(self, handler: _JSONHandler, payload: Dict[str, Any]) -> None:
+        texts = payload["texts"]
+        self.batch_sizes.append(len(texts))
+        steps = list(self._generate(texts, payload.get("max_new_tokens", self.tokens)))
+        completions = []
+        for i in range(len(texts)):
+            tokens = [step[i] for step in steps]
+            completions.append({"text": "".join(tokens), "raw": tokens})
+        handler._send_json(200, {"completions": completions})
+
+    def _stream(self, handler: _JSONHandler, payload: Dict[str, Any]) -> None:
+        if self.stream_format == "sse":
+            handler._start_stream("text/event-stream")
+            frame = "data: {}\n\n".format
+        else:
+            handler._start_stream("application/jsonl")
+            frame = "{}\n".format
+        for step in self._generate([payload["text"]], payload.get("max_new_tokens", self.tokens)):
+            handler._send_chunk(frame(json.dumps({"delta": step[0]})).encode("utf-8"))
+        if self.stream_format == "sse":
+            handler._send_chunk(b"data: [DONE]\n\n")
+        handler._end_stream()
+
+
+SERVERS: Dict[str, Tuple[type, Tuple[str, ...]]] = {
+    "embedding": (FakeEmbeddingServer, ("dim", "latency_ms", "per_item_ms", "mode")),
+    "llm": (
+        FakeLLMServer,
+        ("ttft_ms", "token_ms", "tokens", "stream_format", "gpu_slots", "batch_step_cost"),
+    ),
+}
+SERVERS["router"] = SERVERS["llm"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("server", choices=sorted(SERVERS))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--per-item-ms", type=float, default=1.0)
+    parser.add_argument("--mode", choices=("hash", "bow", "subword"), default="hash")
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--stream-format", choices=("sse", "jsonl"), default="sse")
+    parser.add_argument("--gpu-slots", type=int, default=0)
+    parser.add_argument("--batch-step-cost", type=float, default=0.05)
+    parser.add_argument("--data", default="benchmarks/data/router_queries.jsonl",
+                        help="labelled router questions (router server)")
+    args = parser.parse_args()
+
+    cls, options = SERVERS[args.server]
+    kwargs = {k: getattr(args, k) for k in options}
+    if args.server == "router":
+        from src.agentic_rag.ml_agent.fast_router import load_examples
+
+        kwargs["answer"] = router_answer(dict(load_examples(args.data)))
+    server = cls(host=args.host, port=args.port, **kwargs)
+    print(f"{args.server} server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
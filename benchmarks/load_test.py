@@ -0,0 +1,169 @@
+"""Load test of the ``/ask`` service: requests/s and latency percentiles.
+
+A pure-asyncio driver keeps ``--concurrency`` clients posting questions of
+``--data`` and reads the SSE answers, recording the time to the first answer
+chunk and to ``[DONE]``. Without ``--url`` it serves ``main.create_app`` with
+uvicorn in-process against the fake embedding and LLM servers, a small numpy
+index and the simulated reranker of ``bench_rerank``.
+
+    python -m benchmarks.load_test --concurrency 1 8 32 --duration 10
+    python -m benchmarks.load_test --url http://localhost:8080
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.bench_async_embedding import percentile
+from benchmarks.fake_servers import FakeEmbeddingServer, FakeLLMServer
+from src.agentic_rag.ml_agent.fast_router import load_examples
+from src.utils.http import STREAM_DONE, parse_stream_line
+
+
+async def ask(client: httpx.AsyncClient, url: str, question: str) -> Tuple[Optional[float], float, str]:
+    """Seconds to the first answer chunk and to the end, and the status."""
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", f"{url}/ask", json={"question": question}) as response:
+        if response.status_code != 200:
+            return None, time.perf_counter() - start, f"http {response.status_code}"
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+                continue
+            data = parse_stream_line(line)
+            if data is None:
+                continue
+            if data == STREAM_DONE:
+                return first, time.perf_counter() - start, "ok"
+            if event == "error":
+                return first, time.perf_counter() - start, "error"
+            if event is None and first is None:
+                first = time.perf_counter() - start
+            event = None
+    return first, time.perf_counter() - start, "truncated"
+
+
+async def run(url: str, questions: List[str], n: int, duration: float, seed: int) -> str:
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + duration
+    first_seconds: List[float] = []
+    seconds: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        while time.perf_counter() < deadline:
+            try:
+                first, total, status = await ask(client, url, rng.choice(questions))
+            except httpx.HTTPError as exc:
+                first, total, status = None, 0.0, type(exc).__name__
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "ok":
+                seconds.append(total)
+                if first is not None:
+                    first_seconds.append(first)
+
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(n)))
+    wall = time.perf_counter() - start
+    errors = sum(count for status, count in statuses.items() if status != "ok")
+    return (
+        f"n={n:<4d} rps={len(seconds) / wall:7.2f} "
+        f"ttft p50={percentile(first_seconds, 0.5) * 1000:7.1f}ms p95={percentile(first_seconds, 0.95) * 1000:7.1f}ms "
+        f"total p50={percentile(seconds, 0.5) * 1000:7.1f}ms p95={percentile(seconds, 0.95) * 1000:7.1f}ms "
+        f"errors={errors}" + (f" {statuses}" if errors else "")
+    )
+
+
+def serve_locally(stack: ExitStack, args: argparse.Namespace, labels: Dict[str, str]) -> str:
+    """Start the fake model servers and the service; return its url."""
+    import uvicorn
+    from llama_index.core import Settings
+
+    from benchmarks.bench_rerank import fake_scorer
+    from benchmarks.bench_speculative import build_corpus
+    from main import create_app
+    from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+    from src.agentic_rag.llms.llama import HuggingFaceLLM
+    from src.agentic_rag.ml_agent.router import Router
+    from src.agentic_rag.retrieval import registry
+    from src.agentic_rag.retrieval.rerank import RerankService
+    from src.agentic_rag.retrieval.retrieval import Engine
+
+    def answer(prompt: str) -> str:
+        if "tools?" in prompt:
+            for query, agent in labels.items():
+                if query in prompt:
+                    return json.dumps({"name": agent})
+            return json.dumps({"name": "search"})
+        return " ".join(f"word{i}" for i in range(args.tokens))
+
+    embeddings = stack.enter_context(
+        FakeEmbeddingServer(dim=args.embed_dim, latency_ms=20, per_item_ms=0.05, mode="bow")
+    )
+    llm_server = stack.enter_context(
+        FakeLLMServer(ttft_ms=args.ttft_ms, token_ms=args.token_ms, answer=answer)
+    )
+    persist_dir = stack.enter_context(tempfile.TemporaryDirectory())
+    Settings.embed_model = HuggingFaceEmbedding(embed_dim=args.embed_dim, server_url=embeddings.url)
+    llm = HuggingFaceLLM(server_url=llm_server.url, max_new_tokens=args.tokens, max_concurrency=256)
+    Settings.llm = llm
+    build_corpus(persist_dir, 200)
+
+    model = "fake-cross-encoder"
+    registry.set_rerank_service(RerankService(fake_scorer(20, 0.5)), model=model)
+    engine = Engine(persist_dir, similarity_top_k=20, rerank_model=model, debug=False)
+    router = Router(llm, engine=engine, speculative=True)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(router), host="127.0.0.1", port=port, log_level="warning", backlog=1024,
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    stack.callback(thread.join)
+    stack.callback(setattr, server, "should_exit", True)
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="service to load, default: start one locally")
+    parser.add_argument("--data", default="benchmarks/data/router_queries.jsonl")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--embed-dim", type=int, default=256)
+    parser.add_argument("--ttft-ms", type=float, default=150.0)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    parser.add_argument("--tokens", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    questions = [query for query, _ in examples]
+    with ExitStack() as stack:
+        url = args.url or serve_locally(stack, args, dict(examples))
+        for n in args.concurrency:
+            print(asyncio.run(run(url, questions, n, args.duration, args.seed)))
+        print(httpx.get(f"{url}/healthz").json())
+        metrics = httpx.get(f"{url}/metrics").text
+        print("\n".join(line for line in metrics.splitlines() if "requests_total" in line and not line.startswith("#")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Offline benchmark suite: one run, one JSON file to diff between commits.
+
+Everything runs against the local stand-ins of ``fake_servers`` (embedding
+server, LLM server answering router prompts with the labelled agent of
+``--data``) and the simulated cross-encoder of ``bench_rerank``, over the
+synthetic corpus of ``corpus``, so a run is deterministic up to timing noise.
+Scenarios:
+
+* ``indexing``: build a numpy index of the corpus with ``build_index``,
+* ``query``: ``Engine.aquery`` one question at a time: latency percentiles
+  and the mean of each stage of ``src.utils.tracing``,
+* ``concurrency``: ``Router.arun`` at each ``--concurrency`` level,
+* ``memory``: a fresh interpreter loads the index and answers one query:
+  the resident memory after the imports, what loading the index added
+  (Linux), the peak, and the size of the index on disk.
+
+Scenarios after ``indexing`` need its index. Results go to
+``benchmarks/results/<commit>.json`` unless ``--out`` is given; compare two
+with ``python -m benchmarks.compare``.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios indexing query --documents 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from typing import Any, Dict, List
+
+from llama_index.core import Settings
+
+from benchmarks.bench_async_embedding import percentile
+from benchmarks.bench_rerank import fake_scorer
+from benchmarks.corpus import synthetic_queries, write_corpus
+from benchmarks.fake_servers import FakeEmbeddingServer, FakeLLMServer, router_answer
+from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+from src.agentic_rag.indexer.indexer import build_index
+from src.agentic_rag.indexer.manifest import Manifest
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+from src.agentic_rag.ml_agent.fast_router import load_examples
+from src.agentic_rag.ml_agent.router import Router
+from src.agentic_rag.retrieval import registry
+from src.agentic_rag.retrieval.rerank import RerankService
+from src.agentic_rag.retrieval.retrieval import Engine
+from src.utils.tracing import tracer
+
+SCENARIOS = ("indexing", "query", "concurrency", "memory")
+RERANK_MODEL = "fake-cross-encoder"
+
+MEMORY_CHILD = r"""
+import json, os, resource, sys
+def rss_mib():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+from llama_index.core import Settings
+from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+from src.agentic_rag.retrieval.retrieval import Engine
+persist_dir, embedding_url, llm_url, embed_dim, query = sys.argv[1:6]
+Settings.embed_model = HuggingFaceEmbedding(embed_dim=int(embed_dim), server_url=embedding_url)
+Settings.llm = HuggingFaceLLM(server_url=llm_url)
+imported = rss_mib()
+engine = Engine(persist_dir, similarity_top_k=20, rerank_model=None)
+engine.warm_up(query)
+engine.query(query)
+print(json.dumps({
+    "import_rss_mib": imported,
+    "loaded_rss_mib": rss_mib() - imported,
+    "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": percentile(seconds, 0.5) * 1000,
+        "p95_ms": percentile(seconds, 0.95) * 1000,
+        "p99_ms": percentile(seconds, 0.99) * 1000,
+        "mean_ms": sum(seconds) / len(seconds) * 1000,
+    }
+
+
+def directory_mb(path: str) -> float:
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    ) / 1e6
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def run_indexing(args: argparse.Namespace, root: str, persist_dir: str, embedding_url: str) -> Dict[str, Any]:
+    paths = write_corpus(root, args.documents, args.sentences, args.seed)
+    embed_model = HuggingFaceEmbedding(embed_dim=args.embed_dim, server_url=embedding_url)
+    start = time.perf_counter()
+    build_index(
+        root, persist_dir, embed_model=embed_model, checkpoint_every=max(1, args.documents),
+        required_exts=(".txt",), parse_workers=args.parse_workers, vector_store="numpy",
+    )
+    seconds = time.perf_counter() - start
+    manifest = Manifest(persist_dir)
+    nodes = sum(len(manifest.get(path)["node_ids"]) for path in paths)
+    return {
+        "documents": len(paths),
+        "nodes": nodes,
+        "seconds": seconds,
+        "documents_per_second": len(paths) / seconds,
+        "nodes_per_second": nodes / seconds,
+        "index_mb": directory_mb(persist_dir),
+    }
+
+
+def stage_means(before: Dict[Any, Any], queries: int) -> Dict[str, float]:
+    """Mean milliseconds per query of each stage since ``before``."""
+    means = {}
+    for (stage,), (count, total) in sorted(tracer.stage_seconds.totals().items()):
+        count -= before.get((stage,), (0, 0.0))[0]
+        total -= before.get((stage,), (0, 0.0))[1]
+        if count:
+            means[f"{stage}_ms"] = total / queries * 1000
+    return means
+
+
+async def run_query(args: argparse.Namespace, engine: Engine) -> Dict[str, Any]:
+    queries = synthetic_queries(args.queries, args.seed)
+    await engine.aquery(queries[0])
+    before = tracer.stage_seconds.totals()
+    seconds = []
+    for query in queries:
+        start = time.perf_counter()
+        await engine.aquery(query)
+        seconds.append(time.perf_counter() - start)
+    return {"queries": len(queries), **latency_summary(seconds), "stages": stage_means(before, len(queries))}
+
+
+async def run_concurrency(args: argparse.Namespace, router: Router, questions: List[str]) -> Dict[str, Any]:
+    results = {}
+    for n in args.concurrency:
+        workload = [questions[i % len(questions)] for i in range(max(args.queries, 4 * n))]
+        semaphore = asyncio.Semaphore(n)
+        seconds: List[float] = []
+
+        async def one(question: str) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                await router.arun(question)
+                seconds.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(question) for question in workload))
+        wall = time.perf_counter() - start
+        results[str(n)] = {"requests": len(workload), "requests_per_second": len(workload) / wall,
+                           **latency_summary(seconds)}
+    return results
+
+
+def run_memory(args: argparse.Namespace, persist_dir: str, embedding_url: str, llm_url: str) -> Dict[str, Any]:
+    query = synthetic_queries(1, args.seed)[0]
+    output = subprocess.run(
+        [sys.executable, "-c", MEMORY_CHILD, persist_dir, embedding_url, llm_url, str(args.embed_dim), query],
+        capture_output=True, text=True, check=True, env={**os.environ, "PYTHONPATH": os.getcwd()},
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["index_mb"] = directory_mb(persist_dir)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--out", help="result file, default: benchmarks/results/<commit>.json")
+    parser.add_argument("--data", default="benchmarks/data/router_queries.jsonl")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--parse-workers", type=int, default=0)
+    parser.add_argument("--embed-dim", type=int, default=256)
+    parser.add_argument("--embed-ms", type=float, default=20.0)
+    parser.add_argument("--embed-item-ms", type=float, default=0.5)
+    parser.add_argument("--ttft-ms", type=float, default=150.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--tokens", type=int, default=32)
+    parser.add_argument("--rerank-call-ms", type=float, default=20.0)
+    parser.add_argument("--rerank-pair-ms", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    results: Dict[str, Any] = {}
+    with ExitStack() as stack:
+        embeddings = stack.enter_context(FakeEmbeddingServer(
+            dim=args.embed_dim, latency_ms=args.embed_ms, per_item_ms=args.embed_item_ms, mode="bow"))
+        llm_server = stack.enter_context(FakeLLMServer(
+            ttft_ms=args.ttft_ms, token_ms=args.token_ms, tokens=args.tokens,
+            answer=router_answer(dict(examples))))
+        tmp = stack.enter_context(tempfile.TemporaryDirectory())
+        root, persist_dir = os.path.join(tmp, "corpus"), os.path.join(tmp, "index")
+
+        # the index is needed by every scenario
+        print("indexing", file=sys.stderr)
+        results["indexing"] = run_indexing(args, root, persist_dir, embeddings.url)
+
+        Settings.embed_model = HuggingFaceEmbedding(embed_dim=args.embed_dim, server_url=embeddings.url)
+        llm = HuggingFaceLLM(server_url=llm_server.url, max_new_tokens=args.tokens, max_concurrency=256)
+        Settings.llm = llm
+        registry.set_rerank_service(
+            RerankService(fake_scorer(args.rerank_call_ms, args.rerank_pair_ms), cache_size=0), model=RERANK_MODEL)
+        engine = Engine(persist_dir, similarity_top_k=20, rerank_model=RERANK_MODEL)
+        if "query" in args.scenarios:
+            print("query", file=sys.stderr)
+            results["query"] = asyncio.run(run_query(args, engine))
+        if "concurrency" in args.scenarios:
+            print("concurrency", file=sys.stderr)
+            router = Router(llm, engine=engine, speculative=True)
+            results["concurrency"] = asyncio.run(run_concurrency(args, router, [query for query, _ in examples]))
+        if "memory" in args.scenarios:
+            print("memory", file=sys.stderr)
+            results["memory"] = run_memory(args, persist_dir, embeddings.url, llm_server.url)
+    if "indexing" not in args.scenarios:
+        del results["indexing"]
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "scenarios")},
+        "results": results,
+    }
+    out = args.out or os.path.join("benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(json.dumps(results, indent=2, sort_keys=True))
+    print(f"wrote {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,297 @@
-from fastapi import FastAPI
-import requests
-app = FastAPI()
+"""HTTP service of the ML tutor agent.
 
-URL = 'https://8c3a-34-87-63-89.ngrok-free.app/router'
+    INDEXER_DB=/path/to/index uvicorn main:app --host 0.0.0.0 --port 8080
 
-@app.get("/router")
-async def query_router():
-    
+``POST /ask`` with ``{"question": ...}`` routes the question and streams the
+answer as server-sent events::
 
-    if agent_name == 'code':
-        ...
-    elif:
-        ...
-    return 
\ No newline at end of file
+    event: route       data: {"agent": "search"}
+    event: sources     data: [{"id": ..., "score": ..., "file_name": ...}]
+    data: {"delta": "..."}          one event per generated chunk
+    event: execution   data: {...}  ipython answers, with an executor
+    data: [DONE]
+
+A failure ends the stream with ``event: error``. ``"stream": false`` returns
+``{"agent", "answer"}`` as JSON instead. When the client disconnects, the
+routing, retrieval and generation requests in flight are cancelled.
+With ``SESSION_DB`` set, a ``"session_id"`` makes the question a follow-up:
+it is condensed with the session's history into a standalone question, and
+question and answer are added to the session.
+
+``GET /healthz`` reports readiness, ``GET /metrics`` Prometheus metrics,
+among them the latency of each request stage (``agentic_rag_stage_seconds``,
+see :mod:`src.utils.tracing`). ``OTEL_TRACES=1`` also opens an OpenTelemetry
+span per stage, exported by the SDK the deployment configures.
+
+Configuration (environment): ``INDEXER_DB``, ``EMBED_DIM`` (768),
+``RERANK_MODEL`` (empty disables reranking), ``HYBRID`` (1: dense plus BM25
+retrieval), ``SIMILARITY_TOP_K`` (100, 20 with ``HYBRID``),
+``ROUTER_CLASSIFIER`` (a ``fast_router`` .npz, optional), ``SPECULATIVE``
+(1), ``RESPONSE_CACHE`` (SQLite path of the answer cache of the engine and
+the router's LLM, optional), ``EXECUTOR_WORKERS`` (0:
+ipython code is not run; Linux with Landlock and namespaces is required)
+and ``EXECUTOR_USER`` (nobody, the account they run as), ``SESSION_DB``
+(SQLite path of the chat sessions, optional), plus ``LLM_SERVER_URL`` / ``EMBEDDING_SERVER_URL``
+of the model clients.
+
+The router and its ``Engine`` are built once per process at startup and
+shared by all requests; index and reranker come from the process-wide
+registry. With several uvicorn workers each process loads its own, but a
+numpy vector store is memory-mapped, so its pages are shared between them.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from src.utils.http import STREAM_DONE
+from src.utils.metrics import REGISTRY
+from src.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+metrics = REGISTRY
+REQUESTS = metrics.counter("requests_total", "Answered /ask requests.", ("agent", "status"))
+IN_FLIGHT = metrics.gauge("requests_in_flight", "/ask requests being answered.")
+LATENCY = metrics.histogram("request_seconds", "Time to the complete answer.", ("agent",))
+TTFT = metrics.histogram("first_token_seconds", "Time to the first answer chunk.", ("agent",))
+
+# seconds between client disconnect checks of non-streamed requests
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class AskRequest(BaseModel):
+    question: str
+    stream: bool = True
+    speculative: Optional[bool] = None
+    session_id: Optional[str] = None
+
+
+def build_router():
+    """Router over the index, models and options of the environment."""
+    from llama_index.core import Settings
+
+    from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+    from src.agentic_rag.llms.llama import HuggingFaceLLM
+    from src.agentic_rag.ml_agent.router import Router
+    from src.agentic_rag.retrieval.retrieval import Engine
+
+    env = os.environ
+    embed_dim = int(env.get("EMBED_DIM", "768"))
+    Settings.embed_model = HuggingFaceEmbedding(embed_dim=embed_dim)
+    Settings.llm = HuggingFaceLLM()
+
+    response_cache = None
+    if env.get("RESPONSE_CACHE"):
+        from src.agentic_rag.llms.cache import ResponseCache
+
+        response_cache = ResponseCache(env["RESPONSE_CACHE"])
+    session_store = None
+    if env.get("SESSION_DB"):
+        from src.agentic_rag.memory.sessions import SessionStore
+
+        session_store = SessionStore(env["SESSION_DB"])
+    hybrid = env.get("HYBRID") == "1"
+    engine = Engine(
+        env["INDEXER_DB"],
+        # exact terms come from BM25, so the dense search fetches fewer nodes
+        similarity_top_k=int(env.get("SIMILARITY_TOP_K", "20" if hybrid else "100")),
+        rerank_model=env.get("RERANK_MODEL", "BAAI/bge-reranker-base") or None,
+        response_cache=response_cache,
+        session_store=session_store,
+        hybrid=hybrid,
+        debug=False,
+    )
+
+    fast_router = None
+    if env.get("ROUTER_CLASSIFIER"):
+        from src.agentic_rag.ml_agent.fast_router import CentroidClassifier, FastRouter, KeywordRules
+
+        fast_router = FastRouter(
+            Settings.embed_model, CentroidClassifier.load(env["ROUTER_CLASSIFIER"]), KeywordRules()
+        )
+
+    executor = None
+    if int(env.get("EXECUTOR_WORKERS", "0")):
+        from src.agentic_rag.ml_agent.executor import ExecutorPool
+
+        executor = ExecutorPool(
+            workers=int(env["EXECUTOR_WORKERS"]), user=env.get("EXECUTOR_USER", "nobody")
+        )
+
+    llm = Settings.llm
+    if response_cache is not None:
+        from src.agentic_rag.llms.cached_llm import CachedLLM
+
+        # routing and code prompts repeat verbatim; the engine caches its answers itself
+        llm = CachedLLM(Settings.llm, cache=response_cache)
+
+    return Router(
+        llm, engine=engine, fast_router=fast_router,
+        speculative=env.get("SPECULATIVE", "1") == "1", executor=executor,
+        session_store=session_store,
+    )
+
+
+def register_collectors(router) -> None:
+    """Export the counters the components keep themselves."""
+    metrics.add_collector("speculation", lambda: router.speculations)
+    if router.fast_router is not None:
+        metrics.add_collector("router", router.fast_router.stats)
+    if router.engine is not None:
+        metrics.add_collector("rerank", router.engine.rerank_stats)
+        metrics.add_collector("packing", router.engine.packing_stats)
+        metrics.add_collector("response_cache", router.engine.cache_stats)
+    # the model behind a CachedLLM
+    llm = getattr(router.llm, "llm", router.llm)
+    if hasattr(llm, "batch_stats"):
+        metrics.add_collector("llm_batch", llm.batch_stats)
+    if router.executor is not None:
+        metrics.add_collector("executor", router.executor.stats)
+    if router.session_store is not None:
+        metrics.add_collector("sessions", router.session_store.stats)
+
+
+def create_app(router=None) -> FastAPI:
+    """The service app; without ``router`` one is built from the
+    environment at startup."""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        app.state.router = router
+        if os.environ.get("OTEL_TRACES") == "1":
+            tracer.enable_opentelemetry()
+        if app.state.router is None:
+            # loading the index and models blocks, keep the loop free meanwhile
+            app.state.router = await asyncio.to_thread(build_router)
+        if app.state.router.engine is not None:
+            await asyncio.to_thread(app.state.router.engine.warm_up)
+        register_collectors(app.state.router)
+        app.state.ready = True
+        yield
+        app.state.ready = False
+        if app.state.router.executor is not None:
+            app.state.router.executor.close()
+        if app.state.router.session_store is not None:
+            app.state.router.session_store.close()
+        if hasattr(app.state.router.llm, "aclose"):
+            await app.state.router.llm.aclose()
+
+    app = FastAPI(title="ML tutor agent", lifespan=lifespan)
+    app.state.ready = False
+
+    @app.get("/healthz")
+    async def healthz() -> JSONResponse:
+        if not app.state.ready:
+            return JSONResponse({"status": "starting"}, status_code=503)
+        return JSONResponse({"status": "ok"})
+
+    @app.get("/metrics")
+    async def get_metrics() -> PlainTextResponse:
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    @app.post("/ask")
+    async def ask(body: AskRequest, request: Request):
+        if body.stream:
+            return StreamingResponse(
+                stream_answer(app.state.router, body),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        return await answer(app.state.router, body, request)
+
+    return app
+
+
+def sse(data: Any, event: Optional[str] = None) -> str:
+    payload = data if isinstance(data, str) else json.dumps(data)
+    return (f"event: {event}\n" if event else "") + f"data: {payload}\n\n"
+
+
+def describe_sources(nodes) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": node.node.node_id,
+            "score": node.score,
+            "file_name": node.node.metadata.get("file_name"),
+            "page": node.node.metadata.get("page_label"),
+        }
+        for node in nodes
+    ]
+
+
+async def stream_answer(router, body: AskRequest) -> AsyncIterator[str]:
+    """SSE frames of the answer; Starlette cancels this generator when the
+    client disconnects, which closes ``router.astream`` and its requests."""
+    start = time.perf_counter()
+    agent, status, first = "none", "ok", None
+    IN_FLIGHT.inc()
+    try:
+        async for event, data in router.astream(
+            body.question, speculative=body.speculative, session_id=body.session_id
+        ):
+            if event == "route":
+                agent = data
+                yield sse({"agent": data}, "route")
+            elif event == "sources":
+                yield sse(describe_sources(data), "sources")
+            elif event == "delta":
+                if first is None:
+                    first = time.perf_counter() - start
+                    TTFT.observe(first, agent=agent)
+                yield sse({"delta": data})
+            elif event == "execution":
+                yield sse(data, "execution")
+        yield sse(STREAM_DONE)
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except Exception as exc:
+        status = "error"
+        logger.exception("answering %r failed", body.question)
+        yield sse({"error": str(exc)}, "error")
+    finally:
+        IN_FLIGHT.dec()
+        REQUESTS.inc(agent=agent, status=status)
+        if status == "ok":
+            LATENCY.observe(time.perf_counter() - start, agent=agent)
+
+
+async def answer(router, body: AskRequest, request: Request) -> JSONResponse:
+    start = time.perf_counter()
+    IN_FLIGHT.inc()
+    task = asyncio.ensure_future(router.arun(
+        body.question, speculative=body.speculative, session_id=body.session_id
+    ))
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if not task.done() and await request.is_disconnected():
+                task.cancel()
+                REQUESTS.inc(agent="none", status="cancelled")
+                # nobody reads it; 499 is what nginx logs for this case
+                return JSONResponse({"error": "client disconnected"}, status_code=499)
+        try:
+            result = task.result()
+        except Exception as exc:
+            logger.exception("answering %r failed", body.question)
+            REQUESTS.inc(agent="none", status="error")
+            return JSONResponse({"error": str(exc)}, status_code=500)
+    finally:
+        IN_FLIGHT.dec()
+        if not task.done():
+            task.cancel()
+
+    REQUESTS.inc(agent=result["agent"], status="ok")
+    LATENCY.observe(time.perf_counter() - start, agent=result["agent"])
+    return JSONResponse(result)
+
+
+app = create_app()
@@ -0,0 +1,258 @@
+"""Persistent, content-addressed cache in front of an embedding model."""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+
+class EmbeddingCacheStore:
+    """Two tier embedding store: an in-memory LRU over a SQLite file.
+
+    Vectors are stored as raw float32 blobs keyed by a sha256 of
+    (model name, embed_dim, kind, text). The SQLite tier holds at most
+    ``max_entries`` vectors; the least recently used tenth is evicted when
+    it grows past that.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 2_000_000,
+        memory_entries: int = 10_000,
+    ) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access "
+            "ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, embed_dim: int, kind: str, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model_name, str(embed_dim), kind, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return the cached vectors for ``keys``, skipping missing ones."""
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            disk_keys = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is None:
+                    disk_keys.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+            # stay below SQLITE_MAX_VARIABLE_NUMBER
+            for start in range(0, len(disk_keys), 500):
+                chunk = disk_keys[start : start + 500]
+                rows = self._conn.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                        [(time.time(), key) for key, _ in rows],
+                    )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) "
+                "VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._size += self._conn.total_changes - before
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        target = int(self.max_entries * 0.9)
+        excess = self._size - target
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+            (excess,),
+        )
+        self._size -= excess
+        self.evictions += excess
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self._size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Wrap an embedding model with an :class:`EmbeddingCacheStore`.
+
+    Only texts missing from the cache are sent to the wrapped model, so
+    re-indexing unchanged documents does not hit the embedding server.
+
+    Args:
+        embed_model (BaseEmbedding): the model to cache
+        cache_path (str): sqlite file holding the cache
+
+    """
+
+    embed_model: BaseEmbedding = Field(description="The wrapped embedding model.")
+    embed_dim: int = Field(description="The embedding dimension.", gt=0)
+
+    _cache: EmbeddingCacheStore = PrivateAttr()
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        cache_path: str,
+        max_entries: int = 2_000_000,
+        memory_entries: int = 10_000,
+        **kwargs: Any,
+    ) -> None:
+        kwargs.setdefault("model_name", embed_model.model_name)
+        kwargs.setdefault("embed_batch_size", embed_model.embed_batch_size)
+        super().__init__(
+            embed_model=embed_model,
+            embed_dim=getattr(embed_model, "embed_dim", 0) or 1,
+            **kwargs,
+        )
+        self._cache = EmbeddingCacheStore(
+            cache_path, max_entries=max_entries, memory_entries=memory_entries
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "cached embeddings"
+
+    @property
+    def cache(self) -> EmbeddingCacheStore:
+        return self._cache
+
+    def _keys(self, kind: str, texts: List[str]) -> List[str]:
+        return [
+            self._cache.make_key(self.model_name, self.embed_dim, kind, text)
+            for text in texts
+        ]
+
+    def _missing(
+        self, kind: str, texts: List[str]
+    ) -> Tuple[List[str], Dict[str, List[float]], List[int]]:
+        keys = self._keys(kind, texts)
+        found = self._cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        return keys, found, missing
+
+    def _fill(
+        self,
+        keys: List[str],
+        found: Dict[str, List[float]],
+        missing: List[int],
+        vectors: List[List[float]],
+    ) -> List[List[float]]:
+        computed = {keys[i]: vector for i, vector in zip(missing, vectors)}
+        self._cache.put_many(computed)
+        found.update(computed)
+        return [found[key] for key in keys]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        keys, found, missing = self._missing("query", [query])
+        vectors = [self.embed_model._get_query_embedding(query)] if missing else []
+        return self._fill(keys, found, missing, vectors)[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        keys, found, missing = self._missing("query", [query])
+        vectors = (
+            [await self.embed_model._aget_query_embedding(query)] if missing else []
+        )
+        return self._fill(keys, found, missing, vectors)[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._missing("text", texts)
+        vectors = (
+            self.embed_model._get_text_embeddings([texts[i] for i in missing])
+            if missing
+            else []
+        )
+        return self._fill(keys, found, missing, vectors)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._missing("text", texts)
+        vectors = (
+            await self.embed_model._aget_text_embeddings([texts[i] for i in missing])
+            if missing
+            else []
+        )
+        return self._fill(keys, found, missing, vectors)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the underlying cache."""
+        return self._cache.stats()
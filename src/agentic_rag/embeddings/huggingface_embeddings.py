@@ -1,61 +1,152 @@
-"""Mock embedding model."""
-#  curl -X POST -H "Content-Type: application/json" -d {"text":"Hello"} https://92a4-34-126-120-144.ngrok-free.app/get_embeddings
+"""Remote embedding model served from google colab."""
+#  curl -X POST -H "Content-Type: application/json" -d {"text":"Hello"} https://92a4-34-126-120-144.ngrok-free.app/get_embeddings
+#  curl -X POST -H "Content-Type: application/json" -d {"texts":["Hello", "World"]} https://92a4-34-126-120-144.ngrok-free.app/get_embeddings_batch
+import asyncio
+import logging
+import os
 from typing import Any, List
 
 from llama_index.core.base.embeddings.base import BaseEmbedding
-import json
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
 
-# class Item(BaseModel):
-#     text : str
+from src.utils.http import AsyncClientPool, apost_json, build_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_SERVER_URL = os.environ.get(
+    "EMBEDDING_SERVER_URL", "http://localhost:8000"
+)
 
 
 class HuggingFaceEmbedding(BaseEmbedding):
-    """Mock embedding.
+    """Embeddings computed by a remote sentence-transformers server.
 
-    Used for token prediction.
+    Single texts go to ``/get_embeddings`` and batches (as sent by
+    ``get_text_embedding_batch``, ``embed_batch_size`` texts at a time) go to
+    ``/get_embeddings_batch`` over one pooled keep-alive session. The async
+    methods use a shared ``httpx.AsyncClient``; both have at most
+    ``max_concurrency`` requests in flight.
 
     Args:
         embed_dim (int): embedding dimension
 
     """
 
-    # embed_dim : int
+    embed_dim: int = Field(description="The embedding dimension.", gt=0)
+    server_url: str = Field(
+        default=DEFAULT_EMBEDDING_SERVER_URL,
+        description="Base url of the embedding server (env: EMBEDDING_SERVER_URL).",
+    )
+    endpoint: str = Field(
+        default="/get_embeddings", description="Path of the single text endpoint."
+    )
+    batch_endpoint: str = Field(
+        default="/get_embeddings_batch", description="Path of the batch endpoint."
+    )
+    timeout: float = Field(
+        default=30.0, description="Request timeout in seconds.", gt=0
+    )
+    max_retries: int = Field(
+        default=3, description="Retries on connection errors and 5xx.", ge=0
+    )
+    backoff_factor: float = Field(
+        default=0.5, description="Exponential backoff factor between retries.", ge=0
+    )
+    pool_maxsize: int = Field(
+        default=10, description="Maximum number of pooled connections.", gt=0
+    )
+    max_concurrency: int = Field(
+        default=16, description="Maximum in-flight requests.", gt=0
+    )
+
+    _session: Any = PrivateAttr()
+    _async_pool: Any = PrivateAttr()
 
     def __init__(self, embed_dim: int, **kwargs: Any) -> None:
         """Init params."""
         super().__init__(embed_dim=embed_dim, **kwargs)
+        self._session = build_session(
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            max_concurrency=self.max_concurrency,
+        )
+        self._async_pool = AsyncClientPool(
+            max_concurrency=self.max_concurrency, pool_maxsize=self.pool_maxsize
+        )
 
     @classmethod
     def class_name(cls) -> str:
         return "google colab embeddings"
 
+    def _url(self, endpoint: str) -> str:
+        return "{server_url}{endpoint}".format(
+            server_url=self.server_url.rstrip("/"), endpoint=endpoint
+        )
+
     ## send request here
     def _get_vector(self, text: str) -> List[float]:
-        # request to the google colab
-        import requests
-
-        # The API endpoint
-        # env var
-        server_url = "https://4635-34-126-120-144.ngrok-free.app"
-        url = "{server_url}/get_embeddings".format(server_url=server_url)
-
-        # Data to be sent
-        data = {
-                'text': text
-                }
-
-        # A POST request to the API
-        response = requests.post(url, json=data)
-        embed = response.json()['embed']
-        print(len(embed))
-
-        return embed
+        response = self._session.post(
+            self._url(self.endpoint), json={"text": text}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()["embed"]
+
+    def _get_vectors(self, texts: List[str]) -> List[List[float]]:
+        response = self._session.post(
+            self._url(self.batch_endpoint), json={"texts": texts}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        embeds = response.json()["embeds"]
+        if len(embeds) != len(texts):
+            raise ValueError(
+                f"Embedding server returned {len(embeds)} vectors for {len(texts)} texts."
+            )
+        logger.debug("embedded batch of %d texts", len(texts))
+        return embeds
+
+    async def _apost(self, endpoint: str, payload: dict) -> dict:
+        client, semaphore = self._async_pool.get()
+        async with semaphore:
+            return await apost_json(
+                client,
+                self._url(endpoint),
+                payload,
+                timeout=self.timeout,
+                max_retries=self.max_retries,
+                backoff_factor=self.backoff_factor,
+            )
+
+    async def _aget_vector(self, text: str) -> List[float]:
+        return (await self._apost(self.endpoint, {"text": text}))["embed"]
+
+    async def _aget_vectors(self, texts: List[str]) -> List[List[float]]:
+        embeds = (await self._apost(self.batch_endpoint, {"texts": texts}))["embeds"]
+        if len(embeds) != len(texts):
+            raise ValueError(
+                f"Embedding server returned {len(embeds)} vectors for {len(texts)} texts."
+            )
+        return embeds
 
     async def _aget_text_embedding(self, text: str) -> List[float]:
-        return self._get_vector()
+        return await self._aget_vector(text)
 
     async def _aget_query_embedding(self, query: str) -> List[float]:
-        return self._get_vector()
+        return await self._aget_vector(query)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get text embeddings, sending the batches concurrently."""
+        batches = await asyncio.gather(
+            *(
+                self._aget_vectors(texts[start : start + self.embed_batch_size])
+                for start in range(0, len(texts), self.embed_batch_size)
+            )
+        )
+        return [embed for batch in batches for embed in batch]
+
+    async def aclose(self) -> None:
+        """Close the async client of the current event loop."""
+        await self._async_pool.aclose()
 
     def _get_query_embedding(self, query: str) -> List[float]:
         """Get query embedding."""
@@ -65,7 +156,11 @@ class HuggingFaceEmbedding(BaseEmbedding):
         """Get text embedding."""
         return self._get_vector(text)
 
-
-
-test = HuggingFaceEmbedding(512)
-test._get_query_embedding('hello? how are you?')
\ No newline at end of file
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get text embeddings, one request per ``embed_batch_size`` texts."""
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            embeddings.extend(
+                self._get_vectors(texts[start : start + self.embed_batch_size])
+            )
+        return embeddings
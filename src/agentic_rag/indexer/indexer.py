@@ -1,37 +1,35 @@
-from src.agentic_rag.llms.llama import BaseLLM
 from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+from src.agentic_rag.embeddings.cache import CachedEmbedding
+from src.agentic_rag.indexer.manifest import Manifest
+from src.agentic_rag.indexer.pipeline import IndexingPipeline
+from src.agentic_rag.vector_stores.storage import DOCSTORES, VECTOR_STORES, get_storage_context, is_persisted
+from src.agentic_rag.vector_stores.ann import ANN_KINDS
+from src.agentic_rag.vector_stores.numpy_vector_store import SUPPORTED_DTYPES
+from src.agentic_rag.vector_stores.bm25 import BM25Index
 
+import argparse
 import os
 
 import logging
 import sys
-from pprint import pprint
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-logging.basicConfig(stream=sys.stdout, level=logging.INFO)
-logging.getLogger().addHandler(logging.StreamHandler(stream=sys.stdout))
 from llama_index.core import (
     VectorStoreIndex,
     SimpleDirectoryReader,
     load_index_from_storage,
-    StorageContext,
-    ServiceContext,
-    Document
 )
-from llama_index.core.node_parser import SentenceWindowNodeParser, HierarchicalNodeParser, get_leaf_nodes
-# from llama_index.text_splitter import SentenceSplitter
-from llama_index.core.schema import MetadataMode
-from llama_index.core.postprocessor import MetadataReplacementPostProcessor
+from llama_index.core.node_parser import SentenceWindowNodeParser
 from llama_index.core.prompts.prompts import SimpleInputPrompt
 from llama_index.core.callbacks import (
     CallbackManager,
     LlamaDebugHandler,
-    CBEventType,
 )
-import os
-from llama_index.core.postprocessor import MetadataReplacementPostProcessor, SentenceTransformerRerank
-from llama_index.core import load_index_from_storage
+from llama_index.core.schema import BaseNode
 from llama_index.core import Settings
 
+logger = logging.getLogger(__name__)
+
 os.environ['OPENAI_API_KEY'] = ''
 system_prompt = """You are a Q&A assistant.
     Your goal is to answer questions as accurately as possible based on the instructions and context providedin with detail
@@ -50,51 +48,231 @@ sentence_node_parser = SentenceWindowNodeParser.from_defaults(
 embed_model_name = "sentence-transformers/all-mpnet-base-v2"
 # embed_model_name = "path/to/folder"
 indexer_db = '/Users/asma/rag/willi_db/'
+# root = "/content/drive/MyDrive/rag/data/"
+root = "/Users/asma/rag/willi/"
 
-# print(embed_model_name)
-# print(indexer_db)
 
-embed_model = HuggingFaceEmbedding(model_name=embed_model_name, max_length=512, embed_dim=768)
-Settings.embed_model = embed_model
+def get_embed_model(persist_dir: str) -> CachedEmbedding:
+    embed_model = HuggingFaceEmbedding(model_name=embed_model_name, max_length=512, embed_dim=768, embed_batch_size=64)
+    # unchanged sentences are served from disk instead of being re-embedded
+    return CachedEmbedding(embed_model, cache_path=os.path.join(persist_dir, 'embedding_cache.sqlite'))
 
-llama_debug = LlamaDebugHandler(print_trace_on_end=True)
-callback_manager = CallbackManager([llama_debug])
-# ctx_sentence = ServiceContext.from_defaults(llm=llm, embed_model=embed_model, node_parser=sentence_node_parser, callback_manager=callback_manager)
 
+def find_files(root: str, required_exts: Sequence[str] = (".pdf",)) -> List[str]:
+    paths = []
+    for path, subdirs, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(tuple(required_exts)):
+                paths.append(os.path.abspath(os.path.join(path, name)))
+    return sorted(paths)
 
-# root = "/content/drive/MyDrive/rag/data/"
-root = "/Users/asma/rag/willi/"
-# print(root)
-# documents = []
-from tqdm import tqdm
-first_time = True
-counter = 1
-sentence_index = None
-
-
-for path, subdirs, files in os.walk(root):
-    for name in tqdm(files):
-        print(name, counter)
-        if os.path.join(path, name).endswith(".pdf"):
-            
-            if counter % 10 == 0:
-                print('saving started ....')
-                sentence_index.storage_context.persist(persist_dir=indexer_db)
-                sentence_index = load_index_from_storage(
-                StorageContext.from_defaults(persist_dir=indexer_db),
-                llm=llm, embed_model=embed_model, callback_manager=callback_manager
-                )
-            if first_time:
-                print(counter , ':' , os.path.join(path, name))
-                document = SimpleDirectoryReader(input_files=[os.path.join(path, name)]).load_data()
-                nodes = sentence_node_parser.get_nodes_from_documents(document)
-                sentence_index = VectorStoreIndex(nodes, embed_model=embed_model, callback_manager=callback_manager)
-                first_time = False
-            else:
-                print(counter , ':' ,os.path.join(path, name))
-                document = SimpleDirectoryReader(input_files=[os.path.join(path, name)]).load_data()
-                node = sentence_node_parser.get_nodes_from_documents(document)
-                sentence_index.insert_nodes(node)
-                counter += 1
-
-sentence_index.storage_context.persist(persist_dir=indexer_db)
\ No newline at end of file
+
+def parse_file(path: str) -> Tuple[List[str], List[BaseNode]]:
+    """Load one file and split it into sentence-window nodes.
+
+    ``filename_as_id`` makes document ids deterministic, so re-inserting a
+    file always replaces its previous documents.
+    """
+    documents = SimpleDirectoryReader(input_files=[path], filename_as_id=True).load_data()
+    nodes = sentence_node_parser.get_nodes_from_documents(documents)
+    return [document.doc_id for document in documents], nodes
+
+
+def open_index(
+    persist_dir: str,
+    embed_model,
+    callback_manager: Optional[CallbackManager] = None,
+    vector_store: Optional[str] = None,
+    docstore: Optional[str] = None,
+    **store_kwargs: Any,
+) -> VectorStoreIndex:
+    """Load the persisted index, or create an empty one on first run."""
+    storage_context = get_storage_context(persist_dir, vector_store, docstore, **store_kwargs)
+    if is_persisted(persist_dir):
+        return load_index_from_storage(
+            storage_context,
+            embed_model=embed_model, callback_manager=callback_manager, use_async=True
+        )
+    return VectorStoreIndex(
+        [], storage_context=storage_context,
+        embed_model=embed_model, callback_manager=callback_manager, use_async=True
+    )
+
+
+def open_bm25(persist_dir: str, index: VectorStoreIndex) -> BM25Index:
+    """Load the BM25 index, or build it from the nodes already indexed
+    (an index created before BM25 was added, or an empty one)."""
+    if BM25Index.exists(persist_dir):
+        return BM25Index.load(persist_dir)
+    nodes = list(index.docstore.docs.values())
+    if nodes:
+        logger.info('building the BM25 index of %d existing nodes', len(nodes))
+    return BM25Index.build(nodes)
+
+
+def delete_documents(
+    index: VectorStoreIndex, doc_ids: Sequence[str], bm25: Optional[BM25Index] = None
+) -> None:
+    for doc_id in doc_ids:
+        if index.docstore.get_ref_doc_info(doc_id) is not None:
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        if bm25 is not None:
+            bm25.delete(doc_id)
+
+
+def build_index(
+    root: str,
+    persist_dir: str,
+    embed_model=None,
+    checkpoint_every: int = 10,
+    required_exts: Sequence[str] = (".pdf",),
+    callback_manager: Optional[CallbackManager] = None,
+    parse_workers: int = 0,
+    embed_workers: int = 2,
+    queue_depth: int = 8,
+    vector_store: Optional[str] = None,
+    ann: Optional[str] = None,
+    bm25: bool = True,
+    docstore: Optional[str] = None,
+    **store_kwargs: Any,
+) -> Dict[str, Any]:
+    """Incrementally bring the index in ``persist_dir`` in line with ``root``.
+
+    Only new or changed files are parsed and embedded, nodes of removed
+    files are deleted, and every ``checkpoint_every`` files the store and
+    the manifest are persisted so an interrupted run resumes from there.
+    With ``parse_workers > 0`` files go through an :class:`IndexingPipeline`
+    instead of being parsed and embedded one at a time. ``vector_store``
+    picks the backend of a new index (``simple`` or ``numpy``) and ``ann``
+    (numpy only) an ANN index rebuilt whenever the vectors changed;
+    ``store_kwargs`` such as ``dtype`` (``float16``, ``int8``) and
+    ``keep_float32`` configure a new numpy store.
+    With ``bm25`` the BM25 index of hybrid retrieval is kept in step with
+    the sentence index and persisted at the same checkpoints. ``docstore``
+    picks the docstore of a new index: ``simple`` (JSON) or ``sentences``,
+    which stores every sentence once instead of in each window.
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    embed_model = embed_model or get_embed_model(persist_dir)
+    manifest = Manifest(persist_dir)
+    index = open_index(persist_dir, embed_model, callback_manager, vector_store, docstore, **store_kwargs)
+    sparse = open_bm25(persist_dir, index) if bm25 else None
+
+    added, updated, unchanged, removed = manifest.classify(find_files(root, required_exts))
+    report = {'skipped': len(unchanged), 'added': 0, 'updated': 0, 'removed': 0}
+    logger.info('%d new, %d changed, %d unchanged, %d removed files',
+                len(added), len(updated), len(unchanged), len(removed))
+
+    def checkpoint() -> None:
+        index.storage_context.persist(persist_dir=persist_dir)
+        if sparse is not None:
+            sparse.persist(persist_dir)
+        manifest.save()
+
+    for path in removed:
+        delete_documents(index, manifest.remove(path)['doc_ids'], sparse)
+        report['removed'] += 1
+
+    status = dict([(path, 'updated') for path in updated] + [(path, 'added') for path in added])
+    pending = 0
+
+    def commit(path: str, doc_ids: List[str], nodes: List[BaseNode]) -> None:
+        nonlocal pending
+        logger.info('%s: %s', status[path], path)
+        entry = manifest.get(path)
+        if entry is not None:
+            delete_documents(index, entry['doc_ids'], sparse)
+        # a run interrupted between persist and manifest.save may have
+        # committed this file already
+        delete_documents(index, doc_ids, sparse)
+        index.insert_nodes(nodes)
+        if sparse is not None:
+            sparse.add(nodes)
+        manifest.record(path, doc_ids, [node.node_id for node in nodes])
+        report[status[path]] += 1
+        pending += 1
+        if pending % checkpoint_every == 0:
+            checkpoint()
+
+    if parse_workers > 0:
+        pipeline = IndexingPipeline(
+            parse_file, embed_model, parse_workers=parse_workers,
+            embed_workers=embed_workers, queue_depth=queue_depth,
+        )
+        report['stages'] = pipeline.run(list(status), commit)
+    else:
+        for path in status:
+            commit(path, *parse_file(path))
+
+    checkpoint()
+    if ann:
+        store = index.vector_store
+        if not hasattr(store, 'build_ann'):
+            raise ValueError('ANN indexes require the numpy vector store')
+        # persisting changed vectors removes the stale index
+        if not store.ann_exists(ann):
+            store.build_ann(ann)
+    if hasattr(embed_model, 'stats'):
+        logger.info('embedding cache: %s', embed_model.stats())
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Incrementally index a directory of documents.")
+    parser.add_argument('--root', default=root, help="directory to index")
+    parser.add_argument('--persist-dir', default=indexer_db, help="index directory")
+    parser.add_argument('--checkpoint-every', type=int, default=10, help="persist every N files")
+    parser.add_argument('--ext', nargs='+', default=['.pdf'], help="file extensions to index")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="processes parsing files in a pipeline (0: parse serially)")
+    parser.add_argument('--embed-workers', type=int, default=2, help="threads embedding parsed files")
+    parser.add_argument('--queue-depth', type=int, default=8, help="files buffered between pipeline stages")
+    parser.add_argument('--vector-store', choices=VECTOR_STORES, default=None,
+                        help="vector store of a new index (default: simple, or what the index uses)")
+    parser.add_argument('--docstore', choices=DOCSTORES, default=None,
+                        help="docstore of a new index (default: simple, or what the index uses)")
+    parser.add_argument('--dtype', choices=SUPPORTED_DTYPES, default=None,
+                        help="storage dtype of the numpy vector store (default: float32, int8: "
+                             "scalar-quantized); implies --vector-store numpy")
+    parser.add_argument('--keep-float32', action='store_true',
+                        help="keep float32 vectors next to float16/int8 ones to rescore the top candidates; "
+                             "implies --vector-store numpy")
+    parser.add_argument('--ann', choices=ANN_KINDS, default=None,
+                        help="build an ANN index next to the numpy vector store")
+    parser.add_argument('--no-bm25', dest='bm25', action='store_false',
+                        help="do not maintain the BM25 index of hybrid retrieval")
+    parser.add_argument('--debug', action='store_true', help="print llama-index traces")
+    args = parser.parse_args(argv)
+    if args.dtype is not None or args.keep_float32:
+        if args.vector_store not in (None, 'numpy'):
+            parser.error('--dtype and --keep-float32 require the numpy vector store')
+        args.vector_store = 'numpy'
+    # only what was asked for: an existing store keeps its own options
+    store_kwargs = {}
+    if args.dtype is not None:
+        store_kwargs['dtype'] = args.dtype
+    if args.keep_float32:
+        store_kwargs['keep_float32'] = True
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    callback_manager = None
+    if args.debug:
+        callback_manager = CallbackManager([LlamaDebugHandler(print_trace_on_end=True)])
+
+    embed_model = get_embed_model(args.persist_dir)
+    Settings.embed_model = embed_model
+    report = build_index(
+        args.root, args.persist_dir, embed_model=embed_model,
+        checkpoint_every=args.checkpoint_every, required_exts=args.ext,
+        callback_manager=callback_manager, parse_workers=args.parse_workers,
+        embed_workers=args.embed_workers, queue_depth=args.queue_depth,
+        vector_store=args.vector_store, ann=args.ann, bm25=args.bm25, docstore=args.docstore,
+        **store_kwargs,
+    )
+    for stage, stats in report.get('stages', {}).items():
+        print('{}: {files} files, {nodes} nodes, {nodes_per_second} nodes/s, busy {busy_seconds}s'.format(stage, **stats))
+    print('skipped: {skipped}  added: {added}  updated: {updated}  removed: {removed}'.format(**report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Manifest of the files committed to a persisted sentence index."""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Maps every indexed file to its (size, mtime, sha256) and to the
+    document and node ids it produced.
+
+    The manifest is only saved right after the index itself was persisted,
+    so it always describes what is committed on disk and an interrupted run
+    can be resumed by indexing whatever it does not list.
+    """
+
+    def __init__(self, persist_dir: str) -> None:
+        self.path = os.path.join(persist_dir, MANIFEST_FILENAME)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                raise ValueError(
+                    f"Unsupported manifest version {data.get('version')} in {self.path}"
+                )
+            self.files = data["files"]
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(path)
+
+    def classify(
+        self, paths: Iterable[str]
+    ) -> Tuple[List[str], List[str], List[str], List[str]]:
+        """Split ``paths`` into (added, updated, unchanged, removed).
+
+        Files whose size and mtime match the manifest are not re-hashed; a
+        touched file with identical content only has its mtime refreshed.
+        """
+        added, updated, unchanged = [], [], []
+        seen = set()
+        for path in paths:
+            seen.add(path)
+            entry = self.files.get(path)
+            if entry is None:
+                added.append(path)
+                continue
+            stat = os.stat(path)
+            if stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]:
+                unchanged.append(path)
+            elif file_sha256(path) == entry["sha256"]:
+                entry["mtime"] = stat.st_mtime
+                unchanged.append(path)
+            else:
+                updated.append(path)
+        removed = [path for path in self.files if path not in seen]
+        return added, updated, unchanged, removed
+
+    def record(self, path: str, doc_ids: List[str], node_ids: List[str]) -> None:
+        stat = os.stat(path)
+        self.files[path] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": file_sha256(path),
+            "doc_ids": doc_ids,
+            "node_ids": node_ids,
+        }
+
+    def remove(self, path: str) -> Optional[Dict[str, Any]]:
+        return self.files.pop(path, None)
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
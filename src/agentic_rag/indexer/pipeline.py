@@ -0,0 +1,189 @@
+"""Staged producer/consumer pipeline feeding the sentence index.
+
+    files --> [parse: process pool] --queue--> [embed: threads] --queue--> writer
+
+PDF extraction and sentence-window parsing are CPU bound and run in a
+process pool; embedding is network bound and runs in a few threads sending
+batched requests; a single writer (the calling thread) inserts the already
+embedded nodes so the index is never mutated concurrently.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode
+
+logger = logging.getLogger(__name__)
+
+ParseFn = Callable[[str], Tuple[List[str], List[BaseNode]]]
+CommitFn = Callable[[str, List[str], List[BaseNode]], None]
+
+_DONE = object()
+
+
+def _timed_parse(parse_fn: ParseFn, path: str) -> Tuple[float, List[str], List[BaseNode]]:
+    start = time.perf_counter()
+    doc_ids, nodes = parse_fn(path)
+    return time.perf_counter() - start, doc_ids, nodes
+
+
+class StageStats:
+    """Items processed and time spent busy in one pipeline stage."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.files = 0
+        self.nodes = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, nodes: int, seconds: float) -> None:
+        with self._lock:
+            self.files += 1
+            self.nodes += nodes
+            self.busy += seconds
+
+    def as_dict(self, wall: float) -> Dict[str, Any]:
+        return {
+            "files": self.files,
+            "nodes": self.nodes,
+            "busy_seconds": round(self.busy, 3),
+            "nodes_per_second": round(self.nodes / wall, 1) if wall else 0.0,
+        }
+
+
+class IndexingPipeline:
+    """Parse, embed and commit files with the stages running concurrently.
+
+    Args:
+        parse_fn: picklable function returning (doc_ids, nodes) for a path
+        embed_model: model used to embed the parsed nodes
+        parse_workers: processes extracting and parsing files
+        embed_workers: threads sending embedding requests
+        queue_depth: parsed/embedded files buffered between stages
+
+    """
+
+    def __init__(
+        self,
+        parse_fn: ParseFn,
+        embed_model: BaseEmbedding,
+        parse_workers: Optional[int] = None,
+        embed_workers: int = 2,
+        queue_depth: int = 8,
+    ) -> None:
+        self.parse_fn = parse_fn
+        self.embed_model = embed_model
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.embed_workers = embed_workers
+        self.queue_depth = queue_depth
+        self.stats = {
+            name: StageStats(name) for name in ("parse", "embed", "write")
+        }
+        self.wall = 0.0
+        self._errors: List[BaseException] = []
+
+    def _parse_stage(self, paths: Sequence[str], parsed: queue.Queue) -> None:
+        try:
+            # keep at most queue_depth files in flight in the pool, in order
+            with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+                in_flight: deque = deque()
+                for path in paths:
+                    if self._errors:
+                        break
+                    in_flight.append(
+                        (path, pool.submit(_timed_parse, self.parse_fn, path))
+                    )
+                    if len(in_flight) >= self.queue_depth:
+                        self._emit(in_flight.popleft(), parsed)
+                while in_flight and not self._errors:
+                    self._emit(in_flight.popleft(), parsed)
+                for _, future in in_flight:
+                    future.cancel()
+        except BaseException as exc:
+            self._errors.append(exc)
+        finally:
+            for _ in range(self.embed_workers):
+                parsed.put(_DONE)
+
+    def _emit(self, item: Tuple[str, Any], parsed: queue.Queue) -> None:
+        path, future = item
+        seconds, doc_ids, nodes = future.result()
+        self.stats["parse"].add(len(nodes), seconds)
+        parsed.put((path, doc_ids, nodes))
+
+    def _embed_stage(self, parsed: queue.Queue, embedded: queue.Queue) -> None:
+        # after a failure keep draining so upstream puts never block forever
+        while True:
+            item = parsed.get()
+            if item is _DONE:
+                embedded.put(_DONE)
+                return
+            if self._errors:
+                continue
+            path, doc_ids, nodes = item
+            try:
+                start = time.perf_counter()
+                texts = [
+                    node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes
+                ]
+                for node, embedding in zip(
+                    nodes, self.embed_model.get_text_embedding_batch(texts)
+                ):
+                    node.embedding = embedding
+                self.stats["embed"].add(len(nodes), time.perf_counter() - start)
+            except BaseException as exc:
+                self._errors.append(exc)
+                continue
+            embedded.put((path, doc_ids, nodes))
+
+    def run(self, paths: Sequence[str], commit: CommitFn) -> Dict[str, Dict[str, Any]]:
+        """Run the pipeline over ``paths``, calling ``commit`` for every file
+        in the writer thread, and return per-stage throughput."""
+        parsed: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+        embedded: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+        self._errors = []
+
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._parse_stage, args=(paths, parsed), daemon=True)
+        ] + [
+            threading.Thread(
+                target=self._embed_stage, args=(parsed, embedded), daemon=True
+            )
+            for _ in range(self.embed_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        done = 0
+        while done < self.embed_workers:
+            item = embedded.get()
+            if item is _DONE:
+                done += 1
+                continue
+            if self._errors:
+                continue
+            path, doc_ids, nodes = item
+            try:
+                write_start = time.perf_counter()
+                commit(path, doc_ids, nodes)
+                self.stats["write"].add(len(nodes), time.perf_counter() - write_start)
+            except BaseException as exc:
+                self._errors.append(exc)
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+        self.wall = time.perf_counter() - start
+        report = {name: stats.as_dict(self.wall) for name, stats in self.stats.items()}
+        for name, stage in report.items():
+            logger.info("%s stage: %s", name, stage)
+        return report
@@ -0,0 +1,122 @@
+"""Client-side coalescing of concurrent completion requests.
+
+``CompletionBatcher`` collects the prompts submitted by concurrent callers
+for up to ``window_ms`` after the first one (or until ``max_batch_size``
+prompts are waiting) and sends them as one request to the batch endpoint.
+Identical prompts already in flight share a single generation instead of
+being generated twice; every caller still gets a future of its own, so a
+caller that gives up (cancels) does not cancel the others.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+SendBatch = Callable[[List[str]], List[Any]]
+
+
+class CompletionBatcher:
+    """Coalesce prompts into batched requests.
+
+    Args:
+        send_batch: sends a list of prompts, returns one result per prompt
+        window_ms: how long the first prompt of a batch waits for others
+        max_batch_size: prompts per batched request at most
+        max_inflight_batches: batched requests sent concurrently
+
+    """
+
+    def __init__(
+        self,
+        send_batch: SendBatch,
+        window_ms: float = 10.0,
+        max_batch_size: int = 16,
+        max_inflight_batches: int = 4,
+    ) -> None:
+        self.send_batch = send_batch
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.submitted = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.prompts_sent = 0
+        self._lock = threading.Lock()
+        # prompt -> the futures of every caller waiting for it
+        self._inflight: Dict[str, List[Future]] = {}
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._senders = ThreadPoolExecutor(
+            max_workers=max_inflight_batches, thread_name_prefix="llm-batch"
+        )
+        self._worker = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str) -> Future:
+        """Future of the completion of ``prompt``."""
+        future: Future = Future()
+        with self._lock:
+            self.submitted += 1
+            waiters = self._inflight.get(prompt)
+            if waiters is not None:
+                self.deduplicated += 1
+                waiters.append(future)
+                return future
+            self._inflight[prompt] = [future]
+        self._queue.put(prompt)
+        return future
+
+    def _run(self) -> None:
+        while True:
+            prompts = [self._queue.get()]
+            deadline = time.monotonic() + self.window_ms / 1000.0
+            while len(prompts) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    prompts.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._senders.submit(self._send, prompts)
+
+    def _send(self, prompts: List[str]) -> None:
+        logger.debug("sending a batch of %d prompts", len(prompts))
+        try:
+            results = self.send_batch(prompts)
+            if len(results) != len(prompts):
+                raise ValueError(
+                    f"batch endpoint returned {len(results)} results for {len(prompts)} prompts"
+                )
+        except BaseException as exc:
+            results = None
+            error = exc
+        with self._lock:
+            self.batches += 1
+            self.prompts_sent += len(prompts)
+            waiters = [self._inflight.pop(prompt) for prompt in prompts]
+        for i, futures in enumerate(waiters):
+            for future in futures:
+                # skip callers that cancelled; once running, a future
+                # can no longer be cancelled under us
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if results is None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[i])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "batches": self.batches,
+                "prompts_sent": self.prompts_sent,
+                "prompts_per_batch": self.prompts_sent / self.batches if self.batches else 0.0,
+            }
+
+    def close(self) -> None:
+        self._senders.shutdown(wait=True)
@@ -0,0 +1,227 @@
+"""Persistent response cache in front of the remote LLM.
+
+``ResponseCache`` has two tiers over one SQLite file:
+
+* exact: answers keyed by a hash of the prompt (or question plus retrieved
+  source ids), byte for byte but for trailing whitespace: case and
+  indentation change the meaning of code, and
+* semantic: answers whose question embedding is within
+  ``similarity_threshold`` (cosine) of the new question *and* that were
+  generated from the same source nodes.
+
+Entries expire after ``ttl_seconds`` and the least recently used tenth is
+evicted when the cache grows past ``max_entries``. ``CachedLLM`` (in
+:mod:`cached_llm`) puts the exact tier in front of an LLM.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def sources_key(source_ids: Iterable[str]) -> str:
+    """Order independent hash of the source node ids behind an answer."""
+    return hashlib.sha256("\x00".join(sorted(source_ids)).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Exact and semantic answer cache persisted in SQLite.
+
+    Semantic entries are also kept in memory, grouped by their sources key,
+    so a lookup only compares the question against answers built from the
+    same retrieved nodes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        max_entries: int = 100_000,
+        similarity_threshold: float = 0.95,
+    ) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._semantic: Dict[str, Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, sources TEXT, "
+            "embedding BLOB, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._conn.commit()
+        with self._lock:
+            self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            self._expire()
+            for key, sources, blob in self._conn.execute(
+                "SELECT key, sources, embedding FROM responses WHERE embedding IS NOT NULL"
+            ):
+                self._semantic.setdefault(sources, {})[key] = np.frombuffer(blob, dtype=np.float32)
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _expire(self) -> None:
+        if self.ttl_seconds is None:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            (key, sources)
+            for key, sources in self._conn.execute(
+                "SELECT key, sources FROM responses WHERE created < ?", (cutoff,)
+            )
+        ]
+        if not expired:
+            return
+        self._forget(expired)
+        self.expirations += len(expired)
+
+    def _forget(self, rows: List[Tuple[str, Optional[str]]]) -> None:
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in rows])
+        for key, sources in rows:
+            self._semantic.get(sources, {}).pop(key, None)
+        self._size -= len(rows)
+        self._conn.commit()
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT response, sources, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        response, sources, created = row
+        if self.ttl_seconds is not None and created < time.time() - self.ttl_seconds:
+            self._forget([(key, sources)])
+            self.expirations += 1
+            return None
+        self._conn.execute(
+            "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+        )
+        self._conn.commit()
+        return json.loads(response)
+
+    def get(
+        self,
+        key: str,
+        embedding: Optional[Sequence[float]] = None,
+        source_ids: Optional[Iterable[str]] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Look ``key`` up, then (given ``embedding``) the semantic tier.
+
+        Returns the cached response and the tier it came from
+        (``"exact"``, ``"semantic"`` or None on a miss).
+        """
+        with self._lock:
+            response = self._load(key)
+            if response is not None:
+                self.exact_hits += 1
+                return response, "exact"
+            if embedding is not None and self.similarity_threshold is not None:
+                candidates = self._semantic.get(sources_key(source_ids or ()), {})
+                if candidates:
+                    keys = list(candidates)
+                    scores = np.stack([candidates[k] for k in keys]) @ self._unit(embedding)
+                    for i in np.argsort(-scores):
+                        if scores[i] < self.similarity_threshold:
+                            break
+                        response = self._load(keys[i])
+                        if response is not None:
+                            self.semantic_hits += 1
+                            return response, "semantic"
+            self.misses += 1
+            return None, None
+
+    def put(
+        self,
+        key: str,
+        response: Dict[str, Any],
+        embedding: Optional[Sequence[float]] = None,
+        source_ids: Optional[Iterable[str]] = None,
+    ) -> None:
+        """Store ``response``; with ``embedding`` it also joins the semantic tier."""
+        sources = sources_key(source_ids or ())
+        blob = self._unit(embedding).tobytes() if embedding is not None else None
+        now = time.time()
+        with self._lock:
+            existed = self._conn.execute(
+                "SELECT 1 FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, response, sources, embedding, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(response), sources, blob, now, now),
+            )
+            if not existed:
+                self._size += 1
+            if blob is not None:
+                self._semantic.setdefault(sources, {})[key] = np.frombuffer(blob, dtype=np.float32)
+            if self._size > self.max_entries:
+                self._expire()
+            if self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        excess = self._size - int(self.max_entries * 0.9)
+        rows = self._conn.execute(
+            "SELECT key, sources FROM responses ORDER BY last_access LIMIT ?", (excess,)
+        ).fetchall()
+        self._forget(rows)
+        self.evictions += len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._semantic.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": self._size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,198 @@
+"""Exact-match response cache in front of an LLM."""
+import json
+from typing import Any, Dict, Optional, Sequence
+
+from llama_index.core.base.llms.generic_utils import (
+    astream_completion_response_to_chat_response,
+    completion_response_to_chat_response,
+    stream_completion_response_to_chat_response,
+)
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+
+from src.agentic_rag.llms.cache import ResponseCache
+
+
+class CachedLLM(CustomLLM):
+    """Exact-match response cache in front of an LLM.
+
+    ``complete``/``chat`` (and their streaming variants) answer from the
+    cache when the same prompt (trailing whitespace aside: case and
+    indentation matter in code) was sent with the same keyword arguments
+    before; otherwise the wrapped model is called and its full answer
+    stored. Calls with arguments that do not serialize to JSON bypass the
+    cache. The semantic tier needs the
+    question embedding and retrieved nodes, so it lives in ``Engine.query``;
+    ``main.build_router`` wraps the router's model (routing and code
+    generation prompts) when ``RESPONSE_CACHE`` is set.
+
+    Args:
+        llm: the model to cache
+        cache: a :class:`ResponseCache`, or ``cache_path`` to open one
+
+    """
+
+    llm: Any = Field(description="The wrapped LLM.")
+
+    _cache: ResponseCache = PrivateAttr()
+
+    def __init__(
+        self,
+        llm: Any,
+        cache: Optional[ResponseCache] = None,
+        cache_path: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        if cache is None:
+            if cache_path is None:
+                raise ValueError("Either cache or cache_path must be given.")
+            cache = ResponseCache(cache_path)
+        super().__init__(llm=llm, **kwargs)
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "cached_llm"
+
+    @property
+    def cache(self) -> ResponseCache:
+        return self._cache
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self.llm.metadata
+
+    def _key(self, prompt: str, formatted: bool, kwargs: Dict[str, Any]) -> Optional[str]:
+        try:
+            options = json.dumps(kwargs, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return self._cache.make_key(
+            self.llm.metadata.model_name, str(formatted), options, prompt.rstrip()
+        )
+
+    def _lookup(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        return self._cache.get(key)[0] if key is not None else None
+
+    def _store(self, key: Optional[str], text: str) -> None:
+        if key is not None:
+            self._cache.put(key, {"text": text})
+
+    @llm_completion_callback()
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        key = self._key(prompt, formatted, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return CompletionResponse(text=cached["text"])
+        response = self.llm.complete(prompt, formatted=formatted, **kwargs)
+        self._store(key, response.text)
+        return response
+
+    @llm_completion_callback()
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        key = self._key(prompt, formatted, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return CompletionResponse(text=cached["text"])
+        response = await self.llm.acomplete(prompt, formatted=formatted, **kwargs)
+        self._store(key, response.text)
+        return response
+
+    @llm_completion_callback()
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        key = self._key(prompt, formatted, kwargs)
+        cached = self._lookup(key)
+
+        def gen() -> CompletionResponseGen:
+            if cached is not None:
+                yield CompletionResponse(text=cached["text"], delta=cached["text"])
+                return
+            response = None
+            for response in self.llm.stream_complete(prompt, formatted=formatted, **kwargs):
+                yield response
+            # only complete answers are cached
+            if response is not None:
+                self._store(key, response.text)
+
+        return gen()
+
+    @llm_completion_callback()
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        key = self._key(prompt, formatted, kwargs)
+        cached = self._lookup(key)
+
+        async def gen() -> CompletionResponseAsyncGen:
+            if cached is not None:
+                yield CompletionResponse(text=cached["text"], delta=cached["text"])
+                return
+            response = None
+            async for response in await self.llm.astream_complete(
+                prompt, formatted=formatted, **kwargs
+            ):
+                yield response
+            if response is not None:
+                self._store(key, response.text)
+
+        return gen()
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        prompt = self.llm.messages_to_prompt(messages)
+        return completion_response_to_chat_response(
+            self.complete(prompt, formatted=True, **kwargs)
+        )
+
+    @llm_chat_callback()
+    async def achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        prompt = self.llm.messages_to_prompt(messages)
+        return completion_response_to_chat_response(
+            await self.acomplete(prompt, formatted=True, **kwargs)
+        )
+
+    @llm_chat_callback()
+    def stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseGen:
+        prompt = self.llm.messages_to_prompt(messages)
+        return stream_completion_response_to_chat_response(
+            self.stream_complete(prompt, formatted=True, **kwargs)
+        )
+
+    @llm_chat_callback()
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        prompt = self.llm.messages_to_prompt(messages)
+        return astream_completion_response_to_chat_response(
+            await self.astream_complete(prompt, formatted=True, **kwargs)
+        )
+
+    async def aclose(self) -> None:
+        """Close the wrapped model's clients; the cache may be shared."""
+        if hasattr(self.llm, "aclose"):
+            await self.llm.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the underlying cache."""
+        return self._cache.stats()
@@ -1,20 +1,26 @@
 
 # curl -X POST -H "Content-Type: application/json" -d {"text":"Hello how are you"} https://9a3e-34-143-216-221.ngrok-free.app/llm_complete
+# curl -N -X POST -H "Content-Type: application/json" -d {"text":"Hello how are you"} https://9a3e-34-143-216-221.ngrok-free.app/llm_stream
 
 
 
 
+import asyncio
 import logging
-from threading import Thread
+import os
+import time
 from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Union
 
-from llama_index.legacy.bridge.pydantic import Field, PrivateAttr
-from llama_index.legacy.callbacks import CallbackManager
-from llama_index.legacy.constants import (
-    DEFAULT_CONTEXT_WINDOW,
-    DEFAULT_NUM_OUTPUTS,
+from llama_index.core import Settings
+from llama_index.core.base.llms.generic_utils import (
+    astream_completion_response_to_chat_response,
+    completion_response_to_chat_response,
+    stream_completion_response_to_chat_response,
+)
+from llama_index.core.base.llms.generic_utils import (
+    messages_to_prompt as generic_messages_to_prompt,
 )
-from llama_index.legacy.core.llms.types import (
+from llama_index.core.base.llms.types import (
     ChatMessage,
     ChatResponse,
     ChatResponseAsyncGen,
@@ -25,22 +31,32 @@ from llama_index.legacy.core.llms.types import (
     LLMMetadata,
     MessageRole,
 )
-from llama_index.legacy.llms.base import (
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.constants import (
+    DEFAULT_CONTEXT_WINDOW,
+    DEFAULT_NUM_OUTPUTS,
+)
+from llama_index.core.llms.callbacks import (
     llm_chat_callback,
     llm_completion_callback,
 )
-from llama_index.legacy.llms.custom import CustomLLM
-from llama_index.legacy.llms.generic_utils import (
-    completion_response_to_chat_response,
-    stream_completion_response_to_chat_response,
-)
-from llama_index.legacy.llms.generic_utils import (
-    messages_to_prompt as generic_messages_to_prompt,
+from llama_index.core.llms.custom import CustomLLM
+from llama_index.core.prompts.base import PromptTemplate
+from llama_index.core.types import BaseOutputParser, PydanticProgramMode
+
+from src.agentic_rag.llms.batching import CompletionBatcher
+from src.utils.http import (
+    AsyncClientPool,
+    apost_json,
+    astream_json,
+    build_session,
+    iter_json_stream,
 )
-from llama_index.legacy.prompts.base import PromptTemplate
-from llama_index.legacy.types import BaseOutputParser, PydanticProgramMode
+from src.utils.tracing import tracer
 
 DEFAULT_HUGGINGFACE_MODEL = "StabilityAI/stablelm-tuned-alpha-3b"
+DEFAULT_LLM_SERVER_URL = os.environ.get("LLM_SERVER_URL", "http://localhost:8000")
 if TYPE_CHECKING:
     try:
         from huggingface_hub import AsyncInferenceClient, InferenceClient
@@ -55,8 +71,34 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+def _completion_tokens(response: Dict[str, Any]) -> int:
+    """Generated tokens of a server response: its ``raw`` tokens when it
+    returns them, else the text counted with the default tokenizer."""
+    tokens = response.get("raw")
+    if isinstance(tokens, list):
+        return len(tokens)
+    return len(Settings.tokenizer(response["text"]))
+
+
 class HuggingFaceLLM(CustomLLM):
-    """HuggingFace LLM."""
+    """HuggingFace LLM served from google colab.
+
+    ``complete`` posts the prompt to ``/llm_complete`` and waits for the whole
+    answer. ``stream_complete`` posts it to ``/llm_stream``, which answers
+    with server-sent events or JSON lines (``{"delta": "..."}`` per token,
+    optionally ending with ``[DONE]``), and yields every token as it arrives.
+
+    Sync calls share one pooled keep-alive session, the async methods an
+    ``httpx.AsyncClient``; both have at most ``max_concurrency`` requests in
+    flight and retry connection errors and 5xx with jittered exponential
+    backoff.
+
+    With ``batch_window_ms > 0``, ``complete``/``acomplete`` prompts sent
+    concurrently within the window are coalesced into one request to
+    ``/llm_complete_batch`` (``{"texts": [...]}`` answered with
+    ``{"completions": [{"text": ..., "raw": ...}, ...]}``), and identical
+    prompts in flight share one answer.
+    """
 
     model_name: str = Field(
         default=DEFAULT_HUGGINGFACE_MODEL,
@@ -135,9 +177,51 @@ class HuggingFaceLLM(CustomLLM):
         ),
     )
 
-    _model: Any = PrivateAttr()
-    _tokenizer: Any = PrivateAttr()
-    _stopping_criteria: Any = PrivateAttr()
+    server_url: str = Field(
+        default=DEFAULT_LLM_SERVER_URL,
+        description="Base url of the LLM server (env: LLM_SERVER_URL).",
+    )
+    complete_endpoint: str = Field(
+        default="/llm_complete", description="Path of the completion endpoint."
+    )
+    stream_endpoint: str = Field(
+        default="/llm_stream", description="Path of the streaming endpoint."
+    )
+    batch_endpoint: str = Field(
+        default="/llm_complete_batch", description="Path of the batch completion endpoint."
+    )
+    batch_window_ms: float = Field(
+        default=0.0,
+        description="Coalesce concurrent completions arriving within this window, 0 disables.",
+        ge=0,
+    )
+    max_batch_size: int = Field(
+        default=16, description="Maximum prompts per batched request.", gt=0
+    )
+    timeout: float = Field(
+        default=120.0,
+        description="Seconds to wait for the server to respond or send the next token.",
+        gt=0,
+    )
+    max_retries: int = Field(
+        default=3, description="Retries on connection errors and 5xx.", ge=0
+    )
+    backoff_factor: float = Field(
+        default=0.5, description="Exponential backoff factor between retries.", ge=0
+    )
+    pool_maxsize: int = Field(
+        default=10, description="Maximum number of pooled connections.", gt=0
+    )
+    max_concurrency: int = Field(
+        default=16, description="Maximum in-flight requests.", gt=0
+    )
+
+    _model: Any = PrivateAttr(default=None)
+    _tokenizer: Any = PrivateAttr(default=None)
+    _stopping_criteria: Any = PrivateAttr(default=None)
+    _session: Any = PrivateAttr()
+    _async_pool: Any = PrivateAttr()
+    _batcher: Any = PrivateAttr(default=None)
 
     def __init__(
         self,
@@ -161,6 +245,7 @@ class HuggingFaceLLM(CustomLLM):
         completion_to_prompt: Optional[Callable[[str], str]] = None,
         pydantic_program_mode: PydanticProgramMode = PydanticProgramMode.DEFAULT,
         output_parser: Optional[BaseOutputParser] = None,
+        **kwargs: Any,
     ) -> None:
         # """Initialize params."""
         # try:
@@ -250,7 +335,24 @@ class HuggingFaceLLM(CustomLLM):
             completion_to_prompt=completion_to_prompt,
             pydantic_program_mode=pydantic_program_mode,
             output_parser=output_parser,
+            **kwargs,
+        )
+        self._session = build_session(
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            max_concurrency=self.max_concurrency,
+        )
+        self._async_pool = AsyncClientPool(
+            max_concurrency=self.max_concurrency, pool_maxsize=self.pool_maxsize
         )
+        if self.batch_window_ms > 0:
+            self._batcher = CompletionBatcher(
+                self._send_batch,
+                window_ms=self.batch_window_ms,
+                max_batch_size=self.max_batch_size,
+                max_inflight_batches=self.pool_maxsize,
+            )
 
     @classmethod
     def class_name(cls) -> str:
@@ -278,87 +380,146 @@ class HuggingFaceLLM(CustomLLM):
 
         return generic_messages_to_prompt(messages)
 
-    @llm_completion_callback()
-    def complete(
-        self, prompt: str, formatted: bool = False, **kwargs: Any
-    ) -> CompletionResponse:
-
-
+    def _url(self, endpoint: str) -> str:
+        return f"{self.server_url.rstrip('/')}{endpoint}"
 
-               # request to the google colab
-        import requests
-
-        # The API endpoint
-        # env var
-        server_url = "https://66e2-34-173-202-254.ngrok-free.app"
-        url = "{server_url}/llm_complete".format(server_url=server_url)
-
-        # Data to be sent
-        data = {
-                'text': prompt
-                }
-
-        # A POST request to the API
-        response = requests.post(url, json=data).json()
-        # print(response.json())
-        completion = response['text']
-        print(completion)
-        tokens = response['raw']
-        print(completion)
+    def _full_prompt(self, prompt: str, formatted: bool) -> str:
+        full_prompt = prompt
+        if not formatted:
+            if self.query_wrapper_prompt:
+                full_prompt = self.query_wrapper_prompt.format(query_str=prompt)
+            if self.system_prompt:
+                full_prompt = f"{self.system_prompt} {full_prompt}"
+        return full_prompt
 
+    def _send_batch(self, prompts: List[str]) -> List[Dict[str, Any]]:
+        response = self._session.post(
+            self._url(self.batch_endpoint), json={"texts": prompts}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()["completions"]
 
+    def batch_stats(self) -> Dict[str, Any]:
+        """Coalescing counters, empty when batching is disabled."""
+        return self._batcher.stats() if self._batcher is not None else {}
 
-        return CompletionResponse(text=completion, raw={"model_output": tokens})
+    @llm_completion_callback()
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        start = time.perf_counter()
+        full_prompt = self._full_prompt(prompt, formatted)
+        if self._batcher is not None:
+            response = self._batcher.submit(full_prompt).result()
+        else:
+            response = self._session.post(
+                self._url(self.complete_endpoint), json={"text": full_prompt}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            response = response.json()
+            logger.debug("completion: %s", response["text"])
+        tracer.record_completion(full_prompt, _completion_tokens(response), time.perf_counter() - start)
+
+        return CompletionResponse(
+            text=response["text"], raw={"model_output": response.get("raw")}
+        )
 
     @llm_completion_callback()
     def stream_complete(
         self, prompt: str, formatted: bool = False, **kwargs: Any
     ) -> CompletionResponseGen:
         """Streaming completion endpoint."""
-        from transformers import TextIteratorStreamer
-
-        full_prompt = prompt
-        if not formatted:
-            if self.query_wrapper_prompt:
-                full_prompt = self.query_wrapper_prompt.format(query_str=prompt)
-            if self.system_prompt:
-                full_prompt = f"{self.system_prompt} {full_prompt}"
+        start = time.perf_counter()
+        data = {"text": self._full_prompt(prompt, formatted)}
+        response = self._session.post(
+            self._url(self.stream_endpoint), json=data, stream=True, timeout=self.timeout
+        )
+        response.raise_for_status()
 
-        inputs = self._tokenizer(full_prompt, return_tensors="pt")
-        inputs = inputs.to(self._model.device)
+        # create generator based off of the token stream
+        def gen() -> CompletionResponseGen:
+            text = ""
+            deltas = 0
+            first_token = None
+            with response:
+                response.encoding = response.encoding or "utf-8"
+                lines = response.iter_lines(decode_unicode=True)
+                for event in iter_json_stream(lines):
+                    delta = event.get("delta", "")
+                    if not delta:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    text += delta
+                    deltas += 1
+                    yield CompletionResponse(text=text, delta=delta)
+            # the server streams one token per event
+            tracer.record_completion(data["text"], deltas, time.perf_counter() - start, first_token)
 
-        # remove keys from the tokenizer if needed, to avoid HF errors
-        for key in self.tokenizer_outputs_to_remove:
-            if key in inputs:
-                inputs.pop(key, None)
+        return gen()
 
-        streamer = TextIteratorStreamer(
-            self._tokenizer,
-            skip_prompt=True,
-            decode_kwargs={"skip_special_tokens": True},
-        )
-        generation_kwargs = dict(
-            inputs,
-            streamer=streamer,
-            max_new_tokens=self.max_new_tokens,
-            stopping_criteria=self._stopping_criteria,
-            **self.generate_kwargs,
+    @llm_completion_callback()
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        start = time.perf_counter()
+        full_prompt = self._full_prompt(prompt, formatted)
+        if self._batcher is not None:
+            response = await asyncio.wrap_future(self._batcher.submit(full_prompt))
+        else:
+            client, semaphore = self._async_pool.get()
+            async with semaphore:
+                response = await apost_json(
+                    client,
+                    self._url(self.complete_endpoint),
+                    {"text": full_prompt},
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    backoff_factor=self.backoff_factor,
+                )
+        tracer.record_completion(full_prompt, _completion_tokens(response), time.perf_counter() - start)
+        return CompletionResponse(
+            text=response["text"], raw={"model_output": response.get("raw")}
         )
 
-        # generate in background thread
-        # NOTE/TODO: token counting doesn't work with streaming
-        thread = Thread(target=self._model.generate, kwargs=generation_kwargs)
-        thread.start()
+    @llm_completion_callback()
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        data = {"text": self._full_prompt(prompt, formatted)}
+        client, semaphore = self._async_pool.get()
 
-        # create generator based off of streamer
-        def gen() -> CompletionResponseGen:
+        async def gen() -> CompletionResponseAsyncGen:
+            start = time.perf_counter()
             text = ""
-            for x in streamer:
-                text += x
-                yield CompletionResponse(text=text, delta=x)
+            deltas = 0
+            first_token = None
+            # the slot is held until the stream is consumed or closed
+            async with semaphore:
+                async for event in astream_json(
+                    client,
+                    self._url(self.stream_endpoint),
+                    data,
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    backoff_factor=self.backoff_factor,
+                ):
+                    delta = event.get("delta", "")
+                    if not delta:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    text += delta
+                    deltas += 1
+                    yield CompletionResponse(text=text, delta=delta)
+            tracer.record_completion(data["text"], deltas, time.perf_counter() - start, first_token)
 
         return gen()
 
+    async def aclose(self) -> None:
+        """Close the pooled async client."""
+        await self._async_pool.aclose()
+
     @llm_chat_callback()
     def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
         prompt = self.messages_to_prompt(messages)
@@ -373,6 +534,24 @@ class HuggingFaceLLM(CustomLLM):
         completion_response = self.stream_complete(prompt, formatted=True, **kwargs)
         return stream_completion_response_to_chat_response(completion_response)
 
+    @llm_chat_callback()
+    async def achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        prompt = self.messages_to_prompt(messages)
+        completion_response = await self.acomplete(prompt, formatted=True, **kwargs)
+        return completion_response_to_chat_response(completion_response)
+
+    @llm_chat_callback()
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        prompt = self.messages_to_prompt(messages)
+        completion_response = await self.astream_complete(
+            prompt, formatted=True, **kwargs
+        )
+        return astream_completion_response_to_chat_response(completion_response)
+
 
 def chat_messages_to_conversational_kwargs(
     messages: Sequence[ChatMessage],
@@ -401,8 +580,3 @@ def chat_messages_to_conversational_kwargs(
             kwargs["generated_responses"].append(assistant_msg.content)
     return kwargs
 
-
-
-
-llm = HuggingFaceLLM()
-llm.complete('Hello can you tell me who is the united states president in 1950?')
\ No newline at end of file
@@ -0,0 +1,402 @@
+"""Bounded, summarized chat history of many concurrent sessions.
+
+A session's history is an LLM-written summary of its older turns plus the
+turns since. :meth:`SessionStore.history` returns the summary and the most
+recent turns that fit ``token_limit``, so a chat engine sends (and
+condenses) a bounded prompt however long the session runs.
+
+When a session's unsummarized turns exceed ``summarize_after_tokens``, a
+background worker folds all but the last ``keep_recent_tokens`` into the
+summary; requests never wait for it, and until it is done :meth:`history`
+simply drops the oldest turns. Summarized turns are deleted.
+
+Sessions are persisted in SQLite and at most ``max_cached_sessions`` are
+kept in memory (least recently used first out); an evicted session is
+loaded back on its next turn. :meth:`SessionStore.memory` wraps a session
+in a llama-index ``BaseMemory`` for the chat engines.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from llama_index.core import Settings
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.memory.types import BaseMemory
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "You keep notes on a tutoring conversation about machine learning. "
+    "Update the summary with the new turns. Keep the student's goals, what "
+    "was explained, open questions and any code or dataset in use; drop "
+    "pleasantries. Answer with the summary only, in at most {max_words} words.\n\n"
+    "Summary so far:\n{summary}\n\nNew turns:\n{turns}\n\nUpdated summary:"
+)
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+class _Session:
+    __slots__ = (
+        "session_id", "summary", "summary_tokens", "messages", "lock", "summarizing", "generation",
+    )
+
+    def __init__(self, session_id: str) -> None:
+        self.session_id = session_id
+        self.summary = ""
+        self.summary_tokens = 0
+        # (seq, message, tokens) of the turns not folded into the summary
+        self.messages: List[Tuple[int, ChatMessage, int]] = []
+        self.lock = threading.Lock()
+        self.summarizing = False
+        # bumped when the session is cleared or expired, so a summary of
+        # the old turns that finishes afterwards is dropped
+        self.generation = 0
+
+    def next_seq(self) -> int:
+        return self.messages[-1][0] + 1 if self.messages else 0
+
+    def unsummarized_tokens(self) -> int:
+        return sum(tokens for _, _, tokens in self.messages)
+
+
+class SessionStore:
+    """Chat histories of many sessions with per-session token budgets.
+
+    Args:
+        path: SQLite file, ``":memory:"`` for a store that is not persisted
+        token_limit: tokens of history (summary included) given to the LLM
+        summarize_after_tokens: unsummarized tokens that trigger a summary,
+            default ``token_limit``
+        keep_recent_tokens: tokens of recent turns kept verbatim when
+            summarizing, default half of ``token_limit``
+        summary_words: length the summary is asked to stay under
+        max_cached_sessions: sessions kept in memory
+        ttl_seconds: sessions idle for longer are deleted by :meth:`expire`
+        llm: summarizes the older turns, default ``Settings.llm``
+        tokenizer: counts tokens, default ``Settings.tokenizer``
+        summary_workers: background summarization threads
+
+    """
+
+    def __init__(
+        self,
+        path: str,
+        token_limit: int = 1500,
+        summarize_after_tokens: Optional[int] = None,
+        keep_recent_tokens: Optional[int] = None,
+        summary_words: int = 150,
+        max_cached_sessions: int = 1000,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        llm: Optional[Any] = None,
+        tokenizer: Optional[Callable[[str], List]] = None,
+        summary_workers: int = 1,
+    ) -> None:
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.token_limit = token_limit
+        self.summarize_after_tokens = summarize_after_tokens or token_limit
+        self.keep_recent_tokens = keep_recent_tokens if keep_recent_tokens is not None else token_limit // 2
+        self.summary_words = summary_words
+        self.max_cached_sessions = max_cached_sessions
+        self.ttl_seconds = ttl_seconds
+        self.llm = llm
+        self._tokenizer = tokenizer
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(summary_workers, thread_name_prefix="session-summary")
+        self._stats: Dict[str, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, "
+            "summary_tokens INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, tokens INTEGER NOT NULL, PRIMARY KEY (session_id, seq))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self._conn.commit()
+        self.expire()
+
+    def _count(self, **values: float) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._stats[key] = self._stats.get(key, 0) + value
+
+    @property
+    def tokenizer(self) -> Callable[[str], List]:
+        return self._tokenizer or Settings.tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text))
+
+    def _load(self, session_id: str) -> _Session:
+        session = _Session(session_id)
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT summary, summary_tokens FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            rows = self._conn.execute(
+                "SELECT seq, role, content, tokens FROM messages WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        if row is not None:
+            session.summary, session.summary_tokens = row
+        session.messages = [
+            (seq, ChatMessage(role=MessageRole(role), content=content), tokens)
+            for seq, role, content, tokens in rows
+        ]
+        return session
+
+    def _session(self, session_id: str) -> _Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                self._stats["hits"] = self._stats.get("hits", 0) + 1
+                return session
+        loaded = self._load(session_id)
+        with self._lock:
+            # another thread may have loaded it meanwhile
+            session = self._sessions.setdefault(session_id, loaded)
+            self._sessions.move_to_end(session_id)
+            self._stats["loads"] = self._stats.get("loads", 0) + 1
+            self._evict()
+        return session
+
+    def _evict(self) -> None:
+        # everything is persisted on write, so evicting only frees memory;
+        # a session being summarized stays until the summary is stored
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_cached_sessions:
+                return
+            if not self._sessions[session_id].summarizing:
+                del self._sessions[session_id]
+                self._stats["evictions"] = self._stats.get("evictions", 0) + 1
+
+    def _touch(self, session: _Session) -> None:
+        self._conn.execute(
+            "INSERT INTO sessions (session_id, summary, summary_tokens, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, "
+            "summary_tokens = excluded.summary_tokens, updated = excluded.updated",
+            (session.session_id, session.summary, session.summary_tokens, time.time()),
+        )
+
+    def append(self, session_id: str, message: ChatMessage) -> None:
+        session = self._session(session_id)
+        content = message.content or ""
+        tokens = self.count_tokens(content)
+        with session.lock:
+            seq = session.next_seq()
+            session.messages.append((seq, ChatMessage(role=message.role, content=content), tokens))
+            with self._db_lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO messages (session_id, seq, role, content, tokens) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (session_id, seq, message.role.value, content, tokens),
+                )
+                self._touch(session)
+                self._conn.commit()
+            if not session.summarizing and session.unsummarized_tokens() > self.summarize_after_tokens:
+                session.summarizing = True
+                self._summarizer.submit(self._summarize, session)
+
+    def history(self, session_id: str, token_limit: Optional[int] = None) -> List[ChatMessage]:
+        """The summary and the most recent turns within ``token_limit``."""
+        session = self._session(session_id)
+        budget = token_limit if token_limit is not None else self.token_limit
+        with session.lock:
+            summary, summary_tokens = session.summary, session.summary_tokens
+            messages = list(session.messages)
+        prefix = []
+        if summary and summary_tokens <= budget:
+            prefix = [ChatMessage(role=MessageRole.SYSTEM, content=SUMMARY_PREFIX + summary)]
+            budget -= summary_tokens
+        recent: List[ChatMessage] = []
+        for _, message, tokens in reversed(messages):
+            if tokens > budget:
+                break
+            recent.append(message)
+            budget -= tokens
+        recent.reverse()
+        # a history should not open with an answer whose question was dropped
+        while recent and recent[0].role == MessageRole.ASSISTANT and len(recent) < len(messages):
+            recent.pop(0)
+        return prefix + recent
+
+    def messages(self, session_id: str) -> List[ChatMessage]:
+        """All unsummarized turns, preceded by the summary if there is one."""
+        session = self._session(session_id)
+        with session.lock:
+            summary = session.summary
+            messages = [message for _, message, _ in session.messages]
+        if summary:
+            messages.insert(0, ChatMessage(role=MessageRole.SYSTEM, content=SUMMARY_PREFIX + summary))
+        return messages
+
+    def clear(self, session_id: str) -> None:
+        session = self._session(session_id)
+        with session.lock:
+            session.summary, session.summary_tokens, session.messages = "", 0, []
+            session.generation += 1
+            with self._db_lock:
+                self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._conn.commit()
+
+    def _summarize(self, session: _Session) -> None:
+        start = time.perf_counter()
+        folded_any = False
+        try:
+            with session.lock:
+                summary, generation = session.summary, session.generation
+                keep, kept_tokens = len(session.messages), 0
+                while keep > 0 and kept_tokens + session.messages[keep - 1][2] <= self.keep_recent_tokens:
+                    keep -= 1
+                    kept_tokens += session.messages[keep][2]
+                folded = session.messages[:keep]
+            if not folded:
+                return
+            turns = "\n".join(f"{message.role.value}: {message.content}" for _, message, _ in folded)
+            prompt = SUMMARY_PROMPT.format(
+                max_words=self.summary_words, summary=summary or "(none)", turns=turns
+            )
+            # the slow part runs without the lock: the session keeps chatting
+            new_summary = str((self.llm or Settings.llm).complete(prompt)).strip()
+            last_seq = folded[-1][0]
+            with session.lock:
+                if session.generation != generation:
+                    # cleared meanwhile: its seq numbers started over
+                    return
+                session.summary = new_summary
+                session.summary_tokens = self.count_tokens(SUMMARY_PREFIX + new_summary)
+                session.messages = [entry for entry in session.messages if entry[0] > last_seq]
+                with self._db_lock:
+                    self._conn.execute(
+                        "DELETE FROM messages WHERE session_id = ? AND seq <= ?",
+                        (session.session_id, last_seq),
+                    )
+                    self._touch(session)
+                    self._conn.commit()
+            folded_any = True
+            self._count(summaries=1, summarized_messages=len(folded),
+                        summary_seconds=time.perf_counter() - start)
+        except Exception:
+            logger.warning("summarizing session %s failed", session.session_id, exc_info=True)
+            self._count(summary_failures=1)
+        finally:
+            with session.lock:
+                # turns that arrived meanwhile may be over the threshold again
+                again = session.unsummarized_tokens() > self.summarize_after_tokens and folded_any
+                session.summarizing = again
+            if again:
+                self._summarizer.submit(self._summarize, session)
+
+    def expire(self) -> int:
+        """Delete the sessions idle for longer than ``ttl_seconds``."""
+        if self.ttl_seconds is None:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        with self._db_lock:
+            expired = [row[0] for row in self._conn.execute(
+                "SELECT session_id FROM sessions WHERE updated < ?", (cutoff,)
+            )]
+            self._conn.executemany("DELETE FROM messages WHERE session_id = ?", [(s,) for s in expired])
+            self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", [(s,) for s in expired])
+            self._conn.commit()
+        with self._lock:
+            evicted = [self._sessions.pop(session_id, None) for session_id in expired]
+        for session in evicted:
+            if session is not None:
+                with session.lock:
+                    session.generation += 1
+        if expired:
+            self._count(expirations=len(expired))
+        return len(expired)
+
+    def memory(self, session_id: str) -> "SessionMemory":
+        return SessionMemory(session_id=session_id, store=self)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_sessions"] = len(self._sessions)
+        if stats.get("summaries"):
+            stats["mean_summary_ms"] = stats["summary_seconds"] / stats["summaries"] * 1000
+        return stats
+
+    def wait(self) -> None:
+        """Block until the queued summaries, and the ones they queue, are done."""
+        while True:
+            self._summarizer.submit(lambda: None).result()
+            with self._lock:
+                busy = any(session.summarizing for session in self._sessions.values())
+            if not busy:
+                return
+            time.sleep(0.01)
+
+    def close(self) -> None:
+        self._summarizer.shutdown(wait=True)
+        with self._db_lock:
+            self._conn.close()
+
+
+class SessionMemory(BaseMemory):
+    """``BaseMemory`` of one session of a :class:`SessionStore`."""
+
+    session_id: str = Field(description="Session whose history this is.")
+    _store: SessionStore = PrivateAttr()
+
+    def __init__(self, session_id: str, store: SessionStore, **kwargs: Any) -> None:
+        super().__init__(session_id=session_id, **kwargs)
+        self._store = store
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SessionMemory"
+
+    @classmethod
+    def from_defaults(
+        cls, chat_history: Optional[List[ChatMessage]] = None, llm: Optional[Any] = None
+    ) -> "SessionMemory":
+        """Memory of a new session in a store that is not persisted."""
+        memory = SessionStore(":memory:", llm=llm).memory(uuid.uuid4().hex)
+        memory.set(chat_history or [])
+        return memory
+
+    @property
+    def tokenizer_fn(self) -> Callable[[str], List]:
+        # the simple chat engine counts its prefix messages with this
+        return self._store.tokenizer
+
+    def get(self, input: Optional[str] = None, initial_token_count: int = 0, **kwargs: Any) -> List[ChatMessage]:
+        """History within the store's budget minus ``initial_token_count``
+        tokens the caller already spends (its prefix messages)."""
+        return self._store.history(self.session_id, max(0, self._store.token_limit - initial_token_count))
+
+    def get_all(self) -> List[ChatMessage]:
+        return self._store.messages(self.session_id)
+
+    def put(self, message: ChatMessage) -> None:
+        self._store.append(self.session_id, message)
+
+    def set(self, messages: List[ChatMessage]) -> None:
+        self._store.clear(self.session_id)
+        for message in messages:
+            self._store.append(self.session_id, message)
+
+    def reset(self) -> None:
+        self._store.clear(self.session_id)
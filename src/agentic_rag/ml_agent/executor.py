@@ -0,0 +1,430 @@
+"""Run generated Python in a pool of warm, resource-limited worker processes.
+
+Importing numpy and scikit-learn takes seconds, so every worker imports the
+``preload`` modules once at startup and then executes snippets in a fresh
+namespace that already holds them. A worker runs with
+
+* an ``RLIMIT_AS`` memory limit and an ``RLIMIT_CPU`` limit per snippet,
+* the OS-level isolation of :mod:`isolation`, applied once the modules are
+  imported: an empty network namespace, no file access outside the Python
+  installation and a scratch working directory (Landlock), and the
+  privileges of ``user`` instead of root,
+* a wall-clock timeout enforced by the parent, which kills the worker,
+
+and is replaced after ``max_runs`` snippets, a timeout or a crash. Snippets
+wait in one queue; each worker slot is served by a dispatcher thread. A
+pool whose workers cannot be isolated (not Linux, no Landlock, namespaces
+disabled) refuses to start.
+"""
+import ast
+import asyncio
+import contextlib
+import importlib
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from src.agentic_rag.ml_agent.isolation import isolate
+
+logger = logging.getLogger(__name__)
+
+# (name bound in the snippet namespace or None, module)
+DEFAULT_PRELOAD: Tuple[Tuple[Optional[str], str], ...] = (
+    ("np", "numpy"),
+    ("pd", "pandas"),
+    ("sklearn", "sklearn"),
+    ("datasets", "sklearn.datasets"),
+    (None, "sklearn.linear_model"),
+    (None, "sklearn.ensemble"),
+    (None, "sklearn.tree"),
+    (None, "sklearn.svm"),
+    (None, "sklearn.neighbors"),
+    (None, "sklearn.cluster"),
+    (None, "sklearn.decomposition"),
+    (None, "sklearn.model_selection"),
+    (None, "sklearn.metrics"),
+    (None, "sklearn.preprocessing"),
+    (None, "sklearn.pipeline"),
+)
+
+_FENCE = re.compile(r"```(?:python|py|ipython)?\s*\n(.*?)```", re.S)
+
+
+def extract_code(text: str) -> str:
+    """Python source of a code agent answer: the fenced blocks if there are
+    any, else the text without the quotes the prompt asks for."""
+    blocks = _FENCE.findall(text)
+    if blocks:
+        return "\n".join(block.strip("\n") for block in blocks)
+    text = text.strip()
+    for quote in ('"""', "'''", '"', "'"):
+        if len(text) > 2 * len(quote) and text.startswith(quote) and text.endswith(quote):
+            return text[len(quote):-len(quote)].strip("\n")
+    return text
+
+
+class ExecutionResult:
+    """Captured output of one snippet.
+
+    ``value`` is the repr of the last expression (as IPython shows it),
+    ``error`` the formatted exception, or why the worker was stopped.
+    """
+
+    __slots__ = ("ok", "stdout", "stderr", "value", "error", "timed_out", "seconds")
+
+    def __init__(
+        self,
+        ok: bool,
+        stdout: str = "",
+        stderr: str = "",
+        value: Optional[str] = None,
+        error: Optional[str] = None,
+        timed_out: bool = False,
+        seconds: float = 0.0,
+    ) -> None:
+        self.ok = ok
+        self.stdout = stdout
+        self.stderr = stderr
+        self.value = value
+        self.error = error
+        self.timed_out = timed_out
+        self.seconds = seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"ExecutionResult(ok={self.ok}, seconds={self.seconds:.3f}, error={self.error!r})"
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n... [{len(text) - limit} characters truncated]"
+
+
+def _cpu_seconds() -> float:
+    import resource
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _run_snippet(code: str, namespace: Dict[str, Any], max_output_chars: int) -> Dict[str, Any]:
+    stdout, stderr = io.StringIO(), io.StringIO()
+    value = error = None
+    try:
+        tree = ast.parse(code, "<snippet>", "exec")
+        last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            exec(compile(tree, "<snippet>", "exec"), namespace)
+            if last is not None:
+                result = eval(compile(ast.Expression(last.value), "<snippet>", "eval"), namespace)
+                if result is not None:
+                    value = _truncate(repr(result), max_output_chars)
+    except MemoryError:
+        error = "MemoryError: memory limit exceeded"
+    except BaseException:
+        # SystemExit and KeyboardInterrupt raised by the snippet included
+        error = _truncate(traceback.format_exc(), max_output_chars)
+    return {
+        "ok": error is None,
+        "stdout": _truncate(stdout.getvalue(), max_output_chars),
+        "stderr": _truncate(stderr.getvalue(), max_output_chars),
+        "value": value,
+        "error": error,
+    }
+
+
+def _worker_main(
+    conn: Any,
+    scratch_dir: str,
+    user: str,
+    preload: Sequence[Tuple[Optional[str], str]],
+    memory_mb: int,
+    cpu_seconds: float,
+    max_runs: int,
+    max_output_chars: int,
+) -> None:
+    import resource
+
+    # the parent enforces timeouts; a ^C in the terminal is for the parent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # one BLAS thread each: the pool is the parallelism, and idle BLAS
+    # thread buffers count against the memory limit
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    start = time.perf_counter()
+    namespace: Dict[str, Any] = {}
+    missing = []
+    for name, module in preload:
+        try:
+            imported = importlib.import_module(module)
+        except ImportError:
+            missing.append(module)
+            continue
+        if name:
+            namespace[name] = imported
+    try:
+        isolate(scratch_dir, user)
+    except OSError as exc:
+        conn.send(("failed", f"cannot isolate the worker: {exc}"))
+        return
+
+    if cpu_seconds:
+        # the hard limit caps the worker's lifetime, so a snippet cannot
+        # lift its own soft limit for long
+        hard = int(_cpu_seconds() + cpu_seconds * (max_runs + 1)) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+    conn.send(("ready", time.perf_counter() - start, missing))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        if cpu_seconds:
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = min(hard, int(_cpu_seconds() + cpu_seconds) + 1)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        conn.send(_run_snippet(message, {"__name__": "__main__", **namespace}, max_output_chars))
+
+
+class _Worker:
+    def __init__(self, ctx: Any, args: Tuple) -> None:
+        self.conn, child = ctx.Pipe()
+        self.scratch_dir = tempfile.mkdtemp(prefix="executor-")
+        self.process = ctx.Process(
+            target=_worker_main, args=(child, self.scratch_dir) + args, daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.runs = 0
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> Tuple[float, list]:
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"worker not ready after {timeout}s")
+        try:
+            message = self.conn.recv()
+        except EOFError:
+            raise OSError(f"worker exited with code {self.process.exitcode} during startup") from None
+        if message[0] != "ready":
+            raise OSError(message[1])
+        _, seconds, missing = message
+        self.ready = True
+        return seconds, missing
+
+    def stop(self) -> None:
+        with contextlib.suppress(OSError, BrokenPipeError):
+            self.conn.send(None)
+        self.process.join(0.5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+
+class ExecutorPool:
+    """Queue of snippets served by ``workers`` warm, isolated processes.
+
+    Args:
+        workers: worker processes (and snippets running at once)
+        timeout: wall-clock seconds per snippet before its worker is killed
+        cpu_seconds: CPU time per snippet (``RLIMIT_CPU``), 0 for no limit
+        memory_mb: address space per worker (``RLIMIT_AS``), 0 for no limit
+        max_runs: snippets a worker runs before it is replaced
+        preload: ``(name, module)`` pairs imported at worker startup; modules
+            that are not installed are skipped
+        max_output_chars: stdout, stderr and value are truncated to this
+        start_timeout: seconds a worker may take to import ``preload``
+        user: account the workers run as when the service runs as root; it
+            must be able to read the Python installation
+
+    Raises:
+        RuntimeError: if the workers cannot be isolated on this machine
+
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        timeout: float = 30.0,
+        cpu_seconds: float = 20.0,
+        memory_mb: int = 2048,
+        max_runs: int = 50,
+        preload: Sequence[Tuple[Optional[str], str]] = DEFAULT_PRELOAD,
+        max_output_chars: int = 20_000,
+        start_timeout: float = 60.0,
+        user: str = "nobody",
+    ) -> None:
+        self.workers = workers
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        # a forked worker would inherit the parent's threads and locks
+        self._ctx = multiprocessing.get_context("spawn")
+        self._args = (user, tuple(preload), memory_mb, cpu_seconds, max_runs, max_output_chars)
+        # fail closed: never hand generated code to a worker that is not isolated
+        probe = _Worker(self._ctx, (user, ()) + self._args[2:])
+        try:
+            probe.wait_ready(start_timeout)
+        except (TimeoutError, EOFError, OSError) as exc:
+            raise RuntimeError(f"refusing to start the executor pool: {exc}") from exc
+        finally:
+            probe.stop()
+        self.max_runs = max_runs
+        self._jobs: "queue.Queue[Optional[Tuple[str, Optional[float], Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, float] = {}
+        self._closed = False
+        self._slots = [_Worker(self._ctx, self._args) for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._serve, args=(i,), name=f"executor-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _count(self, **values: float) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._stats[key] = self._stats.get(key, 0) + value
+
+    def _replace(self, slot: int, reason: str) -> None:
+        logger.debug("replacing executor worker %d: %s", slot, reason)
+        self._slots[slot].stop()
+        self._slots[slot] = _Worker(self._ctx, self._args)
+        self._count(**{f"recycled_{reason}": 1})
+
+    def _ensure_ready(self, slot: int) -> None:
+        worker = self._slots[slot]
+        if not worker.ready:
+            seconds, missing = worker.wait_ready(self.start_timeout)
+            if missing:
+                logger.warning("executor worker could not import %s", ", ".join(missing))
+            self._count(worker_starts=1, preload_seconds=seconds)
+
+    def _serve(self, slot: int) -> None:
+        while True:
+            # take a job only once the worker is warm, so jobs go to the
+            # slots that are ready while a recycled worker is starting
+            start_error = None
+            try:
+                self._ensure_ready(slot)
+            except (TimeoutError, EOFError, OSError) as exc:
+                start_error = exc
+            job = self._jobs.get()
+            if job is None:
+                return
+            code, timeout, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            if start_error is not None:
+                self._replace(slot, "start_failed")
+                future.set_result(ExecutionResult(False, error=f"worker failed to start: {start_error}"))
+                continue
+            try:
+                future.set_result(self._execute(slot, code, timeout or self.timeout))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+    def _execute(self, slot: int, code: str, timeout: float) -> ExecutionResult:
+        worker = self._slots[slot]
+
+        start = time.perf_counter()
+        worker.conn.send(code)
+        worker.runs += 1
+        answered = worker.conn.poll(timeout)
+        seconds = time.perf_counter() - start
+        self._count(runs=1, run_seconds=seconds)
+        if not answered:
+            self._replace(slot, "timeout")
+            self._count(timeouts=1)
+            return ExecutionResult(
+                False, error=f"execution timed out after {timeout:g}s", timed_out=True, seconds=seconds
+            )
+
+        try:
+            reply = worker.conn.recv()
+        except (EOFError, OSError):
+            reply = None
+        if reply is not None:
+            if worker.runs >= self.max_runs:
+                self._replace(slot, "max_runs")
+            return ExecutionResult(seconds=seconds, **reply)
+
+        # the pipe closed: the worker died (rlimit signal, os._exit, ...)
+        worker.process.join(1.0)
+        exitcode = worker.process.exitcode
+        self._replace(slot, "crash")
+        if exitcode == -signal.SIGXCPU:
+            error = "CPU time limit exceeded"
+        elif exitcode is not None and exitcode < 0:
+            error = f"worker killed by {signal.Signals(-exitcode).name}"
+        else:
+            error = f"worker exited with code {exitcode}"
+        return ExecutionResult(False, error=error, seconds=seconds)
+
+    def submit(self, code: str, timeout: Optional[float] = None) -> Future:
+        """Queue ``code``; the future resolves to an :class:`ExecutionResult`."""
+        if self._closed:
+            raise RuntimeError("the executor pool is closed")
+        future: Future = Future()
+        self._jobs.put((code, timeout, future))
+        return future
+
+    def run(self, code: str, timeout: Optional[float] = None) -> ExecutionResult:
+        return self.submit(code, timeout).result()
+
+    async def arun(self, code: str, timeout: Optional[float] = None) -> ExecutionResult:
+        return await asyncio.wrap_future(self.submit(code, timeout))
+
+    def warm_up(self) -> None:
+        """Block until every worker has imported its modules."""
+        done = [self.submit("None") for _ in range(self.workers)]
+        for future in done:
+            future.result()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._jobs.qsize()
+        if stats.get("runs"):
+            stats["mean_run_ms"] = stats["run_seconds"] / stats["runs"] * 1000
+        return stats
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        for worker in self._slots:
+            worker.stop()
+
+    def __enter__(self) -> "ExecutorPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
@@ -0,0 +1,273 @@
+"""Local routing tier in front of the LLM router.
+
+A message is routed by, in order,
+
+1. the decision cache (normalized message -> agent),
+2. keyword rules, which only fire on unambiguous phrasings,
+3. a nearest-centroid classifier over query embeddings, trained from a
+   JSONL file of ``{"query": ..., "agent": ...}`` lines, and
+4. the LLM router, when the classifier's margin between its two best
+   agents is below ``min_margin``.
+
+    python -m src.agentic_rag.ml_agent.fast_router --data routes.jsonl --out router.npz
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from src.agentic_rag.llms.cache import normalize_prompt
+from src.agentic_rag.ml_agent.router import AGENTS
+
+logger = logging.getLogger(__name__)
+
+# (agent, pattern) pairs; a rule only decides when exactly one agent matches
+DEFAULT_RULES: Tuple[Tuple[str, str], ...] = (
+    ("code", r"\b(write|generate|implement|give me|show me)\b.*\b(code|function|class|script|snippet)\b"),
+    ("code", r"\bin (python|numpy|pytorch|sklearn|scikit-learn)\b.*\bhow\b|\bhow (do|to) i (code|implement)\b"),
+    ("ipython", r"\b(run|execute|plot|train|fit|evaluate)\b.*\b(on|with) the\b.*\b(dataset|data)\b"),
+    ("ipython", r"\b(load_iris|load_digits|load_wine|load_breast_cancer|load_diabetes|make_classification)\b"),
+    ("search", r"^(what|why|when|who|explain|define|describe|compare)\b"
+               r"(?!.*\b(code|plot|run|execute|accuracy|score|dataset|data|iris|digits|wine|diabetes|cancer)\b)"),
+)
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    """(query, agent) pairs of a labelled JSONL file."""
+    examples = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                if row["agent"] not in AGENTS:
+                    raise ValueError(f"unknown agent {row['agent']!r} in {path}")
+                examples.append((row["query"], row["agent"]))
+    return examples
+
+
+class RouteDecision:
+    """Chosen agent, the tier that chose it and its confidence."""
+
+    __slots__ = ("agent", "source", "confidence", "seconds")
+
+    def __init__(self, agent: str, source: str, confidence: float, seconds: float = 0.0) -> None:
+        self.agent = agent
+        self.source = source
+        self.confidence = confidence
+        self.seconds = seconds
+
+    def __repr__(self) -> str:
+        return f"RouteDecision({self.agent!r}, source={self.source!r}, confidence={self.confidence:.3f})"
+
+
+class KeywordRules:
+    def __init__(self, rules: Iterable[Tuple[str, str]] = DEFAULT_RULES) -> None:
+        self.rules = [(agent, re.compile(pattern, re.I)) for agent, pattern in rules]
+
+    def match(self, message: str) -> Optional[str]:
+        agents = {agent for agent, pattern in self.rules if pattern.search(message)}
+        return agents.pop() if len(agents) == 1 else None
+
+
+class CentroidClassifier:
+    """Cosine nearest-centroid classifier over normalized embeddings."""
+
+    def __init__(self, agents: Sequence[str], centroids: np.ndarray) -> None:
+        self.agents = list(agents)
+        self.centroids = centroids
+
+    @staticmethod
+    def _unit(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, labels: Sequence[str]) -> "CentroidClassifier":
+        embeddings = cls._unit(np.asarray(embeddings, dtype=np.float32))
+        labels = np.asarray(labels)
+        agents = [agent for agent in AGENTS if (labels == agent).any()]
+        centroids = np.stack([embeddings[labels == agent].mean(axis=0) for agent in agents])
+        return cls(agents, cls._unit(centroids))
+
+    def predict(self, embedding: Sequence[float]) -> Tuple[str, float]:
+        """Best agent and its margin over the second best (cosine)."""
+        scores = self.centroids @ self._unit(np.asarray(embedding, dtype=np.float32))
+        order = np.argsort(-scores)
+        margin = float(scores[order[0]] - scores[order[1]]) if len(order) > 1 else 1.0
+        return self.agents[order[0]], margin
+
+    def save(self, path: str) -> None:
+        np.savez(path, agents=np.asarray(self.agents), centroids=self.centroids)
+
+    @classmethod
+    def load(cls, path: str) -> "CentroidClassifier":
+        with np.load(path) as data:
+            return cls(data["agents"].tolist(), data["centroids"])
+
+
+def train(embed_model: BaseEmbedding, examples: Sequence[Tuple[str, str]]) -> CentroidClassifier:
+    # batched for speed; the embedding server embeds queries and texts alike
+    embeddings = embed_model.get_text_embedding_batch([query for query, _ in examples])
+    return CentroidClassifier.fit(np.asarray(embeddings), [agent for _, agent in examples])
+
+
+class FastRouter:
+    """Route messages locally, asking the LLM router only when unsure.
+
+    Args:
+        embed_model: embeds messages for the classifier (query embeddings)
+        classifier: trained :class:`CentroidClassifier`, None to skip that tier
+        rules: :class:`KeywordRules`, None to skip that tier
+        min_margin: classifier margin under which the fallback is asked
+        cache_size: routing decisions remembered, 0 disables the cache
+
+    """
+
+    def __init__(
+        self,
+        embed_model: Optional[BaseEmbedding] = None,
+        classifier: Optional[CentroidClassifier] = None,
+        rules: Optional[KeywordRules] = None,
+        min_margin: float = 0.05,
+        cache_size: int = 10_000,
+    ) -> None:
+        if classifier is not None and embed_model is None:
+            raise ValueError("the classifier needs an embed_model")
+        self.embed_model = embed_model
+        self.classifier = classifier
+        self.rules = rules
+        self.min_margin = min_margin
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._seconds: Dict[str, float] = {}
+
+    def _record(self, decision: RouteDecision, key: str) -> RouteDecision:
+        with self._lock:
+            self._counts[decision.source] = self._counts.get(decision.source, 0) + 1
+            self._seconds[decision.source] = self._seconds.get(decision.source, 0.0) + decision.seconds
+            if self.cache_size and decision.source != "cache":
+                self._cache[key] = decision.agent
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return decision
+
+    def _local(self, message: str, start: float) -> Tuple[str, Optional[RouteDecision]]:
+        """Normalized key and the cache or rules decision, if any."""
+        key = normalize_prompt(message)
+        with self._lock:
+            agent = self._cache.get(key)
+            if agent is not None:
+                self._cache.move_to_end(key)
+        if agent is not None:
+            return key, self._record(RouteDecision(agent, "cache", 1.0, time.perf_counter() - start), key)
+
+        if self.rules is not None:
+            agent = self.rules.match(message)
+            if agent is not None:
+                return key, self._record(RouteDecision(agent, "rules", 1.0, time.perf_counter() - start), key)
+        return key, None
+
+    def _classify(
+        self, key: str, embedding: Sequence[float], has_fallback: bool, start: float
+    ) -> Tuple[float, Optional[RouteDecision]]:
+        agent, margin = self.classifier.predict(embedding)
+        if margin >= self.min_margin or not has_fallback:
+            return margin, self._record(
+                RouteDecision(agent, "classifier", margin, time.perf_counter() - start), key
+            )
+        return margin, None
+
+    def route(
+        self,
+        message: str,
+        fallback: Optional[Callable[[str], str]] = None,
+        embedding: Optional[Sequence[float]] = None,
+    ) -> RouteDecision:
+        """Decide the agent of ``message``; ``embedding`` (its query
+        embedding, if already computed) saves the embedding request."""
+        start = time.perf_counter()
+        key, decision = self._local(message, start)
+        if decision is not None:
+            return decision
+
+        margin = 0.0
+        if self.classifier is not None:
+            if embedding is None:
+                embedding = self.embed_model.get_query_embedding(message)
+            margin, decision = self._classify(key, embedding, fallback is not None, start)
+            if decision is not None:
+                return decision
+
+        if fallback is None:
+            raise ValueError("no routing tier could decide and there is no fallback")
+        agent = fallback(message)
+        return self._record(RouteDecision(agent, "llm", margin, time.perf_counter() - start), key)
+
+    async def aroute(
+        self,
+        message: str,
+        fallback: Optional[Callable[[str], Awaitable[str]]] = None,
+        embedding: Optional[Sequence[float]] = None,
+    ) -> RouteDecision:
+        """Async :meth:`route` with an async ``fallback``."""
+        start = time.perf_counter()
+        key, decision = self._local(message, start)
+        if decision is not None:
+            return decision
+
+        margin = 0.0
+        if self.classifier is not None:
+            if embedding is None:
+                embedding = await self.embed_model.aget_query_embedding(message)
+            margin, decision = self._classify(key, embedding, fallback is not None, start)
+            if decision is not None:
+                return decision
+
+        if fallback is None:
+            raise ValueError("no routing tier could decide and there is no fallback")
+        agent = await fallback(message)
+        return self._record(RouteDecision(agent, "llm", margin, time.perf_counter() - start), key)
+
+    def choose_agent(self, message: str, fallback: Optional[Callable[[str], str]] = None) -> str:
+        return self.route(message, fallback).agent
+
+    def stats(self) -> Dict[str, float]:
+        """Decisions and mean latency per tier."""
+        with self._lock:
+            total = sum(self._counts.values())
+            stats: Dict[str, float] = {"decisions": total}
+            for source, count in self._counts.items():
+                stats[f"{source}_decisions"] = count
+                stats[f"{source}_share"] = count / total
+                stats[f"{source}_mean_ms"] = self._seconds[source] / count * 1000
+        return stats
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the centroid routing classifier.")
+    parser.add_argument("--data", required=True, help="JSONL of {query, agent} examples")
+    parser.add_argument("--out", required=True, help="classifier file (.npz)")
+    parser.add_argument("--embed-dim", type=int, default=768)
+    args = parser.parse_args(argv)
+
+    from src.agentic_rag.embeddings.huggingface_embeddings import HuggingFaceEmbedding
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    examples = load_examples(args.data)
+    classifier = train(HuggingFaceEmbedding(embed_dim=args.embed_dim), examples)
+    classifier.save(args.out)
+    print(f"trained on {len(examples)} examples: {', '.join(classifier.agents)} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""OS-level isolation of the executor's worker processes (Linux only).
+
+:func:`isolate` confines the calling process for good:
+
+* a new, empty network namespace (``unshare(CLONE_NEWNET)``; an
+  unprivileged process first enters a new user namespace): no interface
+  but a down loopback, so no socket, however it is created, reaches
+  anything,
+* a Landlock ruleset: the Python installation and system libraries are
+  read-only, the scratch directory read-write, everything else (``/etc``,
+  the home directories, the application's own files) inaccessible,
+* ``no_new_privs`` and, when started as root, the privileges of ``user``,
+* the scratch directory as working directory, ``HOME`` and ``TMPDIR``.
+
+Every step either succeeds or raises ``OSError``; a worker that cannot be
+isolated must not run code.
+"""
+import ctypes
+import ctypes.util
+import os
+import site
+import sys
+import tempfile
+from typing import Iterable, List
+
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+PR_SET_NO_NEW_PRIVS = 38
+
+# the landlock syscalls have the same numbers on every architecture
+SYS_LANDLOCK_CREATE_RULESET = 444
+SYS_LANDLOCK_ADD_RULE = 445
+SYS_LANDLOCK_RESTRICT_SELF = 446
+LANDLOCK_CREATE_RULESET_VERSION = 1
+LANDLOCK_RULE_PATH_BENEATH = 1
+
+ACCESS_FS_EXECUTE = 1 << 0
+ACCESS_FS_WRITE_FILE = 1 << 1
+ACCESS_FS_READ_FILE = 1 << 2
+ACCESS_FS_READ_DIR = 1 << 3
+ACCESS_FS_TRUNCATE = 1 << 14
+ACCESS_FS_IOCTL_DEV = 1 << 15
+# the rights on files (as opposed to directories) of ABI 1, 3 and 5
+FILE_ACCESS = ACCESS_FS_EXECUTE | ACCESS_FS_WRITE_FILE | ACCESS_FS_READ_FILE
+READ_ACCESS = ACCESS_FS_EXECUTE | ACCESS_FS_READ_FILE | ACCESS_FS_READ_DIR
+ACCESS_NET_BIND_TCP = 1 << 0
+ACCESS_NET_CONNECT_TCP = 1 << 1
+
+# shared libraries loaded lazily, time zones, CPU counts
+SYSTEM_READ_PATHS = (
+    "/lib", "/lib64", "/usr/lib", "/usr/lib64", "/usr/local/lib",
+    "/usr/share/zoneinfo", "/sys/devices/system/cpu",
+)
+
+
+class _RulesetAttr(ctypes.Structure):
+    _fields_ = [("handled_access_fs", ctypes.c_uint64), ("handled_access_net", ctypes.c_uint64)]
+
+
+class _PathBeneathAttr(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [("allowed_access", ctypes.c_uint64), ("parent_fd", ctypes.c_int32)]
+
+
+def _libc() -> ctypes.CDLL:
+    return ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+
+
+def _check(result: int, what: str) -> int:
+    if result < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+    return result
+
+
+def read_only_paths() -> List[str]:
+    """The Python installation (standard library and site-packages) and the
+    system library directories."""
+    paths = {sys.prefix, sys.base_prefix, sys.exec_prefix, *site.getsitepackages()}
+    if site.ENABLE_USER_SITE:
+        paths.add(site.getusersitepackages())
+    paths.update(SYSTEM_READ_PATHS)
+    return sorted(path for path in paths if os.path.exists(path))
+
+
+def _unshare_network(libc: ctypes.CDLL) -> None:
+    flags = CLONE_NEWNET if os.geteuid() == 0 else CLONE_NEWUSER | CLONE_NEWNET
+    _check(libc.unshare(flags), "unshare")
+
+
+def _restrict_filesystem(libc: ctypes.CDLL, read_only: Iterable[str], read_write: Iterable[str]) -> None:
+    abi = _check(
+        libc.syscall(SYS_LANDLOCK_CREATE_RULESET, None, 0, LANDLOCK_CREATE_RULESET_VERSION),
+        "landlock",
+    )
+    handled_fs = (1 << 13) - 1  # ABI 1
+    if abi >= 2:
+        handled_fs |= 1 << 13  # REFER
+    if abi >= 3:
+        handled_fs |= ACCESS_FS_TRUNCATE
+    if abi >= 5:
+        handled_fs |= ACCESS_FS_IOCTL_DEV
+    file_access = (FILE_ACCESS | ACCESS_FS_TRUNCATE) & handled_fs
+    attr = _RulesetAttr(handled_fs, ACCESS_NET_BIND_TCP | ACCESS_NET_CONNECT_TCP)
+    # before ABI 4 the ruleset has no network rights
+    size = ctypes.sizeof(attr) if abi >= 4 else ctypes.sizeof(ctypes.c_uint64)
+    ruleset = _check(
+        libc.syscall(SYS_LANDLOCK_CREATE_RULESET, ctypes.byref(attr), ctypes.c_size_t(size), 0),
+        "landlock_create_ruleset",
+    )
+    try:
+        rules = [(path, READ_ACCESS) for path in read_only] + [(path, handled_fs) for path in read_write]
+        for path, access in rules:
+            fd = os.open(path, os.O_PATH | os.O_CLOEXEC)
+            try:
+                if not os.path.isdir(path):
+                    access &= file_access
+                rule = _PathBeneathAttr(access, fd)
+                _check(
+                    libc.syscall(SYS_LANDLOCK_ADD_RULE, ruleset, LANDLOCK_RULE_PATH_BENEATH,
+                                 ctypes.byref(rule), 0),
+                    f"landlock_add_rule {path}",
+                )
+            finally:
+                os.close(fd)
+        _check(libc.syscall(SYS_LANDLOCK_RESTRICT_SELF, ruleset, 0), "landlock_restrict_self")
+    finally:
+        os.close(ruleset)
+
+
+def _drop_privileges(user: str, scratch_dir: str) -> None:
+    import pwd
+
+    entry = pwd.getpwnam(user)
+    if entry.pw_uid == 0:
+        raise OSError(f"refusing to run generated code as {user!r}: it is root")
+    os.chown(scratch_dir, entry.pw_uid, entry.pw_gid)
+    os.setgroups([])
+    os.setgid(entry.pw_gid)
+    os.setuid(entry.pw_uid)
+
+
+def isolate(scratch_dir: str, user: str = "nobody") -> None:
+    """Confine the calling process; see the module docstring.
+
+    ``user`` is only switched to when running as root, so it must be able
+    to read the Python installation for imports made after isolation.
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError(f"process isolation is not supported on {sys.platform}")
+    libc = _libc()
+    _unshare_network(libc)
+    os.chdir(scratch_dir)
+    os.environ["HOME"] = os.environ["TMPDIR"] = scratch_dir
+    tempfile.tempdir = scratch_dir
+    if os.geteuid() == 0:
+        _drop_privileges(user, scratch_dir)
+    _check(libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "prctl(PR_SET_NO_NEW_PRIVS)")
+    _restrict_filesystem(libc, read_only_paths(), [scratch_dir, os.devnull])
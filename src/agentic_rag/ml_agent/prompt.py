@@ -1,4 +1,4 @@
-ROUTER_PROMPT = 
+ROUTER_PROMPT = \
 [
     {"role": "system", "content": """
       Time : Sunday 4:31 pm
@@ -11,9 +11,9 @@ ROUTER_PROMPT =
       please retrun the answer only in below json format:
       {'name': <fill with tool name>}
     """},
-    {"role": "user", "content": question},
+    {"role": "user", "content": "{question}"},
 ]
- PYTHON_GENERATER_PROPMT= \
+PYTHON_GENERATER_PROPMT= \
 [
     {"role": "system", "content": """
       Time : Sunday 4:31 pm
@@ -26,5 +26,14 @@ ROUTER_PROMPT =
     "<generated code>"
 
       """},
-    {"role": "user", "content": question},
-]
\ No newline at end of file
+    {"role": "user", "content": "{question}"},
+]
+
+
+def format_messages(template, question):
+    """Fill the ``{question}`` of a prompt template's user message."""
+    return [
+        {**message, "content": message["content"].replace("{question}", question)}
+        if message["role"] == "user" else dict(message)
+        for message in template
+    ]
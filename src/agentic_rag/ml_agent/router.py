@@ -1,24 +1,238 @@
-import requests
-URL = 'https://8c3a-34-87-63-89.ngrok-free.app/router'
+"""Route a user message to the search, code or ipython agent."""
+import ast
+import asyncio
+import json
+import logging
+import re
+import time
+
+from llama_index.core.base.llms.generic_utils import messages_to_history_str
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.chat_engine.condense_question import DEFAULT_PROMPT as CONDENSE_PROMPT
+
+from src.agentic_rag.ml_agent.executor import extract_code
+from src.agentic_rag.ml_agent.prompt import PYTHON_GENERATER_PROPMT, ROUTER_PROMPT, format_messages
+from src.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+AGENTS = ('search', 'code', 'ipython')
+DEFAULT_AGENT = 'search'
+
+_NAME = re.compile(r"""["']name["']\s*:\s*["'](\w+)["']""")
+
+
+def parse_agent_name(text):
+    """Agent name of a ``{'name': ...}`` router answer, None if there is none."""
+    match = re.search(r'\{.*?\}', text, re.S)
+    if match:
+        for parse in (json.loads, ast.literal_eval):
+            try:
+                name = parse(match.group(0)).get('name')
+            except (ValueError, SyntaxError, AttributeError):
+                continue
+            if name in AGENTS:
+                return name
+    match = _NAME.search(text)
+    if match and match.group(1) in AGENTS:
+        return match.group(1)
+    return None
+
+
+def to_chat_messages(messages):
+    return [ChatMessage(role=message['role'], content=message['content']) for message in messages]
+
 
 class Router:
+    """Answer a message with the agent the router picks.
+
+    ``choose_agent`` asks the LLM with ``ROUTER_PROMPT``; with a
+    ``fast_router`` (:class:`~src.agentic_rag.ml_agent.fast_router.FastRouter`)
+    the LLM is only asked when the local router is not confident.
+    ``search`` answers with ``engine`` (an ``Engine``), ``code`` and
+    ``ipython`` with code generated from ``PYTHON_GENERATER_PROPMT``.
+
+    With an ``executor`` (:class:`~src.agentic_rag.ml_agent.executor.ExecutorPool`)
+    the code of ``ipython`` answers is run and its output returned as
+    ``execution``.
+
+    With ``speculative`` :meth:`arun` starts the ``search`` retrieval while
+    the router is still deciding and cancels it if another agent is chosen.
+
+    With a ``session_store`` (:class:`~src.agentic_rag.memory.sessions.SessionStore`)
+    a message sent with a ``session_id`` is first condensed with the
+    session's history into a standalone question, which is routed and
+    answered; the message and the complete answer are then added to the
+    session.
+    """
 
-    def __init__():
-        
-    
-    def run(self, messeage):
+    def __init__(self, llm, engine=None, fast_router=None, speculative=False, executor=None,
+                 session_store=None):
+        self.llm = llm
+        self.engine = engine
+        self.fast_router = fast_router
+        self.executor = executor
+        self.session_store = session_store
+        self.speculative = speculative
+        self.speculations = {'started': 0, 'used': 0, 'cancelled': 0}
 
-        agent_name = choose_agent(message)
+    def run(self, message, session_id=None):
+        question = self.condense(message, session_id)
+        agent_name = self.choose_agent(question)
 
-        if agent_name = 'code':
-                ...
+        if agent_name == 'search':
+            answer = str(self.engine.query(question))
+        else:
+            answer = self.generate_code(question)
+        result = {'agent': agent_name, 'answer': answer}
+        if agent_name == 'ipython' and self.executor is not None:
+            result['execution'] = self.executor.run(extract_code(answer)).as_dict()
+        self._record(session_id, message, answer)
+        return result
+
+    async def arun(self, message, speculative=None, session_id=None):
+        question = await self.acondense(message, session_id)
+        agent_name, retrieval = await self._aroute(question, speculative)
+        if agent_name == 'search':
+            retrieved = await self._aretrieved(question, retrieval)
+            answer = str(await self.engine.asynthesize(*retrieved))
+        else:
+            answer = await self.agenerate_code(question)
+        result = {'agent': agent_name, 'answer': answer}
+        if agent_name == 'ipython' and self.executor is not None:
+            result['execution'] = (await self.executor.arun(extract_code(answer))).as_dict()
+        self._record(session_id, message, answer)
+        return result
+
+    async def astream(self, message, speculative=None, session_id=None):
+        """Yield ``(event, data)`` pairs: ``('route', agent)``, for ``search``
+        ``('sources', nodes)``, then ``('delta', text)`` as the answer is
+        generated and, for ``ipython`` with an executor, ``('execution',
+        result)``. Closing the generator cancels the work in flight; only
+        answers streamed to the end are added to the session."""
+        question = await self.acondense(message, session_id)
+        agent_name, retrieval = await self._aroute(question, speculative)
+        try:
+            yield 'route', agent_name
+            answer = []
+            if agent_name == 'search':
+                query_bundle, nodes, _ = await self._aretrieved(question, retrieval)
+                yield 'sources', nodes
+                async for delta in self.engine.astream_synthesize(query_bundle, nodes):
+                    answer.append(delta)
+                    yield 'delta', delta
+            else:
+                messages = to_chat_messages(format_messages(PYTHON_GENERATER_PROPMT, question))
+                async for response in await self.llm.astream_chat(messages):
+                    answer.append(response.delta or '')
+                    yield 'delta', response.delta or ''
+            self._record(session_id, message, ''.join(answer))
+            if agent_name == 'ipython' and self.executor is not None:
+                yield 'execution', (await self.executor.arun(extract_code(''.join(answer)))).as_dict()
+        finally:
+            if retrieval is not None and not retrieval.done():
+                retrieval.cancel()
+
+    async def _aroute(self, message, speculative):
+        """Chosen agent and, if it is ``search``, the speculative retrieval
+        task (None when not speculating)."""
+        speculative = self.speculative if speculative is None else speculative
+        retrieval = None
+        if speculative and self.engine is not None:
+            retrieval = asyncio.ensure_future(self.engine.aretrieve(message))
+            self.speculations['started'] += 1
+        try:
+            agent_name = await self.achoose_agent(message)
+        except BaseException:
+            if retrieval is not None:
+                await self._cancel(retrieval)
+            raise
+        if agent_name != 'search' and retrieval is not None:
+            await self._cancel(retrieval)
+            retrieval = None
+        return agent_name, retrieval
+
+    async def _aretrieved(self, message, retrieval):
+        if retrieval is not None:
+            self.speculations['used'] += 1
+            return await retrieval
+        return await self.engine.aretrieve(message)
+
+    async def _cancel(self, task):
+        # cancelling the task cancels its in-flight embedding/rerank requests
+        task.cancel()
+        self.speculations['cancelled'] += 1
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.debug('discarded speculative retrieval failed', exc_info=True)
+
+    def _condense_prompt(self, message, session_id):
+        """Prompt rewriting ``message`` into a standalone question, None
+        without a session or history."""
+        if self.session_store is None or session_id is None:
+            return None
+        history = self.session_store.history(session_id)
+        if not history:
+            return None
+        return CONDENSE_PROMPT.format(chat_history=messages_to_history_str(history), question=message)
+
+    def condense(self, message, session_id=None):
+        prompt = self._condense_prompt(message, session_id)
+        if prompt is None:
+            return message
+        with tracer.stage('condense'):
+            return self.llm.complete(prompt).text.strip() or message
+
+    async def acondense(self, message, session_id=None):
+        prompt = self._condense_prompt(message, session_id)
+        if prompt is None:
+            return message
+        with tracer.stage('condense'):
+            return (await self.llm.acomplete(prompt)).text.strip() or message
+
+    def _record(self, session_id, message, answer):
+        if self.session_store is None or session_id is None:
+            return
+        self.session_store.append(session_id, ChatMessage(role=MessageRole.USER, content=message))
+        self.session_store.append(session_id, ChatMessage(role=MessageRole.ASSISTANT, content=answer))
+
+    def generate_code(self, message):
+        response = self.llm.chat(to_chat_messages(format_messages(PYTHON_GENERATER_PROPMT, message)))
+        return response.message.content
+
+    async def agenerate_code(self, message):
+        response = await self.llm.achat(to_chat_messages(format_messages(PYTHON_GENERATER_PROPMT, message)))
+        return response.message.content
 
-        elif :
-                ...
-    
     def choose_agent(self, message):
+        with tracer.stage('routing'):
+            if self.fast_router is not None:
+                return self.fast_router.route(message, fallback=self.llm_choose_agent).agent
+            return self.llm_choose_agent(message)
+
+    async def achoose_agent(self, message):
+        with tracer.stage('routing'):
+            if self.fast_router is not None:
+                return (await self.fast_router.aroute(message, fallback=self.allm_choose_agent)).agent
+            return await self.allm_choose_agent(message)
+
+    def llm_choose_agent(self, message):
+        start = time.perf_counter()
+        response = self.llm.chat(to_chat_messages(format_messages(ROUTER_PROMPT, message)))
+        agent_name = self._agent_name(response.message.content)
+        logger.debug('llm router chose %s in %.3fs', agent_name, time.perf_counter() - start)
+        return agent_name
 
-            r = requests.get(url = URL)
-            agent_name = r.json()['name']
+    async def allm_choose_agent(self, message):
+        response = await self.llm.achat(to_chat_messages(format_messages(ROUTER_PROMPT, message)))
+        return self._agent_name(response.message.content)
 
-        return agent_name
\ No newline at end of file
+    def _agent_name(self, answer):
+        agent_name = parse_agent_name(answer)
+        if agent_name is None:
+            logger.warning('unparsable router answer %r, using %s', answer, DEFAULT_AGENT)
+            agent_name = DEFAULT_AGENT
+        return agent_name
@@ -0,0 +1,78 @@
+"""Dense plus BM25 retrieval fused with reciprocal rank fusion."""
+import logging
+from typing import Dict, List, Optional
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+
+from src.agentic_rag.vector_stores.bm25 import BM25Index
+from src.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuse the nodes of a dense retriever with the ``sparse_top_k`` best
+    BM25 nodes.
+
+    Reciprocal rank fusion scores a node ``sum(1 / (rrf_k + rank))`` over
+    the rankings it appears in, so the two scales need no calibration: a
+    node both rankings agree on comes first, an exact-term match the dense
+    search missed still makes the candidates. At most ``top_k`` nodes are
+    returned (default: all fused). Their scores are the fused scores, not
+    cosine similarities.
+    """
+
+    def __init__(
+        self,
+        dense_retriever: BaseRetriever,
+        bm25: BM25Index,
+        docstore: BaseDocumentStore,
+        sparse_top_k: int = 20,
+        rrf_k: int = 60,
+        top_k: Optional[int] = None,
+        callback_manager: Optional[CallbackManager] = None,
+    ) -> None:
+        super().__init__(callback_manager=callback_manager)
+        self.dense_retriever = dense_retriever
+        self.bm25 = bm25
+        self.docstore = docstore
+        self.sparse_top_k = sparse_top_k
+        self.rrf_k = rrf_k
+        self.top_k = top_k
+
+    def _sparse(self, query_bundle: QueryBundle) -> List[str]:
+        with tracer.stage("bm25_search"):
+            node_ids, _ = self.bm25.search(query_bundle.query_str, self.sparse_top_k)
+        return node_ids
+
+    def _fuse(self, dense: List[NodeWithScore], sparse_ids: List[str]) -> List[NodeWithScore]:
+        scores: Dict[str, float] = {}
+        nodes: Dict[str, BaseNode] = {}
+        for rank, node in enumerate(dense):
+            scores[node.node.node_id] = 1.0 / (self.rrf_k + rank + 1)
+            nodes[node.node.node_id] = node.node
+        for rank, node_id in enumerate(sparse_ids):
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        for node_id in sparse_ids:
+            if node_id not in nodes:
+                node = self.docstore.get_document(node_id, raise_error=False)
+                if node is None:
+                    # BM25 index older than the docstore
+                    logger.warning("BM25 node %s is not in the docstore", node_id)
+                    del scores[node_id]
+                    continue
+                nodes[node_id] = node
+        ranked = sorted(scores, key=scores.__getitem__, reverse=True)[: self.top_k]
+        return [NodeWithScore(node=nodes[node_id], score=scores[node_id]) for node_id in ranked]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        dense = self.dense_retriever.retrieve(query_bundle)
+        return self._fuse(dense, self._sparse(query_bundle))
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        dense = await self.dense_retriever.aretrieve(query_bundle)
+        # BM25 is a few array lookups, not worth a thread
+        return self._fuse(dense, self._sparse(query_bundle))
@@ -0,0 +1,160 @@
+"""Fit the reranked windows into the LLM's prompt budget."""
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from llama_index.core import Settings
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.node_parser.text.utils import split_by_sentence_tokenizer
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from src.agentic_rag.retrieval.postprocessors import merge_windows
+
+logger = logging.getLogger(__name__)
+
+Tokenizer = Callable[[str], List]
+
+
+def get_tokenizer(tokenizer_name: Optional[str] = None) -> Tokenizer:
+    """Token encoder of ``tokenizer_name`` (a HuggingFace tokenizer), or the
+    llama-index default tokenizer when it is not given or cannot be loaded."""
+    if tokenizer_name:
+        try:
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+            return lambda text: tokenizer.encode(text, add_special_tokens=False)
+        except (ImportError, OSError) as exc:
+            logger.warning(
+                "cannot load tokenizer %s (%s), counting with the default tokenizer",
+                tokenizer_name, exc,
+            )
+    return Settings.tokenizer
+
+
+class ContextPacker(BaseNodePostprocessor):
+    """Pack the best windows into ``context_window - max_new_tokens -
+    reserve_tokens`` tokens (or ``budget`` if given) minus the question.
+
+    Runs last, after the reranker. Windows of one document that overlap are
+    merged first; then, best score first, each window loses the sentences
+    already packed and is kept if it still fits. If not even the best window
+    fits, its leading sentences that do are kept.
+    """
+
+    context_window: int = Field(description="Context window of the LLM in tokens.")
+    max_new_tokens: int = Field(description="Tokens reserved for the answer.")
+    reserve_tokens: int = Field(
+        default=256, description="Tokens reserved for the prompt template."
+    )
+    budget: Optional[int] = Field(
+        default=None, description="Explicit context budget in tokens, overrides the above."
+    )
+    min_overlap_chars: int = Field(
+        default=20, description="Minimum shared text for windows to be merged."
+    )
+
+    _tokenizer: Tokenizer = PrivateAttr()
+    _split: Callable[[str], List[str]] = PrivateAttr()
+    _local: threading.local = PrivateAttr(default_factory=threading.local)
+    _stats_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _stats: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, tokenizer: Optional[Tokenizer] = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._tokenizer = tokenizer or get_tokenizer()
+        self._split = split_by_sentence_tokenizer()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextPacker"
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    def context_budget(self, query_bundle: Optional[QueryBundle] = None) -> int:
+        if self.budget is not None:
+            return self.budget
+        query_tokens = self.count_tokens(query_bundle.query_str) if query_bundle else 0
+        return max(0, self.context_window - self.max_new_tokens - self.reserve_tokens - query_tokens)
+
+    @property
+    def last_packed_tokens(self) -> Optional[int]:
+        """Context tokens packed by the last call in this thread."""
+        return getattr(self._local, "packed_tokens", None)
+
+    def _merge(self, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        merged: List[NodeWithScore] = []
+        for node in nodes:
+            text = node.node.get_content(metadata_mode=MetadataMode.NONE)
+            for kept in merged:
+                if kept.node.ref_doc_id != node.node.ref_doc_id:
+                    continue
+                joined = merge_windows(
+                    kept.node.get_content(metadata_mode=MetadataMode.NONE), text,
+                    self.min_overlap_chars,
+                )
+                if joined is not None:
+                    kept.node.set_content(joined)
+                    break
+            else:
+                merged.append(node)
+        return merged
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        budget = self.context_budget(query_bundle)
+        nodes = self._merge(sorted(nodes, key=lambda n: n.score or 0.0, reverse=True))
+
+        packed: List[NodeWithScore] = []
+        seen = set()
+        used = dropped_sentences = 0
+        for node in nodes:
+            sentences = self._split(node.node.get_content(metadata_mode=MetadataMode.NONE))
+            fresh = [s for s in sentences if " ".join(s.split()) not in seen]
+            dropped_sentences += len(sentences) - len(fresh)
+            if not fresh:
+                continue
+            # metadata is part of the prompt, so count the node as the LLM sees it
+            node.node.set_content("".join(fresh))
+            tokens = self.count_tokens(node.node.get_content(metadata_mode=MetadataMode.LLM))
+            if used + tokens > budget:
+                if packed:
+                    continue
+                while fresh and used + tokens > budget:
+                    fresh.pop()
+                    node.node.set_content("".join(fresh))
+                    tokens = self.count_tokens(node.node.get_content(metadata_mode=MetadataMode.LLM))
+                if not fresh:
+                    continue
+            seen.update(" ".join(s.split()) for s in fresh)
+            packed.append(node)
+            used += tokens
+
+        logger.debug(
+            "packed %d of %d windows into %d/%d tokens, %d redundant sentences dropped",
+            len(packed), len(nodes), used, budget, dropped_sentences,
+        )
+        self._local.packed_tokens = used
+        with self._stats_lock:
+            for key, value in (
+                ("queries", 1),
+                ("packed_tokens", used),
+                ("packed_nodes", len(packed)),
+                ("dropped_nodes", len(nodes) - len(packed)),
+                ("dropped_sentences", dropped_sentences),
+            ):
+                self._stats[key] = self._stats.get(key, 0) + value
+        return packed
+
+    def stats(self) -> Dict[str, float]:
+        """Totals since start plus packed tokens per query."""
+        with self._stats_lock:
+            stats: Dict[str, float] = dict(self._stats)
+        if stats.get("queries"):
+            stats["packed_tokens_per_query"] = stats["packed_tokens"] / stats["queries"]
+        return stats
@@ -0,0 +1,149 @@
+"""Node postprocessors used between retrieval and reranking."""
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+logger = logging.getLogger(__name__)
+
+
+def text_overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of ``a`` that is a prefix of ``b``."""
+    # KMP failure function of b, then run a through the automaton
+    if not a or not b:
+        return 0
+    fail = [0] * len(b)
+    k = 0
+    for i in range(1, len(b)):
+        while k and b[i] != b[k]:
+            k = fail[k - 1]
+        if b[i] == b[k]:
+            k += 1
+        fail[i] = k
+    # only the last len(b) chars of a can take part in the overlap
+    k = 0
+    for ch in a[-len(b):]:
+        while k and ch != b[k]:
+            k = fail[k - 1]
+        if ch == b[k]:
+            k += 1
+    return k
+
+
+def merge_windows(a: str, b: str, min_overlap: int) -> Optional[str]:
+    """Merge two windows of the same document if they contain or overlap
+    each other, else return None."""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    overlap = text_overlap(a, b)
+    if overlap >= min_overlap:
+        return a + b[overlap:]
+    overlap = text_overlap(b, a)
+    if overlap >= min_overlap:
+        return b + a[overlap:]
+    return None
+
+
+class RerankCandidateFilter(BaseNodePostprocessor):
+    """Shrink the candidate set before it reaches the cross-encoder.
+
+    Runs after ``MetadataReplacementPostProcessor``, so each node's text is
+    its sentence window. In score order it
+
+    1. drops nodes under ``similarity_cutoff`` (the embedding score),
+    2. drops windows identical to or contained in a kept window and merges
+       windows of the same document that overlap (adjacent sentences), and
+    3. keeps at most ``max_candidates`` nodes.
+
+    A merged node keeps the best score of its parts.
+    """
+
+    deduplicate: bool = Field(
+        default=True, description="Drop duplicate and merge overlapping windows."
+    )
+    similarity_cutoff: Optional[float] = Field(
+        default=None, description="Drop nodes whose retrieval score is lower."
+    )
+    max_candidates: Optional[int] = Field(
+        default=None, description="Maximum number of nodes passed on."
+    )
+    min_overlap_chars: int = Field(
+        default=20, description="Minimum shared text for windows to be merged."
+    )
+    max_merged_chars: int = Field(
+        default=4000, description="Windows are not merged beyond this length."
+    )
+
+    _stats_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _stats: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RerankCandidateFilter"
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        retrieved = len(nodes)
+        nodes = sorted(nodes, key=lambda n: n.score or 0.0, reverse=True)
+        if self.similarity_cutoff is not None:
+            nodes = [n for n in nodes if (n.score or 0.0) >= self.similarity_cutoff]
+        after_cutoff = len(nodes)
+
+        kept = self._deduplicate(nodes) if self.deduplicate else nodes
+        if self.max_candidates is not None:
+            kept = kept[: self.max_candidates]
+        logger.debug(
+            "rerank candidates: %d retrieved, %d above cutoff, %d after dedup",
+            retrieved, after_cutoff, len(kept),
+        )
+        with self._stats_lock:
+            for key, value in (
+                ("queries", 1),
+                ("retrieved", retrieved),
+                ("after_cutoff", after_cutoff),
+                ("reranker_pairs", len(kept)),
+            ):
+                self._stats[key] = self._stats.get(key, 0) + value
+        return kept
+
+    def _deduplicate(self, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        kept: List[NodeWithScore] = []
+        texts: List[str] = []
+        by_doc: Dict[Optional[str], List[int]] = {}
+        seen = set()
+        for node in nodes:
+            text = node.node.get_content(metadata_mode=MetadataMode.NONE)
+            if text in seen:
+                continue
+            seen.add(text)
+            doc_slots = by_doc.setdefault(node.node.ref_doc_id, [])
+            for slot in doc_slots:
+                merged = merge_windows(texts[slot], text, self.min_overlap_chars)
+                if merged is not None and len(merged) <= self.max_merged_chars:
+                    if merged != texts[slot]:
+                        texts[slot] = merged
+                        kept[slot].node.set_content(merged)
+                    break
+            else:
+                doc_slots.append(len(kept))
+                kept.append(node)
+                texts.append(text)
+        return kept
+
+    def stats(self) -> Dict[str, float]:
+        """Totals since start plus reranker pairs per query before/after."""
+        with self._stats_lock:
+            stats: Dict[str, float] = dict(self._stats)
+        queries = stats.get("queries", 0)
+        if queries:
+            stats["pairs_per_query_before"] = stats["retrieved"] / queries
+            stats["pairs_per_query_after"] = stats["reranker_pairs"] / queries
+        return stats
@@ -0,0 +1,102 @@
+"""Process-wide registry of loaded indexes and rerankers.
+
+Every ``Engine`` (and every request served by the same process) shares the
+objects created here, so an index directory is loaded and a reranker model
+is instantiated at most once per process.
+"""
+import logging
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from llama_index.core import Settings, VectorStoreIndex, load_index_from_storage
+from llama_index.core.callbacks import CallbackManager
+
+from src.agentic_rag.retrieval.rerank import BatchedRerank, RerankService
+from src.agentic_rag.vector_stores.bm25 import BM25Index
+from src.agentic_rag.vector_stores.storage import get_storage_context
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_key_locks: Dict[Hashable, threading.Lock] = {}
+_objects: Dict[Hashable, Any] = {}
+
+
+def _get_or_create(key: Hashable, factory) -> Any:
+    # one lock per key: loading an index does not block loading a reranker
+    with _lock:
+        if key in _objects:
+            return _objects[key]
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        if key not in _objects:
+            logger.info("loading %s", key)
+            _objects[key] = factory()
+        return _objects[key]
+
+
+def get_index(
+    indexer_db: str,
+    vector_store: Optional[str] = None,
+    callback_manager: Optional[CallbackManager] = None,
+    **store_kwargs: Any,
+) -> VectorStoreIndex:
+    key: Tuple = ("index", indexer_db, vector_store, tuple(sorted(store_kwargs.items())))
+    return _get_or_create(
+        key,
+        lambda: load_index_from_storage(
+            get_storage_context(indexer_db, vector_store, **store_kwargs),
+            embed_model=Settings.embed_model,
+            callback_manager=callback_manager,
+        ),
+    )
+
+
+def get_bm25(indexer_db: str) -> BM25Index:
+    if not BM25Index.exists(indexer_db):
+        raise FileNotFoundError(
+            f"no BM25 index in {indexer_db}, run the indexer again to build it"
+        )
+    return _get_or_create(("bm25", indexer_db), lambda: BM25Index.load(indexer_db))
+
+
+def get_rerank_service(
+    model: str = "BAAI/bge-reranker-base",
+    backend: str = "sentence-transformers",
+    quantize: bool = False,
+) -> RerankService:
+    return _get_or_create(
+        ("rerank_service", model, backend, quantize),
+        lambda: RerankService.from_model(model, backend=backend, quantize=quantize),
+    )
+
+
+def set_rerank_service(
+    service: RerankService,
+    model: str = "BAAI/bge-reranker-base",
+    backend: str = "sentence-transformers",
+    quantize: bool = False,
+) -> None:
+    """Use ``service`` for ``model`` (e.g. one with a stand-in scorer)."""
+    with _lock:
+        _objects[("rerank_service", model, backend, quantize)] = service
+
+
+def get_reranker(
+    model: str = "BAAI/bge-reranker-base",
+    top_n: int = 5,
+    backend: str = "sentence-transformers",
+    quantize: bool = False,
+) -> BatchedRerank:
+    # rerankers with different top_n share one model and one batching queue
+    return _get_or_create(
+        ("reranker", model, top_n, backend, quantize),
+        lambda: BatchedRerank(get_rerank_service(model, backend, quantize), model=model, top_n=top_n),
+    )
+
+
+def clear() -> None:
+    """Forget every shared object (e.g. after the index was rebuilt)."""
+    with _lock:
+        _objects.clear()
+        _key_locks.clear()
@@ -0,0 +1,357 @@
+"""Cross-encoder reranking shared by concurrent requests.
+
+``RerankService`` owns one cross-encoder and a background thread that
+micro-batches the (query, passage) pairs of concurrent requests: the first
+request opens a batch, which is scored once it holds ``max_batch_pairs``
+pairs or ``max_wait_ms`` have passed. Scores are cached per (query hash,
+node id) so repeated questions skip the model. ``BatchedRerank`` is the
+llama-index postprocessor in front of it.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.callbacks import CBEventType, EventPayload
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+logger = logging.getLogger(__name__)
+
+Scorer = Callable[[List[Tuple[str, str]]], Sequence[float]]
+
+RERANK_BACKENDS = ("sentence-transformers", "onnx")
+DEFAULT_RERANK_MAX_LENGTH = 512
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def sentence_transformers_scorer(model: str, device: Optional[str] = None, batch_size: int = 32) -> Scorer:
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError as exc:
+        raise ImportError(
+            "The sentence-transformers rerank backend requires sentence-transformers.\n"
+            "Please install it with `pip install torch sentence-transformers`."
+        ) from exc
+    from llama_index.core.utils import infer_torch_device
+
+    cross_encoder = CrossEncoder(
+        model, max_length=DEFAULT_RERANK_MAX_LENGTH, device=device or infer_torch_device()
+    )
+    return lambda pairs: cross_encoder.predict(pairs, batch_size=batch_size)
+
+
+def onnx_scorer(model: str, quantize: bool = False, cache_dir: Optional[str] = None) -> Scorer:
+    """CPU scorer running an ONNX export of ``model``, optionally with
+    dynamic int8 quantization of the weights."""
+    try:
+        import numpy as np
+        from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+    except ImportError as exc:
+        raise ImportError(
+            "The onnx rerank backend requires optimum and onnxruntime.\n"
+            "Please install them with `pip install optimum[onnxruntime]`."
+        ) from exc
+
+    cache_dir = cache_dir or os.path.join(
+        os.path.expanduser("~"), ".cache", "agentic_rag", model.replace("/", "--")
+    )
+    onnx_dir = os.path.join(cache_dir, "onnx")
+    if not os.path.exists(os.path.join(onnx_dir, "model.onnx")):
+        ORTModelForSequenceClassification.from_pretrained(model, export=True).save_pretrained(onnx_dir)
+        AutoTokenizer.from_pretrained(model).save_pretrained(onnx_dir)
+    model_dir, file_name = onnx_dir, "model.onnx"
+    if quantize:
+        model_dir, file_name = os.path.join(cache_dir, "onnx-int8"), "model_quantized.onnx"
+        if not os.path.exists(os.path.join(model_dir, file_name)):
+            quantizer = ORTQuantizer.from_pretrained(onnx_dir)
+            quantizer.quantize(
+                save_dir=model_dir,
+                quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False),
+            )
+            AutoTokenizer.from_pretrained(onnx_dir).save_pretrained(model_dir)
+
+    ort_model = ORTModelForSequenceClassification.from_pretrained(model_dir, file_name=file_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def score(pairs: List[Tuple[str, str]]) -> Sequence[float]:
+        inputs = tokenizer(
+            [q for q, _ in pairs], [p for _, p in pairs], padding=True, truncation=True,
+            max_length=DEFAULT_RERANK_MAX_LENGTH, return_tensors="np",
+        )
+        logits = ort_model(**inputs).logits
+        return np.asarray(logits).reshape(len(pairs), -1)[:, 0].tolist()
+
+    return score
+
+
+class _Request:
+    __slots__ = ("pairs", "future")
+
+    def __init__(self, pairs: List[Tuple[str, str]]) -> None:
+        self.pairs = pairs
+        self.future: Future = Future()
+
+
+class RerankService:
+    """Micro-batching, caching front end for a cross-encoder scorer.
+
+    Args:
+        scorer: function scoring a list of (query, passage) pairs
+        max_batch_pairs: pairs scored by one model call at most
+        max_wait_ms: how long a batch waits for more requests
+        cache_size: cached (query, passage) scores, 0 disables the cache
+
+    """
+
+    def __init__(
+        self,
+        scorer: Scorer,
+        max_batch_pairs: int = 64,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 100_000,
+    ) -> None:
+        self.scorer = scorer
+        self.max_batch_pairs = max_batch_pairs
+        self.max_wait_ms = max_wait_ms
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.batches = 0
+        self.pairs_scored = 0
+        self._cache: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="rerank-batcher", daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def from_model(
+        cls,
+        model: str = "BAAI/bge-reranker-base",
+        backend: str = "sentence-transformers",
+        quantize: bool = False,
+        **kwargs: Any,
+    ) -> "RerankService":
+        if backend not in RERANK_BACKENDS:
+            raise ValueError(f"backend must be one of {RERANK_BACKENDS}, got {backend!r}")
+        if backend == "onnx":
+            scorer = onnx_scorer(model, quantize=quantize)
+        elif quantize:
+            raise ValueError("quantize is only supported by the onnx backend")
+        else:
+            scorer = sentence_transformers_scorer(model)
+        return cls(scorer, **kwargs)
+
+    def _run(self) -> None:
+        while True:
+            requests = [self._queue.get()]
+            pairs = len(requests[0].pairs)
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            while pairs < self.max_batch_pairs:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                requests.append(request)
+                pairs += len(request.pairs)
+
+            # requests whose caller gave up (e.g. a cancelled speculative
+            # retrieval) are not scored
+            requests = [r for r in requests if r.future.set_running_or_notify_cancel()]
+            if not requests:
+                continue
+            batch = [pair for request in requests for pair in request.pairs]
+            try:
+                scores = list(self.scorer(batch))
+            except BaseException as exc:
+                for request in requests:
+                    request.future.set_exception(exc)
+                continue
+            logger.debug("reranked %d pairs from %d requests", len(batch), len(requests))
+            self.batches += 1
+            self.pairs_scored += len(batch)
+            offset = 0
+            for request in requests:
+                request.future.set_result(scores[offset : offset + len(request.pairs)])
+                offset += len(request.pairs)
+
+    def submit(
+        self, query: str, passages: Sequence[str], ids: Optional[Sequence[str]] = None
+    ) -> Future:
+        """Score ``passages`` against ``query``; cached pairs are not sent
+        to the model.
+
+        ``ids`` identify the passages in the cache (node ids); the passage
+        text is hashed into the key as well because merged sentence windows
+        change a node's text.
+        """
+        query_key = _digest(query)
+        keys = [
+            (query_key, ids[i] if ids is not None else "", _digest(passage))
+            for i, passage in enumerate(passages)
+        ]
+        scores: List[Optional[float]] = [None] * len(keys)
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                score = self._cache.get(key)
+                if score is not None:
+                    self._cache.move_to_end(key)
+                    scores[i] = score
+        missing = [i for i, score in enumerate(scores) if score is None]
+        with self._cache_lock:
+            self.cache_hits += len(keys) - len(missing)
+            self.cache_misses += len(missing)
+
+        result: Future = Future()
+        if not missing:
+            result.set_result(scores)
+            return result
+
+        request = _Request([(query, passages[i]) for i in missing])
+
+        def done(future: Future) -> None:
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                if not result.cancelled():
+                    result.set_exception(future.exception())
+                return
+            with self._cache_lock:
+                for i, score in zip(missing, future.result()):
+                    scores[i] = float(score)
+                    if self.cache_size:
+                        self._cache[keys[i]] = float(score)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            # the caller may have cancelled after the batch started; the
+            # scores are cached all the same
+            try:
+                result.set_result(scores)
+            except InvalidStateError:
+                pass
+
+        request.future.add_done_callback(done)
+        result.add_done_callback(lambda f: f.cancelled() and request.future.cancel())
+        self._queue.put(request)
+        return result
+
+    def score(
+        self, query: str, passages: Sequence[str], ids: Optional[Sequence[str]] = None
+    ) -> List[float]:
+        return self.submit(query, passages, ids).result()
+
+    async def ascore(
+        self, query: str, passages: Sequence[str], ids: Optional[Sequence[str]] = None
+    ) -> List[float]:
+        return await asyncio.wrap_future(self.submit(query, passages, ids))
+
+    def stats(self) -> dict:
+        return {
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "batches": self.batches,
+            "pairs_scored": self.pairs_scored,
+            "pairs_per_batch": self.pairs_scored / self.batches if self.batches else 0.0,
+        }
+
+
+class BatchedRerank(BaseNodePostprocessor):
+    """Rerank nodes through a shared :class:`RerankService`.
+
+    Drop-in replacement for ``SentenceTransformerRerank``.
+    """
+
+    model: str = Field(description="Cross-encoder model name.")
+    top_n: int = Field(description="Number of nodes to return sorted by score.")
+    keep_retrieval_score: bool = Field(
+        default=False, description="Whether to keep the retrieval score in metadata."
+    )
+
+    _service: RerankService = PrivateAttr()
+
+    def __init__(self, service: RerankService, model: str, top_n: int = 5, **kwargs: Any) -> None:
+        super().__init__(model=model, top_n=top_n, **kwargs)
+        self._service = service
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BatchedRerank"
+
+    @property
+    def service(self) -> RerankService:
+        return self._service
+
+    def _event(self, nodes: List[NodeWithScore], query_bundle: QueryBundle) -> Any:
+        return self.callback_manager.event(
+            CBEventType.RERANKING,
+            payload={
+                EventPayload.NODES: nodes,
+                EventPayload.MODEL_NAME: self.model,
+                EventPayload.QUERY_STR: query_bundle.query_str,
+                EventPayload.TOP_K: self.top_n,
+            },
+        )
+
+    @staticmethod
+    def _passages(nodes: List[NodeWithScore]) -> Tuple[List[str], List[str]]:
+        return (
+            [node.node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes],
+            [node.node.node_id for node in nodes],
+        )
+
+    def _rank(self, nodes: List[NodeWithScore], scores: Sequence[float]) -> List[NodeWithScore]:
+        for node, score in zip(nodes, scores):
+            if self.keep_retrieval_score:
+                node.node.metadata["retrieval_score"] = node.score
+            node.score = score
+        return sorted(nodes, key=lambda x: -x.score if x.score else 0)[: self.top_n]
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None:
+            raise ValueError("Missing query bundle in extra info.")
+        if not nodes:
+            return []
+
+        with self._event(nodes, query_bundle) as event:
+            scores = self._service.score(query_bundle.query_str, *self._passages(nodes))
+            new_nodes = self._rank(nodes, scores)
+            event.on_end(payload={EventPayload.NODES: new_nodes})
+        return new_nodes
+
+    async def apostprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        """Async :meth:`postprocess_nodes`; cancelling it withdraws the pairs
+        not yet scored from the batch queue."""
+        if query_bundle is None:
+            raise ValueError("Missing query bundle in extra info.")
+        if not nodes:
+            return []
+
+        with self._event(nodes, query_bundle) as event:
+            scores = await self._service.ascore(query_bundle.query_str, *self._passages(nodes))
+            new_nodes = self._rank(nodes, scores)
+            event.on_end(payload={EventPayload.NODES: new_nodes})
+        return new_nodes
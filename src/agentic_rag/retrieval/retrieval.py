@@ -1,65 +1,375 @@
-from llama_index.core.llms import ChatMessage, MessageRole
-from llama_index.core.prompts import ChatPromptTemplate
+from llama_index.core import Settings, get_response_synthesizer
+from llama_index.core.callbacks import CallbackManager, LlamaDebugHandler
+from llama_index.core.chat_engine import CondenseQuestionChatEngine
+from llama_index.core.node_parser import SentenceWindowNodeParser
+from llama_index.core.postprocessor import MetadataReplacementPostProcessor
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.base.response.schema import Response
+from llama_index.core.schema import QueryBundle
+
+import threading
+
+from src.agentic_rag.llms.cache import sources_key
+from src.agentic_rag.retrieval import registry
+from src.agentic_rag.retrieval.hybrid import HybridRetriever
+from src.agentic_rag.retrieval.packing import ContextPacker, get_tokenizer
+from src.agentic_rag.retrieval.postprocessors import RerankCandidateFilter
+from src.agentic_rag.retrieval.rerank import BatchedRerank
+from src.utils.tracing import TracingHandler, tracer
+
+# stage under which each postprocessor is timed
+STAGES = {
+    MetadataReplacementPostProcessor: 'window_replacement',
+    RerankCandidateFilter: 'candidate_filter',
+    BatchedRerank: 'rerank',
+    ContextPacker: 'packing',
+}
 
 
 class Engine:
+    """Query, retrieval and chat engines over a persisted sentence index.
+
+    Nothing is loaded in the constructor: the index, the reranker and each
+    engine are built on first use, and the index and reranker come from
+    :mod:`registry` so they are shared by every ``Engine`` in the process.
+    Servers call :meth:`warm_up` at startup to pay the loading cost there.
+    """
+
+    def __init__(self,indexer_db, similarity_top_k=100, rerank_top_n=5, vector_store=None, ann=None, nprobe=8, ef=128,
+                 rerank_model="BAAI/bge-reranker-base", rerank_backend="sentence-transformers",
+                 rerank_quantize=False, debug=False,
+                 dedup_windows=True, similarity_cutoff=None, max_rerank_candidates=None,
+                 response_cache=None, pack_context=True, context_budget=None, tokenizer_name=None,
+                 session_store=None, hybrid=False, sparse_top_k=20, rrf_k=60):
+        """``vector_store`` defaults to the backend ``indexer_db`` was built
+        with; a ``numpy`` store is memory-mapped instead of parsed from JSON.
+        ``ann`` (``ivf`` or ``hnsw``, numpy store only) replaces the full scan
+        by the ANN index built by the indexer, tuned by ``nprobe`` / ``ef``.
+        ``rerank_model=None`` disables reranking. The reranker batches the
+        pairs of concurrent queries and caches their scores; with
+        ``rerank_backend="onnx"`` it runs an ONNX export on CPU, int8
+        quantized if ``rerank_quantize``.
+
+        Before reranking, windows are deduplicated and overlapping windows of
+        one document merged (``dedup_windows``), nodes scoring below
+        ``similarity_cutoff`` dropped and at most ``max_rerank_candidates``
+        kept, which bounds the cross-encoder work per query.
+
+        With a ``response_cache`` (:class:`~src.agentic_rag.llms.cache.ResponseCache`)
+        :meth:`query` still retrieves, but reuses the answer of an identical
+        question, or of a question within the cache's similarity threshold,
+        that was answered from the same source nodes.
+
+        With ``pack_context`` the reranked windows are packed into the LLM's
+        ``context_window`` minus its ``max_new_tokens`` (or ``context_budget``
+        tokens), counted with ``tokenizer_name`` (default: the LLM's
+        tokenizer); :meth:`query` reports the ``packed_tokens`` in the
+        response metadata.
+
+        With a ``session_store`` (:class:`~src.agentic_rag.memory.sessions.SessionStore`)
+        the chat engines keep their history there: summarized, bounded to
+        the store's token budget and per session (:meth:`session_chat_engine`).
 
+        With ``hybrid`` the ``similarity_top_k`` dense nodes are fused with
+        the ``sparse_top_k`` best nodes of the BM25 index the indexer builds
+        (:class:`~src.agentic_rag.retrieval.hybrid.HybridRetriever`). Exact
+        terms no longer depend on dense over-fetching, so a much smaller
+        ``similarity_top_k`` (e.g. 20 instead of 100) keeps the recall and
+        cuts the reranker's work. Fused scores are ranks, not similarities,
+        so ``similarity_cutoff`` cannot be combined with it.
 
-    def __init__(self,indexer_db, similarity_top_k=100, rerank_top_n=5):
+        Each stage of a query is timed in :data:`~src.utils.tracing.tracer`;
+        ``debug`` additionally prints the llama-index event trace and the
+        chat engines' condensed questions."""
+        self.indexer_db = indexer_db
+        self.similarity_top_k = similarity_top_k
+        self.rerank_top_n = rerank_top_n
+        self.rerank_model = rerank_model
+        self.rerank_backend = rerank_backend
+        self.rerank_quantize = rerank_quantize
+        self.vector_store = vector_store
+        self.response_cache = response_cache
+        self.pack_context = pack_context
+        self.context_budget = context_budget
+        self.tokenizer_name = tokenizer_name
+        self.session_store = session_store
+        self.debug = debug
+        if hybrid and similarity_cutoff is not None:
+            raise ValueError("similarity_cutoff applies to dense scores, it cannot be used with hybrid")
+        self.hybrid = hybrid
+        self.sparse_top_k = sparse_top_k
+        self.rrf_k = rrf_k
+        self._search_stage = 'hybrid_search' if hybrid else 'vector_search'
+        self.store_kwargs = dict(ann=ann, nprobe=nprobe, ef=ef) if ann else {}
+        self.candidate_filter = None
+        if dedup_windows or similarity_cutoff is not None or max_rerank_candidates is not None:
+            self.candidate_filter = RerankCandidateFilter(
+                deduplicate=dedup_windows, similarity_cutoff=similarity_cutoff,
+                max_candidates=max_rerank_candidates,
+            )
 
         self.sentence_node_parser = SentenceWindowNodeParser.from_defaults(
             window_size=3,
             window_metadata_key="window",
             original_text_metadata_key="original_text")
 
+        handlers = [TracingHandler()]
+        if debug:
+            handlers.append(LlamaDebugHandler(print_trace_on_end=True))
+        self.callback_manager = CallbackManager(handlers)
 
-        llama_debug = LlamaDebugHandler(print_trace_on_end=True)
-        callback_manager = CallbackManager([llama_debug])
+        self._lock = threading.RLock()
+        self._built = {}
 
-        self.sentence_index = load_index_from_storage(StorageContext.from_defaults(persist_dir=indexer_db),
-        llm=Settings.llm, embed_model=Settings.embed_model, callback_manager=callback_manager
-        )
+    def _lazy(self, name, factory):
+        if name not in self._built:
+            with self._lock:
+                if name not in self._built:
+                    self._built[name] = factory()
+        return self._built[name]
 
+    @property
+    def sentence_index(self):
+        return self._lazy('sentence_index', lambda: registry.get_index(
+            self.indexer_db, self.vector_store, callback_manager=self.callback_manager, **self.store_kwargs))
 
-        postproc = MetadataReplacementPostProcessor(target_metadata_key="window")
-        rerank = SentenceTransformerRerank(
-            top_n=rerank_top_n, model="BAAI/bge-reranker-base"
-        )
+    @property
+    def node_postprocessors(self):
+        def build():
+            postprocessors = [MetadataReplacementPostProcessor(target_metadata_key="window")]
+            if self.candidate_filter is not None:
+                postprocessors.append(self.candidate_filter)
+            if self.rerank_model:
+                postprocessors.append(registry.get_reranker(
+                    self.rerank_model, self.rerank_top_n, self.rerank_backend, self.rerank_quantize))
+            if self.pack_context:
+                postprocessors.append(self._build_packer())
+            return postprocessors
+        return self._lazy('node_postprocessors', build)
 
-        self.sentence_window_engine = self.sentence_index.as_query_engine(
-            similarity_top_k=similarity_top_k, node_postprocessors=[postproc, rerank],llm=Settings.llm
+    def _build_packer(self):
+        llm = Settings.llm
+        tokenizer_name = self.tokenizer_name or getattr(llm, 'tokenizer_name', None)
+        return ContextPacker(
+            context_window=llm.metadata.context_window,
+            max_new_tokens=llm.metadata.num_output,
+            budget=self.context_budget,
+            tokenizer=get_tokenizer(tokenizer_name),
         )
 
-        self.retriever_engine = self.sentence_index.as_retriever(
-            similarity_top_k=similarity_top_k, node_postprocessors=[postproc, rerank],llm=Settings.llm)
+    @property
+    def context_packer(self):
+        if not self.pack_context:
+            return None
+        return self.node_postprocessors[-1]
+
+    @property
+    def hybrid_retriever(self):
+        return self._lazy('hybrid_retriever', lambda: HybridRetriever(
+            self.sentence_index.as_retriever(similarity_top_k=self.similarity_top_k),
+            registry.get_bm25(self.indexer_db), self.sentence_index.docstore,
+            sparse_top_k=self.sparse_top_k, rrf_k=self.rrf_k, callback_manager=self.callback_manager,
+        ))
+
+    @property
+    def sentence_window_engine(self):
+        if self.hybrid:
+            return self._lazy('sentence_window_engine', lambda: RetrieverQueryEngine.from_args(
+                self.hybrid_retriever, llm=Settings.llm, node_postprocessors=self.node_postprocessors))
+        return self._lazy('sentence_window_engine', lambda: self.sentence_index.as_query_engine(
+            similarity_top_k=self.similarity_top_k, node_postprocessors=self.node_postprocessors, llm=Settings.llm
+        ))
+
+    @property
+    def retriever_engine(self):
+        if self.hybrid:
+            return self.hybrid_retriever
+        return self._lazy('retriever_engine', lambda: self.sentence_index.as_retriever(
+            similarity_top_k=self.similarity_top_k, node_postprocessors=self.node_postprocessors, llm=Settings.llm))
+
+    @property
+    def chat_engine(self):
+        return self._lazy('chat_engine', lambda: self.session_chat_engine('default', condense=False))
+
+    @property
+    def condense_chat_engine(self):
+        return self._lazy('condense_chat_engine', lambda: self.session_chat_engine('default'))
+
+    def session_chat_engine(self, session_id, condense=True):
+        """Chat engine over the history of ``session_id`` in the
+        ``session_store``, bounded to its token budget; without a store the
+        history is the chat engine's own, unbounded buffer.
+
+        Building one is cheap, so servers build one per request."""
+        memory = self.session_store.memory(session_id) if self.session_store is not None else None
+        if condense:
+            return CondenseQuestionChatEngine.from_defaults(
+                query_engine=self.sentence_window_engine,
+                llm=Settings.llm,
+                memory=memory,
+                verbose=self.debug,
+            )
+        return self.sentence_index.as_chat_engine(
+            llm=Settings.llm, similarity_top_k=self.similarity_top_k, node_postprocessors=self.node_postprocessors,
+            chat_mode="simple", memory=memory, verbose=self.debug)
 
-        self.chat_engine = self.sentence_index.as_chat_engine(llm=Settings.llm,similarity_top_k=similarity_top_k, node_postprocessors=[postproc, rerank],chat_mode="simple", verbose = True)
+    def warm_up(self, query=None):
+        """Load the index, reranker and query engine ahead of the first
+        request; with ``query`` also run one retrieval and rerank."""
+        engine = self.sentence_window_engine
+        if query:
+            engine.retrieve(QueryBundle(query))
+        return self
+
+    def rerank_stats(self):
+        """Reranker pairs scored per query before/after candidate filtering,
+        plus the batching and score cache counters of the reranker."""
+        stats = self.candidate_filter.stats() if self.candidate_filter is not None else {}
+        for postprocessor in self._built.get('node_postprocessors', []):
+            if isinstance(postprocessor, BatchedRerank):
+                stats.update(postprocessor.service.stats())
+        return stats
+
+    def packing_stats(self):
+        """Context tokens packed per query and what the packer dropped."""
+        return self.context_packer.stats() if self.pack_context else {}
+
+    def _with_packed_tokens(self, response, packed_tokens=None):
+        if self.pack_context:
+            response.metadata = dict(response.metadata or {})
+            response.metadata['packed_tokens'] = (
+                packed_tokens if packed_tokens is not None else self.context_packer.last_packed_tokens)
+        return response
+
+    def cache_stats(self):
+        """Hit/miss counters of the response cache."""
+        return self.response_cache.stats() if self.response_cache is not None else {}
+
+    def _cache_key(self, query, nodes):
+        source_ids = [node.node.node_id for node in nodes]
+        return self.response_cache.make_key('query', query.rstrip(), sources_key(source_ids)), source_ids
+
+    def _cached_response(self, query_bundle, nodes):
+        key, source_ids = self._cache_key(query_bundle.query_str, nodes)
+        cached, tier = self.response_cache.get(key, query_bundle.embedding, source_ids)
+        if cached is not None:
+            return Response(cached['text'], source_nodes=nodes, metadata={'cache': tier})
+        return None
+
+    def _cache_response(self, query_bundle, nodes, llm_response):
+        key, source_ids = self._cache_key(query_bundle.query_str, nodes)
+        self.response_cache.put(key, {'text': str(llm_response)}, query_bundle.embedding, source_ids)
+
+    def retrieve(self, query):
+        """Embed, search and postprocess ``query``, timing each stage.
+
+        Returns the query bundle (with its embedding), the nodes and the
+        packed context tokens."""
+        with tracer.stage('query_embedding'):
+            # computed once for retrieval and the semantic tier of the cache
+            query_bundle = QueryBundle(query, embedding=Settings.embed_model.get_query_embedding(query))
+        with tracer.stage(self._search_stage):
+            nodes = self.sentence_window_engine.retriever.retrieve(query_bundle)
+        for postprocessor in self.node_postprocessors:
+            with tracer.stage(STAGES.get(type(postprocessor), postprocessor.class_name())):
+                nodes = postprocessor.postprocess_nodes(nodes, query_bundle=query_bundle)
+        packed_tokens = self.context_packer.last_packed_tokens if self.pack_context else None
+        return query_bundle, nodes, packed_tokens
+
+    def synthesize(self, query_bundle, nodes, packed_tokens=None):
+        if self.response_cache is not None:
+            cached = self._cached_response(query_bundle, nodes)
+            if cached is not None:
+                return self._with_packed_tokens(cached, packed_tokens)
+
+        with tracer.stage('synthesis'):
+            llm_response = self.sentence_window_engine.synthesize(query_bundle, nodes)
+        if self.response_cache is not None:
+            self._cache_response(query_bundle, nodes, llm_response)
+        return self._with_packed_tokens(llm_response, packed_tokens)
 
     def query(self, query):
-        llm_response =  self.sentence_window_engine.query(query)
-        return llm_response
+        return self.synthesize(*self.retrieve(query))
+
+    async def aretrieve(self, query):
+        """Embed, search and postprocess ``query`` without blocking the
+        event loop on remote calls; cancelling it cancels the in-flight
+        embedding request and withdraws pending rerank pairs.
+
+        Returns the query bundle (with its embedding), the nodes and the
+        packed context tokens."""
+        with tracer.stage('query_embedding'):
+            query_bundle = QueryBundle(query, embedding=await Settings.embed_model.aget_query_embedding(query))
+        with tracer.stage(self._search_stage):
+            nodes = await self.sentence_window_engine.retriever.aretrieve(query_bundle)
+        for postprocessor in self.node_postprocessors:
+            with tracer.stage(STAGES.get(type(postprocessor), postprocessor.class_name())):
+                if hasattr(postprocessor, 'apostprocess_nodes'):
+                    nodes = await postprocessor.apostprocess_nodes(nodes, query_bundle=query_bundle)
+                else:
+                    nodes = postprocessor.postprocess_nodes(nodes, query_bundle=query_bundle)
+        # read right after the packer ran, before another task can run it
+        packed_tokens = self.context_packer.last_packed_tokens if self.pack_context else None
+        return query_bundle, nodes, packed_tokens
+
+    async def asynthesize(self, query_bundle, nodes, packed_tokens=None):
+        if self.response_cache is not None:
+            cached = self._cached_response(query_bundle, nodes)
+            if cached is not None:
+                return self._with_packed_tokens(cached, packed_tokens)
+
+        with tracer.stage('synthesis'):
+            llm_response = await self.sentence_window_engine.asynthesize(query_bundle, nodes)
+        if self.response_cache is not None:
+            self._cache_response(query_bundle, nodes, llm_response)
+        return self._with_packed_tokens(llm_response, packed_tokens)
+
+    async def aquery(self, query):
+        return await self.asynthesize(*await self.aretrieve(query))
+
+    @property
+    def streaming_synthesizer(self):
+        return self._lazy('streaming_synthesizer', lambda: get_response_synthesizer(
+            llm=Settings.llm, callback_manager=self.callback_manager, streaming=True))
+
+    async def astream_synthesize(self, query_bundle, nodes):
+        """Yield the answer over ``nodes`` as the LLM generates it; a cached
+        answer is yielded whole. Closing the generator stops generation."""
+        if self.response_cache is not None:
+            cached = self._cached_response(query_bundle, nodes)
+            if cached is not None:
+                yield cached.response
+                return
+        if not nodes:
+            yield 'Empty Response'
+            return
 
+        text = []
+        with tracer.stage('synthesis'):
+            response = await self.streaming_synthesizer.asynthesize(query_bundle, nodes)
+            # the dataclass field shadows the method of the same name
+            async for delta in response.async_response_gen:
+                text.append(delta)
+                yield delta
+        if self.response_cache is not None:
+            self._cache_response(query_bundle, nodes, ''.join(text))
 
 
-engines = Engine(indexer_db)
-print(engines.sentence_index)
-print(engines.sentence_window_engine)
-print(engines.retriever_engine)
-# print(engines.sentence_window_engine.query('Summarize grounding requirements for Light Duty site as per Motorola R56.'))
+if __name__ == '__main__':
+    from src.agentic_rag.indexer.indexer import indexer_db
 
-chat_engine = engines.chat_engine
+    engines = Engine(indexer_db)
+    print(engines.sentence_index)
+    print(engines.sentence_window_engine)
+    print(engines.retriever_engine)
+    # print(engines.sentence_window_engine.query('Summarize grounding requirements for Light Duty site as per Motorola R56.'))
 
-from llama_index.core.chat_engine import CondensePlusContextChatEngine, CondenseQuestionChatEngine
-from llama_index.core.memory import BaseMemory
+    chat_engine = engines.chat_engine
 
-# cpcc = CondensePlusContextChatEngine.from_defaults(
-#         retriever=engines.retriever_engine,
-#         llm=Setting.llm,
-#         verbose=True,
-#     )
+    # cpcc = CondensePlusContextChatEngine.from_defaults(
+    #         retriever=engines.retriever_engine,
+    #         llm=Setting.llm,
+    #         verbose=True,
+    #     )
 
-cpcc = CondenseQuestionChatEngine.from_defaults(
-        query_engine=engines.sentence_window_engine,
-        llm=Settings.llm,
-        verbose=True,
-    )
\ No newline at end of file
+    cpcc = engines.condense_chat_engine
@@ -0,0 +1,192 @@
+"""Approximate nearest-neighbour indexes over the NumPy vector store matrix.
+
+Both indexes return row numbers of the (normalized) matrix they were built
+from, and are persisted next to it in the index directory:
+
+* ``ivf``: an inverted file built with spherical k-means in NumPy; a query
+  scans the rows of the ``nprobe`` closest lists.
+* ``hnsw``: an hnswlib graph (``pip install hnswlib``); ``ef`` trades recall
+  for speed.
+"""
+import logging
+import os
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IVF_FILENAME = "ann_ivf.npz"
+HNSW_FILENAME = "ann_hnsw.bin"
+ANN_KINDS = ("ivf", "hnsw")
+
+
+def _chunks(n: int, size: int):
+    for start in range(0, n, size):
+        yield start, min(n, start + size)
+
+
+class IVFIndex:
+    """Inverted file index with ``nlist`` k-means lists."""
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray) -> None:
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        n_iter: int = 10,
+        sample_size: int = 100_000,
+        chunk_size: int = 65536,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        n = len(vectors)
+        nlist = min(nlist or max(1, int(4 * np.sqrt(n))), n)
+        if nlist == 0:
+            # no rows: an index with no lists, whose searches find nothing
+            return cls(
+                np.zeros((0, vectors.shape[1]), dtype=np.float32),
+                np.zeros(1, dtype=np.int64),
+                np.zeros(0, dtype=np.int64),
+            )
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(
+            vectors[np.sort(rng.choice(n, size=min(n, sample_size), replace=False))],
+            dtype=np.float32,
+        )
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            # empty lists keep their previous centroid
+            filled = counts > 0
+            norms = np.linalg.norm(sums[filled], axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids[filled] = sums[filled] / norms
+
+        assign = np.empty(n, dtype=np.int32)
+        for start, stop in _chunks(n, chunk_size):
+            chunk = np.asarray(vectors[start:stop], dtype=np.float32)
+            assign[start:stop] = np.argmax(chunk @ centroids.T, axis=1)
+        rows = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+        return cls(centroids, offsets, rows)
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        nprobe: int = 8,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, scores) of the best ``k`` rows in the probed lists."""
+        nprobe = min(nprobe, len(self.centroids))
+        if nprobe == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([self.rows[self.offsets[i] : self.offsets[i + 1]] for i in probe])
+        rows.sort()  # sequential reads of the memmap
+        if mask is not None:
+            rows = rows[mask[rows]]
+        scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+        if len(rows) > k:
+            top = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[top], scores[top]
+        return rows, scores
+
+    def save(self, persist_dir: str) -> None:
+        np.savez(
+            os.path.join(persist_dir, IVF_FILENAME),
+            centroids=self.centroids,
+            offsets=self.offsets,
+            rows=self.rows,
+        )
+
+    @classmethod
+    def load(cls, persist_dir: str) -> "IVFIndex":
+        data = np.load(os.path.join(persist_dir, IVF_FILENAME))
+        return cls(data["centroids"], data["offsets"], data["rows"])
+
+
+class HNSWIndex:
+    """hnswlib graph over inner products of the normalized vectors."""
+
+    def __init__(self, index: Any) -> None:
+        self.index = index
+
+    @staticmethod
+    def _hnswlib() -> Any:
+        try:
+            import hnswlib
+        except ImportError as exc:
+            raise ImportError(
+                "The hnsw ANN index requires hnswlib.\n"
+                "Please install it with `pip install hnswlib`."
+            ) from exc
+        return hnswlib
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        m: int = 16,
+        ef_construction: int = 200,
+        chunk_size: int = 65536,
+    ) -> "HNSWIndex":
+        hnswlib = cls._hnswlib()
+        index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        index.init_index(max_elements=len(vectors), M=m, ef_construction=ef_construction)
+        for start, stop in _chunks(len(vectors), chunk_size):
+            index.add_items(
+                np.asarray(vectors[start:stop], dtype=np.float32), np.arange(start, stop)
+            )
+        return cls(index)
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        ef: int = 128,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # over-fetch when rows were deleted since the graph was built
+        fetch = k if mask is None or mask.all() else min(len(mask), 2 * k)
+        fetch = min(fetch, self.index.get_current_count())
+        self.index.set_ef(max(ef, fetch))
+        labels, distances = self.index.knn_query(query, k=fetch)
+        rows = labels[0].astype(np.int64)
+        scores = 1.0 - distances[0]
+        if mask is not None:
+            keep = mask[rows]
+            rows, scores = rows[keep], scores[keep]
+        return rows[:k], scores[:k]
+
+    def save(self, persist_dir: str) -> None:
+        self.index.save_index(os.path.join(persist_dir, HNSW_FILENAME))
+
+    @classmethod
+    def load(cls, persist_dir: str, dim: int) -> "HNSWIndex":
+        hnswlib = cls._hnswlib()
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.load_index(os.path.join(persist_dir, HNSW_FILENAME))
+        return cls(index)
+
+
+def ann_path(persist_dir: str, kind: str) -> str:
+    return os.path.join(persist_dir, IVF_FILENAME if kind == "ivf" else HNSW_FILENAME)
+
+
+def remove_ann(persist_dir: str) -> None:
+    """Drop persisted ANN indexes, which are stale once the matrix changes."""
+    for kind in ANN_KINDS:
+        if os.path.exists(ann_path(persist_dir, kind)):
+            os.remove(ann_path(persist_dir, kind))
@@ -0,0 +1,221 @@
+"""BM25 inverted index over the sentence nodes, persisted next to the vectors.
+
+Exact terms (``GradientBoostingClassifier``, ``n_estimators``) are what dense
+embeddings of short sentences match worst, so the indexer keeps this sparse
+index alongside the sentence index and ``HybridRetriever`` fuses both.
+
+Postings are stored as CSR arrays memory-mapped like the vector matrix:
+the sorted vocabulary, per-term offsets, then the node rows (``int32``) and
+term frequencies (``uint16``) of every posting, 6 bytes each. Terms and ids
+are UTF-8 byte strings. Lookups use
+``searchsorted`` on the vocabulary, so no term dictionary is built on load.
+Added nodes and deletions are kept aside until :meth:`BM25Index.persist`
+(or the next search) merges them, as in the numpy vector store.
+"""
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.schema import BaseNode, MetadataMode
+
+logger = logging.getLogger(__name__)
+
+META_FILENAME = "bm25.json"
+ARRAYS = ("terms", "offsets", "rows", "tfs", "lengths", "node_ids", "ref_doc_ids")
+
+TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in into is it its "
+    "of on or so such than that the their then there these this to was what when where "
+    "which while who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stopwords; identifiers such as
+    ``n_estimators`` stay one token."""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _encode(strings: Iterable[str]) -> np.ndarray:
+    # UTF-8 bytes take a quarter of the space of numpy's UCS-4 strings
+    return np.asarray([string.encode("utf-8") for string in strings], dtype=bytes)
+
+
+def _filename(name: str) -> str:
+    return f"bm25_{name}.npy"
+
+
+class BM25Index:
+    """Okapi BM25 over node texts, with parameters ``k1`` and ``b``."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.terms = np.empty(0, dtype=bytes)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int32)
+        self.tfs = np.empty(0, dtype=np.uint16)
+        self.lengths = np.empty(0, dtype=np.int32)
+        self.node_ids = np.empty(0, dtype=bytes)
+        self.ref_doc_ids = np.empty(0, dtype=bytes)
+        self._alive = np.empty(0, dtype=bool)
+        self._average_length = 1.0
+        self._pending: List[Tuple[str, str, Counter]] = []
+        self._persist_dir: Optional[str] = None
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        return os.path.exists(os.path.join(persist_dir, META_FILENAME))
+
+    @classmethod
+    def load(cls, persist_dir: str) -> "BM25Index":
+        with open(os.path.join(persist_dir, META_FILENAME)) as f:
+            meta = json.load(f)
+        index = cls(k1=meta["k1"], b=meta["b"])
+        index._load(persist_dir)
+        return index
+
+    def _load(self, persist_dir: str) -> None:
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(persist_dir, _filename(name)), mmap_mode="r"))
+        self._alive = np.ones(len(self.node_ids), dtype=bool)
+        self._average_length = float(np.mean(self.lengths)) if len(self.lengths) else 1.0
+        self._persist_dir = persist_dir
+
+    @classmethod
+    def build(cls, nodes: Iterable[BaseNode], **kwargs: Any) -> "BM25Index":
+        index = cls(**kwargs)
+        index.add(list(nodes))
+        index._merge()
+        return index
+
+    @property
+    def num_nodes(self) -> int:
+        return int(self._alive.sum()) + len(self._pending)
+
+    def add(self, nodes: Sequence[BaseNode]) -> None:
+        for node in nodes:
+            # the sentence itself; the window is metadata excluded from it
+            counts = Counter(tokenize(node.get_content(metadata_mode=MetadataMode.NONE)))
+            self._pending.append((node.node_id, node.ref_doc_id or "", counts))
+
+    def delete(self, ref_doc_id: str) -> None:
+        if len(self.ref_doc_ids):
+            self._alive &= np.asarray(self.ref_doc_ids) != ref_doc_id.encode("utf-8")
+        self._pending = [entry for entry in self._pending if entry[1] != ref_doc_id]
+
+    def _merge(self) -> bool:
+        """Fold pending nodes and deletions into the arrays; False if
+        there was nothing to merge."""
+        if not self._pending and self._alive.all():
+            return False
+        # surviving postings as (term, row) pairs with rows renumbered
+        new_row = np.cumsum(self._alive) - 1
+        term_of = np.repeat(np.arange(len(self.terms)), np.diff(self.offsets))
+        keep = self._alive[self.rows] if len(self.rows) else np.empty(0, dtype=bool)
+        old_terms = np.asarray(self.terms)[term_of[keep]]
+        old_rows = new_row[np.asarray(self.rows)[keep]]
+        old_tfs = np.asarray(self.tfs)[keep]
+
+        first = int(self._alive.sum())
+        pending_terms: List[str] = []
+        pending_rows: List[int] = []
+        pending_tfs: List[int] = []
+        for i, (_, _, counts) in enumerate(self._pending):
+            pending_terms.extend(counts)
+            pending_rows.extend([first + i] * len(counts))
+            pending_tfs.extend(min(tf, 65535) for tf in counts.values())
+
+        all_terms = np.concatenate([old_terms, _encode(pending_terms)])
+        terms, term_ids = np.unique(all_terms, return_inverse=True)
+        rows = np.concatenate([old_rows, np.asarray(pending_rows, dtype=np.int64)]).astype(np.int32)
+        tfs = np.concatenate([old_tfs, np.asarray(pending_tfs, dtype=np.uint16)]).astype(np.uint16)
+        order = np.lexsort((rows, term_ids))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+
+        alive = self._alive
+        self.terms = terms
+        self.offsets = offsets
+        self.rows = rows[order]
+        self.tfs = tfs[order]
+        self.lengths = np.concatenate([
+            np.asarray(self.lengths)[alive],
+            np.asarray([sum(counts.values()) for _, _, counts in self._pending], dtype=np.int32),
+        ]).astype(np.int32)
+        self.node_ids = np.concatenate([
+            np.asarray(self.node_ids)[alive], _encode(entry[0] for entry in self._pending),
+        ])
+        self.ref_doc_ids = np.concatenate([
+            np.asarray(self.ref_doc_ids)[alive], _encode(entry[1] for entry in self._pending),
+        ])
+        self._alive = np.ones(len(self.node_ids), dtype=bool)
+        self._average_length = float(np.mean(self.lengths)) if len(self.lengths) else 1.0
+        self._pending = []
+        return True
+
+    def persist(self, persist_dir: str) -> None:
+        """Write the arrays to ``persist_dir``, replacing the previous ones."""
+        if not self._merge() and persist_dir == self._persist_dir:
+            return
+        os.makedirs(persist_dir, exist_ok=True)
+        # np.save appends .npy to names without it, so write via file objects
+        for name in ARRAYS:
+            with open(os.path.join(persist_dir, _filename(name) + ".tmp"), "wb") as f:
+                np.save(f, np.asarray(getattr(self, name)))
+        for name in ARRAYS:
+            os.replace(
+                os.path.join(persist_dir, _filename(name) + ".tmp"),
+                os.path.join(persist_dir, _filename(name)),
+            )
+        with open(os.path.join(persist_dir, META_FILENAME), "w") as f:
+            json.dump({
+                "k1": self.k1, "b": self.b, "nodes": len(self.node_ids),
+                "terms": len(self.terms), "postings": len(self.rows),
+            }, f)
+        self._load(persist_dir)
+        logger.info("persisted BM25 index of %d nodes, %d terms to %s",
+                    len(self.node_ids), len(self.terms), persist_dir)
+
+    def stats(self) -> Dict[str, float]:
+        return {"nodes": self.num_nodes, "terms": len(self.terms), "postings": len(self.rows)}
+
+    def search(self, query: str, k: int) -> Tuple[List[str], List[float]]:
+        """Node ids and BM25 scores of the best ``k`` nodes for ``query``."""
+        self._merge()
+        tokens = np.unique(_encode(tokenize(query)))
+        n = len(self.node_ids)
+        if not len(tokens) or not n or not len(self.terms):
+            return [], []
+        positions = np.searchsorted(self.terms, tokens)
+        found = positions < len(self.terms)
+        positions, tokens = positions[found], tokens[found]
+        positions = positions[np.asarray(self.terms)[positions] == tokens]
+
+        average_length = self._average_length or 1.0
+        rows: List[np.ndarray] = []
+        contributions: List[np.ndarray] = []
+        for position in positions:
+            start, stop = int(self.offsets[position]), int(self.offsets[position + 1])
+            term_rows = np.asarray(self.rows[start:stop])
+            tf = np.asarray(self.tfs[start:stop], dtype=np.float32)
+            idf = math.log(1.0 + (n - (stop - start) + 0.5) / (stop - start + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * np.asarray(self.lengths)[term_rows] / average_length)
+            rows.append(term_rows)
+            contributions.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+        if not rows:
+            return [], []
+        unique_rows, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            unique_rows, scores = unique_rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        node_ids = np.asarray(self.node_ids)[unique_rows[order]]
+        return [node_id.decode("utf-8") for node_id in node_ids], scores[order].tolist()
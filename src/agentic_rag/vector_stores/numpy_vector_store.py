@@ -0,0 +1,435 @@
+"""Memory-mapped NumPy vector store.
+
+Embeddings live in one contiguous ``.npy`` matrix that is opened with
+``np.load(mmap_mode="r")``, so loading is O(1) and the pages are shared by
+every process serving the same index. Node and document ids are kept in
+side arrays with the same row order.
+
+The matrix can be stored as ``float16`` or as ``int8`` with one ``float32``
+scale per row (``max |x| / 127``), a half or a quarter of the memory a
+full scan touches. A quantized store can also keep the ``float32`` rows in
+a second memory-mapped file (``keep_float32``); queries then rescore their
+best ``rescore * k`` candidates exactly, reading only those rows.
+"""
+import json
+import logging
+import os
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+from src.agentic_rag.vector_stores.ann import ANN_KINDS, HNSWIndex, IVFIndex, ann_path, remove_ann
+
+logger = logging.getLogger(__name__)
+
+META_FILENAME = "numpy_vector_store.json"
+VECTORS_FILENAME = "numpy_vectors.npy"
+SCALES_FILENAME = "numpy_scales.npy"
+FLOAT32_FILENAME = "numpy_vectors_float32.npy"
+NODE_IDS_FILENAME = "numpy_node_ids.npy"
+REF_DOC_IDS_FILENAME = "numpy_ref_doc_ids.npy"
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+# float16/int8 rows are upcast for the BLAS product in blocks that stay in
+# cache: converting a whole chunk costs several times the product itself
+SCORE_BLOCK_ROWS = 256
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _scores(vectors: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """``vectors @ q`` at float32 for any storage dtype."""
+    if vectors.dtype == np.float32:
+        return np.asarray(vectors) @ q
+    scores = np.empty(len(vectors), dtype=np.float32)
+    block = np.empty((min(SCORE_BLOCK_ROWS, len(vectors)), vectors.shape[1]), dtype=np.float32)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        rows = vectors[start : start + SCORE_BLOCK_ROWS]
+        np.copyto(block[: len(rows)], rows, casting="unsafe")
+        np.dot(block[: len(rows)], q, out=scores[start : start + len(rows)])
+    return scores
+
+
+def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """int8 rows and the per-row scales that map them back."""
+    scales = np.abs(vectors).max(axis=-1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """Flat cosine-similarity store over a memory-mapped float matrix.
+
+    Vectors are L2-normalized on insert so a query is one matrix-vector
+    product per ``query_chunk_size`` rows followed by ``argpartition``.
+    Added vectors are kept in memory and deletions are a row mask until
+    :meth:`persist` rewrites the files.
+
+    With ``ann`` set, persisted rows are searched through an approximate
+    index built by :meth:`build_ann` instead of a full scan.
+
+    Args:
+        dtype (str): storage dtype, ``float32``, ``float16`` or ``int8``
+        keep_float32 (bool): also persist the ``float32`` vectors of a
+            ``float16``/``int8`` store, to rescore candidates exactly
+        ann (str): optional ANN index to query, ``ivf`` or ``hnsw``
+
+    """
+
+    stores_text: bool = False
+    dtype: str = Field(default="float32", description="Storage dtype of the vectors.")
+    keep_float32: bool = Field(
+        default=False, description="Persist float32 vectors next to quantized ones."
+    )
+    rescore: int = Field(
+        default=4, description="Candidates per result rescored at float32 (0: off).", ge=0
+    )
+    query_chunk_size: int = Field(
+        default=65536, description="Rows scored per matrix-vector product.", gt=0
+    )
+    ann: Optional[str] = Field(
+        default=None, description="ANN index used for persisted rows: ivf or hnsw."
+    )
+    nprobe: int = Field(default=8, description="IVF lists scanned per query.", gt=0)
+    ef: int = Field(default=128, description="HNSW search breadth.", gt=0)
+
+    _vectors: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+    _float32: Optional[np.ndarray] = PrivateAttr(default=None)
+    _persist_dir: Optional[str] = PrivateAttr(default=None)
+    _ann: Any = PrivateAttr(default=None)
+    _node_ids: np.ndarray = PrivateAttr()
+    _ref_doc_ids: np.ndarray = PrivateAttr()
+    _alive: np.ndarray = PrivateAttr()
+    _pending_vectors: List[np.ndarray] = PrivateAttr()
+    _pending_node_ids: List[str] = PrivateAttr()
+    _pending_ref_doc_ids: List[str] = PrivateAttr()
+
+    def __init__(self, dtype: str = "float32", **kwargs: Any) -> None:
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"dtype must be one of {SUPPORTED_DTYPES}, got {dtype!r}")
+        if kwargs.get("ann") not in (None,) + ANN_KINDS:
+            raise ValueError(f"ann must be one of {ANN_KINDS}, got {kwargs['ann']!r}")
+        if dtype == "int8" and kwargs.get("ann"):
+            raise ValueError("ANN indexes need float32 or float16 vectors, not int8")
+        super().__init__(dtype=dtype, **kwargs)
+        self._node_ids = np.empty(0, dtype=str)
+        self._ref_doc_ids = np.empty(0, dtype=str)
+        self._alive = np.empty(0, dtype=bool)
+        self._pending_vectors = []
+        self._pending_node_ids = []
+        self._pending_ref_doc_ids = []
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        return os.path.exists(os.path.join(persist_dir, META_FILENAME))
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, **kwargs: Any) -> "NumpyVectorStore":
+        """Open a persisted store; the vector matrix is memory-mapped.
+
+        ``dtype`` and ``keep_float32`` are those of the persisted store; when
+        given they must match it.
+        """
+        with open(os.path.join(persist_dir, META_FILENAME)) as f:
+            meta = json.load(f)
+        dtype, keep_float32 = meta["dtype"], meta.get("float32", False)
+        if kwargs.get("dtype", dtype) != dtype:
+            raise ValueError(f"{persist_dir} stores {dtype} vectors, not {kwargs['dtype']}")
+        # a float32 store has no copy to keep, whatever it was asked to
+        if "keep_float32" in kwargs and (kwargs["keep_float32"] and dtype != "float32") != keep_float32:
+            raise ValueError(
+                f"{persist_dir} {'keeps' if keep_float32 else 'has no'} float32 copy of its vectors"
+            )
+        kwargs.update(dtype=dtype, keep_float32=keep_float32)
+        store = cls(**kwargs)
+        store._load(persist_dir)
+        return store
+
+    def _load(self, persist_dir: str) -> None:
+        self._vectors = np.load(os.path.join(persist_dir, VECTORS_FILENAME), mmap_mode="r")
+        self._scales = self._float32 = None
+        if self.dtype == "int8":
+            self._scales = np.load(os.path.join(persist_dir, SCALES_FILENAME), mmap_mode="r")
+        if os.path.exists(os.path.join(persist_dir, FLOAT32_FILENAME)):
+            self._float32 = np.load(os.path.join(persist_dir, FLOAT32_FILENAME), mmap_mode="r")
+        self._node_ids = np.load(os.path.join(persist_dir, NODE_IDS_FILENAME), mmap_mode="r")
+        self._ref_doc_ids = np.load(
+            os.path.join(persist_dir, REF_DOC_IDS_FILENAME), mmap_mode="r"
+        )
+        self._alive = np.ones(len(self._node_ids), dtype=bool)
+        self._persist_dir = persist_dir
+        self._ann = None
+        if self.ann and os.path.exists(ann_path(persist_dir, self.ann)):
+            if self.ann == "ivf":
+                self._ann = IVFIndex.load(persist_dir)
+            else:
+                self._ann = HNSWIndex.load(persist_dir, dim=self._vectors.shape[1])
+        elif self.ann:
+            logger.warning(
+                "no %s index in %s, falling back to exact search", self.ann, persist_dir
+            )
+
+    def ann_exists(self, kind: str) -> bool:
+        return self._persist_dir is not None and os.path.exists(
+            ann_path(self._persist_dir, kind)
+        )
+
+    def build_ann(self, kind: Optional[str] = None, **build_kwargs: Any) -> None:
+        """Build and persist an ANN index over the persisted rows."""
+        kind = kind or self.ann
+        if kind not in ANN_KINDS:
+            raise ValueError(f"ann must be one of {ANN_KINDS}, got {kind!r}")
+        if self.dtype == "int8":
+            raise ValueError("ANN indexes need float32 or float16 vectors, not int8")
+        if self._vectors is None or self._pending_vectors:
+            raise ValueError("persist the store before building an ANN index")
+        if not len(self._vectors):
+            # nothing to index yet; the next build_ann after rows are persisted builds it
+            logger.info("no vectors, not building a %s index", kind)
+            return
+        index_cls = IVFIndex if kind == "ivf" else HNSWIndex
+        self._ann = index_cls.build(self._vectors, **build_kwargs)
+        self._ann.save(self._persist_dir)
+        self.ann = kind
+        logger.info("built %s index over %d vectors", kind, len(self._vectors))
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def num_vectors(self) -> int:
+        # not __len__: an empty store must stay truthy for StorageContext
+        return int(self._alive.sum()) + len(self._pending_node_ids)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        vectors = np.asarray([node.get_embedding() for node in nodes], dtype=np.float32)
+        # kept at float32 until persist quantizes them
+        self._pending_vectors.append(_normalize(vectors))
+        self._pending_node_ids.extend(node.node_id for node in nodes)
+        self._pending_ref_doc_ids.extend(node.ref_doc_id or "" for node in nodes)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        if len(self._ref_doc_ids):
+            self._alive &= np.asarray(self._ref_doc_ids) != ref_doc_id
+        if ref_doc_id in self._pending_ref_doc_ids:
+            keep = [i for i, ref in enumerate(self._pending_ref_doc_ids) if ref != ref_doc_id]
+            vectors = np.concatenate(self._pending_vectors)[keep]
+            self._pending_vectors = [vectors] if len(keep) else []
+            self._pending_node_ids = [self._pending_node_ids[i] for i in keep]
+            self._pending_ref_doc_ids = [self._pending_ref_doc_ids[i] for i in keep]
+
+    def _pending_matrix(self) -> Optional[np.ndarray]:
+        if not self._pending_vectors:
+            return None
+        if len(self._pending_vectors) > 1:
+            self._pending_vectors = [np.concatenate(self._pending_vectors)]
+        return self._pending_vectors[0]
+
+    def _segments(self) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """Yield (vectors, node_ids, ref_doc_ids, alive mask) for the
+        persisted rows and for the rows added since."""
+        if self._vectors is not None and len(self._vectors):
+            yield self._vectors, self._node_ids, self._ref_doc_ids, self._alive
+        pending = self._pending_matrix()
+        if pending is not None:
+            yield (
+                pending,
+                np.asarray(self._pending_node_ids),
+                np.asarray(self._pending_ref_doc_ids),
+                np.ones(len(pending), dtype=bool),
+            )
+
+    def _mask(
+        self, node_ids: np.ndarray, alive: np.ndarray, query: VectorStoreQuery
+    ) -> np.ndarray:
+        mask = alive
+        if query.node_ids:
+            mask = mask & np.isin(node_ids, query.node_ids)
+        return mask
+
+    def _float32_rows(self, vectors: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """Rows ``start:stop`` of a segment at float32, from the float32
+        copy of a quantized store when there is one."""
+        if vectors is self._vectors:
+            if self._float32 is not None:
+                return np.asarray(self._float32[start:stop])
+            if self._scales is not None:
+                return np.asarray(vectors[start:stop], dtype=np.float32) * np.asarray(
+                    self._scales[start:stop]
+                )[:, None]
+        return np.asarray(vectors[start:stop], dtype=np.float32)
+
+    def _rescore(
+        self, q: np.ndarray, scores: np.ndarray, rows: np.ndarray
+    ) -> np.ndarray:
+        """Exact scores of the candidates that are persisted rows (row
+        ``-1`` marks added vectors, which are exact already)."""
+        persisted = np.flatnonzero(rows >= 0)
+        # read the float32 rows in file order
+        persisted = persisted[np.argsort(rows[persisted])]
+        scores = scores.copy()
+        scores[persisted] = np.asarray(self._float32[rows[persisted]]) @ q
+        return scores
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("Metadata filters are not supported by NumpyVectorStore.")
+        if query.doc_ids:
+            raise ValueError("doc_ids filters are not supported by NumpyVectorStore.")
+        q = _normalize(np.asarray(query.query_embedding, dtype=np.float32))
+        k = query.similarity_top_k
+        rescore = self._float32 is not None and self.dtype != "float32" and self.rescore > 0
+        # a quantized store keeps more candidates for the exact rescore
+        n = k * self.rescore if rescore else k
+
+        candidate_scores: List[np.ndarray] = []
+        candidate_ids: List[np.ndarray] = []
+        candidate_rows: List[np.ndarray] = []
+        for vectors, node_ids, _, alive in self._segments():
+            persisted = vectors is self._vectors
+            scales = self._scales if persisted else None
+            mask = self._mask(node_ids, alive, query)
+            if self._ann is not None and persisted and not query.node_ids:
+                params = {"nprobe": self.nprobe} if self.ann == "ivf" else {"ef": self.ef}
+                rows, scores = self._ann.search(
+                    vectors, q, n, mask=None if mask.all() else mask, **params
+                )
+                candidate_scores.append(scores)
+                candidate_ids.append(np.asarray(node_ids[rows]))
+                candidate_rows.append(rows)
+                continue
+            for start in range(0, len(vectors), self.query_chunk_size):
+                stop = start + self.query_chunk_size
+                scores = _scores(vectors[start:stop], q)
+                if scales is not None:
+                    scores *= scales[start:stop]
+                scores[~mask[start:stop]] = -np.inf
+                if len(scores) > n:
+                    top = np.argpartition(-scores, n)[:n]
+                else:
+                    top = np.arange(len(scores))
+                top = top[np.isfinite(scores[top])]
+                candidate_scores.append(scores[top])
+                candidate_ids.append(np.asarray(node_ids[start:stop][top]))
+                candidate_rows.append(start + top if persisted else np.full(len(top), -1))
+
+        if not candidate_scores:
+            return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+        scores = np.concatenate(candidate_scores)
+        ids = np.concatenate(candidate_ids)
+        if rescore:
+            order = np.argsort(-scores, kind="stable")[:n]
+            rows = np.concatenate(candidate_rows)[order]
+            scores, ids = self._rescore(q, scores[order], rows), ids[order]
+        order = np.argsort(-scores, kind="stable")[:k]
+        return VectorStoreQueryResult(
+            nodes=None,
+            similarities=scores[order].tolist(),
+            ids=[str(node_id) for node_id in ids[order]],
+        )
+
+    def persist(self, persist_path: str, fs: Optional[Any] = None) -> None:
+        """Rewrite the matrix and id arrays next to ``persist_path``.
+
+        Surviving rows are copied chunk by chunk into a new memory-mapped
+        file, so persisting never loads the whole matrix into memory.
+        ``int8`` rows are quantized from the float32 copy when the store
+        has one, so rewriting does not compound the rounding.
+        """
+        persist_dir = os.path.dirname(persist_path) or "."
+        changed = bool(self._pending_vectors) or not self._alive.all()
+        if persist_dir == self._persist_dir and not changed:
+            return
+        os.makedirs(persist_dir, exist_ok=True)
+        segments = list(self._segments())
+        rows = sum(int(alive.sum()) for *_, alive in segments)
+        dim = segments[0][0].shape[1] if segments else 0
+        keep_float32 = self.keep_float32 and self.dtype != "float32"
+
+        # row numbers change, so any ANN index over the old matrix is stale
+        if changed:
+            remove_ann(persist_dir)
+        outputs = {VECTORS_FILENAME: np.lib.format.open_memmap(
+            os.path.join(persist_dir, VECTORS_FILENAME + ".tmp"),
+            mode="w+", dtype=self.dtype, shape=(rows, dim),
+        )}
+        if self.dtype == "int8":
+            outputs[SCALES_FILENAME] = np.lib.format.open_memmap(
+                os.path.join(persist_dir, SCALES_FILENAME + ".tmp"),
+                mode="w+", dtype=np.float32, shape=(rows,),
+            )
+        if keep_float32:
+            outputs[FLOAT32_FILENAME] = np.lib.format.open_memmap(
+                os.path.join(persist_dir, FLOAT32_FILENAME + ".tmp"),
+                mode="w+", dtype=np.float32, shape=(rows, dim),
+            )
+        node_ids: List[np.ndarray] = []
+        ref_doc_ids: List[np.ndarray] = []
+        offset = 0
+        for vectors, ids, refs, alive in segments:
+            for start in range(0, len(vectors), self.query_chunk_size):
+                stop = start + self.query_chunk_size
+                keep = alive[start:stop]
+                chunk = self._float32_rows(vectors, start, stop)[keep]
+                end = offset + len(chunk)
+                if self.dtype == "int8":
+                    outputs[VECTORS_FILENAME][offset:end], outputs[SCALES_FILENAME][offset:end] = (
+                        _quantize(chunk)
+                    )
+                else:
+                    outputs[VECTORS_FILENAME][offset:end] = chunk
+                if keep_float32:
+                    outputs[FLOAT32_FILENAME][offset:end] = chunk
+                offset = end
+            node_ids.append(np.asarray(ids)[alive])
+            ref_doc_ids.append(np.asarray(refs)[alive])
+        for out in outputs.values():
+            out.flush()
+        del outputs, out
+
+        # np.save appends .npy to names without it, so write via file objects
+        for filename, array in (
+            (NODE_IDS_FILENAME, node_ids),
+            (REF_DOC_IDS_FILENAME, ref_doc_ids),
+        ):
+            array = np.concatenate(array) if array else np.empty(0, dtype=str)
+            with open(os.path.join(persist_dir, filename + ".tmp"), "wb") as f:
+                np.save(f, array.astype(str))
+        filenames = [VECTORS_FILENAME, NODE_IDS_FILENAME, REF_DOC_IDS_FILENAME]
+        filenames += [SCALES_FILENAME] if self.dtype == "int8" else []
+        filenames += [FLOAT32_FILENAME] if keep_float32 else []
+        for filename in filenames:
+            os.replace(
+                os.path.join(persist_dir, filename + ".tmp"),
+                os.path.join(persist_dir, filename),
+            )
+        if not keep_float32 and os.path.exists(os.path.join(persist_dir, FLOAT32_FILENAME)):
+            os.remove(os.path.join(persist_dir, FLOAT32_FILENAME))
+        with open(os.path.join(persist_dir, META_FILENAME), "w") as f:
+            json.dump({"dtype": self.dtype, "dim": dim, "rows": rows, "float32": keep_float32}, f)
+
+        self._pending_vectors = []
+        self._pending_node_ids = []
+        self._pending_ref_doc_ids = []
+        self._load(persist_dir)
+        logger.info("persisted %d %s vectors to %s", rows, self.dtype, persist_dir)
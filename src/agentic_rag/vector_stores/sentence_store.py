@@ -0,0 +1,570 @@
+"""Compact docstore for sentence-window nodes.
+
+``SentenceWindowNodeParser`` copies the surrounding ``2 * window_size + 1``
+sentences into the metadata of every node, and the copies of the previous
+and next nodes in its relationships carry their windows again, so the JSON
+docstore holds every sentence twenty-odd times. :class:`SentenceDocumentStore`
+keeps each sentence once and rebuilds a node, window included, when it is
+fetched:
+
+* ``sentences_text.npy``: the UTF-8 bytes of all sentences, document after
+  document in sentence order, and ``sentences_offsets.npy`` where each one
+  starts (``int64``, one more than the rows);
+* ``sentences_node_ids.npy``: the node ids, sorted for ``searchsorted``,
+  with ``sentences_rows.npy`` / ``sentences_positions.npy`` mapping sorted
+  ids to rows and back (``int32``), and ``sentences_chars.npy`` the start
+  and end character of every row;
+* ``sentences.json``: per document its first row, row count and the
+  metadata shared by its nodes, plus the nodes stored verbatim (see below).
+
+The arrays are memory-mapped like the vectors, so loading reads the small
+JSON file only. A node is stored verbatim instead when it does not come out
+of the parser unchanged (its rebuilt form differs, e.g. another window
+size), so the store is lossless for what retrieval reads; the metadata and
+hash copies inside the previous/next relationships are not kept, only their
+node ids. Added nodes and deletions are kept aside until :meth:`persist`
+rewrites the files, as in the numpy vector store.
+
+Migrate a persisted JSON docstore with::
+
+    python -m src.agentic_rag.vector_stores.sentence_store /path/to/index
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.schema import BaseNode, NodeRelationship, ObjectType, TextNode
+from llama_index.core.storage.docstore.simple_docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.types import (
+    DEFAULT_PERSIST_FNAME,
+    DEFAULT_PERSIST_PATH,
+    BaseDocumentStore,
+    RefDocInfo,
+)
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+
+logger = logging.getLogger(__name__)
+
+META_FILENAME = "sentences.json"
+ARRAYS = ("text", "offsets", "node_ids", "rows", "positions", "chars")
+
+# node fields shared by all nodes of a document
+SHARED_FIELDS = (
+    "excluded_embed_metadata_keys", "excluded_llm_metadata_keys",
+    "text_template", "metadata_template", "metadata_seperator",
+)
+
+
+def _filename(name: str) -> str:
+    return f"sentences_{name}.npy"
+
+
+def _comparable(node: BaseNode) -> Dict[str, Any]:
+    """The fields of ``node`` the store keeps."""
+    data = node.dict(exclude={"embedding"})
+    data["relationships"] = {
+        relation: info if relation == NodeRelationship.SOURCE else info["node_id"]
+        for relation, info in data["relationships"].items()
+    }
+    return data
+
+
+class SentenceDocumentStore(BaseDocumentStore):
+    """Docstore of sentence-window nodes rebuilt from stored sentences.
+
+    Args:
+        window_size (int): sentences on each side of a window, as given to
+            ``SentenceWindowNodeParser``
+        window_metadata_key (str): metadata key of the window
+        original_text_metadata_key (str): metadata key of the sentence
+
+    """
+
+    def __init__(
+        self,
+        window_size: int = 3,
+        window_metadata_key: str = "window",
+        original_text_metadata_key: str = "original_text",
+    ) -> None:
+        self.window_size = window_size
+        self.window_metadata_key = window_metadata_key
+        self.original_text_metadata_key = original_text_metadata_key
+        self._text = np.empty(0, dtype=np.uint8)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._node_ids = np.empty(0, dtype=bytes)
+        self._rows = np.empty(0, dtype=np.int32)
+        self._positions = np.empty(0, dtype=np.int32)
+        self._chars = np.empty((0, 2), dtype=np.int32)
+        self._alive = np.empty(0, dtype=bool)
+        self._documents: List[Dict[str, Any]] = []
+        self._document_starts = np.empty(0, dtype=np.int64)
+        self._by_ref_doc: Dict[str, List[int]] = {}
+        # node id -> node json of rows not rebuilt from their sentence
+        self._overrides: Dict[str, Dict[str, Any]] = {}
+        # node id -> node json of nodes without a row (no sentence window)
+        self._verbatim: Dict[str, Dict[str, Any]] = {}
+        self._hashes: Dict[str, str] = {}
+        self._pending: Dict[str, BaseNode] = {}
+        self._changed = False
+        self._persist_dir: Optional[str] = None
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        return os.path.exists(os.path.join(persist_dir, META_FILENAME))
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str) -> "SentenceDocumentStore":
+        """Open a persisted store; the arrays are memory-mapped."""
+        with open(os.path.join(persist_dir, META_FILENAME)) as f:
+            meta = json.load(f)
+        store = cls(
+            window_size=meta["window_size"],
+            window_metadata_key=meta["window_metadata_key"],
+            original_text_metadata_key=meta["original_text_metadata_key"],
+        )
+        store._load(persist_dir, meta)
+        return store
+
+    def _load(self, persist_dir: str, meta: Dict[str, Any]) -> None:
+        for name in ARRAYS:
+            setattr(self, f"_{name}", np.load(os.path.join(persist_dir, _filename(name)), mmap_mode="r"))
+        self._alive = np.ones(len(self._rows), dtype=bool)
+        self._alive[meta["deleted_rows"]] = False
+        self._documents = meta["documents"]
+        self._document_starts = np.asarray([doc["start"] for doc in self._documents], dtype=np.int64)
+        self._by_ref_doc = {}
+        for i, doc in enumerate(self._documents):
+            self._by_ref_doc.setdefault(doc["ref_doc_id"], []).append(i)
+        self._overrides = meta["overrides"]
+        self._verbatim = meta["verbatim"]
+        self._hashes = meta["document_hashes"]
+        self._pending = {}
+        self._changed = False
+        self._persist_dir = persist_dir
+
+    @classmethod
+    def from_nodes(cls, nodes: Sequence[BaseNode], **kwargs: Any) -> "SentenceDocumentStore":
+        store = cls(**kwargs)
+        store.add_documents(nodes)
+        return store
+
+    # ===== rows =====
+
+    def _row(self, node_id: str) -> Optional[int]:
+        if not len(self._node_ids):
+            return None
+        key = node_id.encode("utf-8")
+        position = int(np.searchsorted(self._node_ids, key))
+        if position == len(self._node_ids) or self._node_ids[position] != key:
+            return None
+        row = int(self._rows[position])
+        return row if self._alive[row] else None
+
+    def _row_id(self, row: int) -> str:
+        return self._node_ids[self._positions[row]].decode("utf-8")
+
+    def _document_of(self, row: int) -> Dict[str, Any]:
+        return self._documents[int(np.searchsorted(self._document_starts, row, side="right")) - 1]
+
+    def _build(self, row: int) -> BaseNode:
+        """Rebuild the node of ``row`` from its document's sentences."""
+        node_id = self._row_id(row)
+        if node_id in self._overrides:
+            return json_to_doc(self._overrides[node_id])
+        doc = self._document_of(row)
+        start, stop = doc["start"], doc["start"] + doc["count"]
+        first, last = max(start, row - self.window_size), min(stop, row + self.window_size + 1)
+        # one read of the window's bytes, split at the sentence offsets
+        bounds = np.asarray(self._offsets[first:last + 1]).tolist()
+        blob = bytes(self._text[bounds[0]:bounds[-1]])
+        sentences = [
+            blob[i - bounds[0]:j - bounds[0]].decode("utf-8") for i, j in zip(bounds, bounds[1:])
+        ]
+        text = sentences[row - first]
+        window = " ".join(sentences)
+        relationships: Dict[NodeRelationship, Any] = {}
+        if doc["source"] is not None:
+            relationships[NodeRelationship.SOURCE] = doc["source"]
+        # the parser also links the last node of a document to the first
+        # node of the next document it parsed
+        previous = self._row_id(row - 1) if row > start else doc["previous"]
+        next_ = self._row_id(row + 1) if row + 1 < stop else doc["next"]
+        if previous is not None:
+            relationships[NodeRelationship.PREVIOUS] = {"node_id": previous, "node_type": ObjectType.TEXT}
+        if next_ is not None:
+            relationships[NodeRelationship.NEXT] = {"node_id": next_, "node_type": ObjectType.TEXT}
+        start_char, end_char = (int(char) for char in self._chars[row])
+        return TextNode(
+            id_=node_id,
+            text=text,
+            metadata={
+                self.window_metadata_key: window,
+                self.original_text_metadata_key: text,
+                **doc["metadata"],
+            },
+            relationships=relationships,
+            start_char_idx=None if start_char < 0 else start_char,
+            end_char_idx=None if end_char < 0 else end_char,
+            **doc["fields"],
+        )
+
+    def _ref_doc_rows(self, ref_doc_id: str) -> Iterator[int]:
+        for i in self._by_ref_doc.get(ref_doc_id, []):
+            doc = self._documents[i]
+            for row in range(doc["start"], doc["start"] + doc["count"]):
+                if self._alive[row]:
+                    yield row
+
+    # ===== documents =====
+
+    @property
+    def docs(self) -> Dict[str, BaseNode]:
+        docs = {self._row_id(row): self._build(row) for row in np.flatnonzero(self._alive)}
+        docs.update((node_id, json_to_doc(data)) for node_id, data in self._verbatim.items())
+        docs.update(self._pending)
+        return docs
+
+    @property
+    def num_nodes(self) -> int:
+        return int(self._alive.sum()) + len(self._verbatim) + len(self._pending)
+
+    def add_documents(
+        self,
+        docs: Sequence[BaseNode],
+        allow_update: bool = True,
+        batch_size: Optional[int] = None,
+        store_text: bool = True,
+    ) -> None:
+        for doc in docs:
+            if not allow_update and self.document_exists(doc.node_id):
+                raise ValueError(
+                    f"node_id {doc.node_id} already exists. "
+                    "Set allow_update to True to overwrite."
+                )
+            self._delete(doc.node_id)
+            self._pending[doc.node_id] = doc
+            self._changed = True
+
+    async def async_add_documents(
+        self,
+        docs: Sequence[BaseNode],
+        allow_update: bool = True,
+        batch_size: Optional[int] = None,
+        store_text: bool = True,
+    ) -> None:
+        self.add_documents(docs, allow_update, batch_size, store_text)
+
+    def get_document(self, doc_id: str, raise_error: bool = True) -> Optional[BaseNode]:
+        if doc_id in self._pending:
+            return self._pending[doc_id]
+        if doc_id in self._verbatim:
+            return json_to_doc(self._verbatim[doc_id])
+        row = self._row(doc_id)
+        if row is not None:
+            return self._build(row)
+        if raise_error:
+            raise ValueError(f"doc_id {doc_id} not found.")
+        return None
+
+    async def aget_document(self, doc_id: str, raise_error: bool = True) -> Optional[BaseNode]:
+        return self.get_document(doc_id, raise_error)
+
+    def _delete(self, doc_id: str) -> bool:
+        if self._pending.pop(doc_id, None) is not None or self._verbatim.pop(doc_id, None) is not None:
+            return True
+        row = self._row(doc_id)
+        if row is None:
+            return False
+        # the sentence stays in its neighbours' windows
+        self._alive[row] = False
+        self._changed = True
+        return True
+
+    def delete_document(self, doc_id: str, raise_error: bool = True) -> None:
+        if not self._delete(doc_id) and raise_error:
+            raise ValueError(f"doc_id {doc_id} not found.")
+
+    async def adelete_document(self, doc_id: str, raise_error: bool = True) -> None:
+        self.delete_document(doc_id, raise_error)
+
+    def document_exists(self, doc_id: str) -> bool:
+        return doc_id in self._pending or doc_id in self._verbatim or self._row(doc_id) is not None
+
+    async def adocument_exists(self, doc_id: str) -> bool:
+        return self.document_exists(doc_id)
+
+    # ===== hashes =====
+    # only the hashes set explicitly (those of inserted documents): the
+    # hash of a node is computed from its text and metadata
+
+    def set_document_hash(self, doc_id: str, doc_hash: str) -> None:
+        self._hashes[doc_id] = doc_hash
+        self._changed = True
+
+    async def aset_document_hash(self, doc_id: str, doc_hash: str) -> None:
+        self.set_document_hash(doc_id, doc_hash)
+
+    def set_document_hashes(self, doc_hashes: Dict[str, str]) -> None:
+        self._hashes.update(doc_hashes)
+        self._changed = True
+
+    async def aset_document_hashes(self, doc_hashes: Dict[str, str]) -> None:
+        self.set_document_hashes(doc_hashes)
+
+    def get_document_hash(self, doc_id: str) -> Optional[str]:
+        return self._hashes.get(doc_id)
+
+    async def aget_document_hash(self, doc_id: str) -> Optional[str]:
+        return self.get_document_hash(doc_id)
+
+    def get_all_document_hashes(self) -> Dict[str, str]:
+        return {doc_hash: doc_id for doc_id, doc_hash in self._hashes.items()}
+
+    async def aget_all_document_hashes(self) -> Dict[str, str]:
+        return self.get_all_document_hashes()
+
+    # ===== ref docs =====
+
+    def get_ref_doc_info(self, ref_doc_id: str) -> Optional[RefDocInfo]:
+        node_ids = [self._row_id(row) for row in self._ref_doc_rows(ref_doc_id)]
+        metadata = (
+            self._documents[self._by_ref_doc[ref_doc_id][0]]["metadata"] if node_ids else None
+        )
+        for node in list(self._pending.values()) + [json_to_doc(data) for data in self._verbatim.values()]:
+            if node.ref_doc_id == ref_doc_id:
+                node_ids.append(node.node_id)
+                if metadata is None:
+                    metadata = node.metadata
+        if not node_ids:
+            return None
+        return RefDocInfo(node_ids=node_ids, metadata=dict(metadata))
+
+    async def aget_ref_doc_info(self, ref_doc_id: str) -> Optional[RefDocInfo]:
+        return self.get_ref_doc_info(ref_doc_id)
+
+    def get_all_ref_doc_info(self) -> Optional[Dict[str, RefDocInfo]]:
+        ref_doc_ids = set(self._by_ref_doc)
+        ref_doc_ids.update(node.ref_doc_id for node in self._pending.values())
+        ref_doc_ids.update(json_to_doc(data).ref_doc_id for data in self._verbatim.values())
+        ref_doc_ids.discard(None)
+        infos = {ref_doc_id: self.get_ref_doc_info(ref_doc_id) for ref_doc_id in ref_doc_ids}
+        return {ref_doc_id: info for ref_doc_id, info in infos.items() if info is not None}
+
+    async def aget_all_ref_doc_info(self) -> Optional[Dict[str, RefDocInfo]]:
+        return self.get_all_ref_doc_info()
+
+    def delete_ref_doc(self, ref_doc_id: str, raise_error: bool = True) -> None:
+        info = self.get_ref_doc_info(ref_doc_id)
+        if info is None:
+            if raise_error:
+                raise ValueError(f"ref_doc_id {ref_doc_id} not found.")
+            return
+        for node_id in info.node_ids:
+            self._delete(node_id)
+        self._hashes.pop(ref_doc_id, None)
+        self._changed = True
+
+    async def adelete_ref_doc(self, ref_doc_id: str, raise_error: bool = True) -> None:
+        self.delete_ref_doc(ref_doc_id, raise_error)
+
+    # ===== persistence =====
+
+    def _shared(self, nodes: Sequence[TextNode]) -> Dict[str, Any]:
+        """The per-document part of a document's nodes."""
+        keys = (self.window_metadata_key, self.original_text_metadata_key)
+        node = nodes[0]
+        source = node.relationships.get(NodeRelationship.SOURCE)
+        previous = node.relationships.get(NodeRelationship.PREVIOUS)
+        next_ = nodes[-1].relationships.get(NodeRelationship.NEXT)
+        return {
+            "ref_doc_id": node.ref_doc_id,
+            "metadata": {key: value for key, value in node.metadata.items() if key not in keys},
+            "source": json.loads(source.json()) if source is not None else None,
+            "fields": {field: getattr(node, field) for field in SHARED_FIELDS},
+            "previous": previous.node_id if previous is not None else None,
+            "next": next_.node_id if next_ is not None else None,
+        }
+
+    def _is_window_node(self, node: BaseNode) -> bool:
+        return (
+            type(node) is TextNode and node.ref_doc_id is not None
+            and self.window_metadata_key in node.metadata
+            and self.original_text_metadata_key in node.metadata
+        )
+
+    def persist(
+        self, persist_path: str = DEFAULT_PERSIST_PATH, fs: Optional[Any] = None
+    ) -> None:
+        """Rewrite the store next to ``persist_path``.
+
+        Persisted documents with a node left are copied as one slice of
+        the sentence bytes each; added nodes are grouped by document in
+        insertion order and checked against their rebuilt form.
+        """
+        persist_dir = os.path.dirname(persist_path) or "."
+        if persist_dir == self._persist_dir and not self._changed:
+            return
+        os.makedirs(persist_dir, exist_ok=True)
+        texts: List[np.ndarray] = []
+        lengths: List[np.ndarray] = []
+        node_ids: List[np.ndarray] = []
+        chars: List[np.ndarray] = []
+        alive: List[np.ndarray] = []
+        documents: List[Dict[str, Any]] = []
+        overrides: Dict[str, Dict[str, Any]] = {}
+        rows = 0
+
+        for doc in self._documents:
+            start, stop = doc["start"], doc["start"] + doc["count"]
+            if not self._alive[start:stop].any():
+                continue
+            texts.append(np.asarray(self._text[self._offsets[start]:self._offsets[stop]]))
+            lengths.append(np.diff(np.asarray(self._offsets[start:stop + 1])))
+            node_ids.append(np.asarray(self._node_ids)[np.asarray(self._positions[start:stop])])
+            chars.append(np.asarray(self._chars[start:stop]))
+            alive.append(self._alive[start:stop])
+            documents.append({**doc, "start": rows})
+            rows += stop - start
+        for node_id in np.concatenate(node_ids) if node_ids else []:
+            node_id = node_id.decode("utf-8")
+            if node_id in self._overrides:
+                overrides[node_id] = self._overrides[node_id]
+
+        verbatim = dict(self._verbatim)
+        groups: Dict[str, List[TextNode]] = {}
+        for node in self._pending.values():
+            if self._is_window_node(node):
+                groups.setdefault(node.ref_doc_id, []).append(node)
+            else:
+                verbatim[node.node_id] = doc_to_json(node)
+        for nodes in groups.values():
+            sentences = [node.text.encode("utf-8") for node in nodes]
+            texts.append(np.frombuffer(b"".join(sentences), dtype=np.uint8))
+            lengths.append(np.asarray([len(sentence) for sentence in sentences], dtype=np.int64))
+            node_ids.append(np.asarray([node.node_id.encode("utf-8") for node in nodes], dtype=bytes))
+            chars.append(np.asarray([
+                [-1 if node.start_char_idx is None else node.start_char_idx,
+                 -1 if node.end_char_idx is None else node.end_char_idx]
+                for node in nodes
+            ], dtype=np.int32))
+            alive.append(np.ones(len(nodes), dtype=bool))
+            documents.append({**self._shared(nodes), "start": rows, "count": len(nodes)})
+            rows += len(nodes)
+
+        text = np.concatenate(texts) if texts else np.empty(0, dtype=np.uint8)
+        offsets = np.zeros(rows + 1, dtype=np.int64)
+        if lengths:
+            np.cumsum(np.concatenate(lengths), out=offsets[1:])
+        ids = np.concatenate(node_ids) if node_ids else np.empty(0, dtype=bytes)
+        order = np.argsort(ids, kind="stable").astype(np.int32)
+        positions = np.empty(rows, dtype=np.int32)
+        positions[order] = np.arange(rows, dtype=np.int32)
+        arrays = {
+            "text": text,
+            "offsets": offsets,
+            "node_ids": ids[order],
+            "rows": order,
+            "positions": positions,
+            "chars": np.concatenate(chars) if chars else np.empty((0, 2), dtype=np.int32),
+        }
+        deleted_rows = np.flatnonzero(~np.concatenate(alive)).tolist() if alive else []
+
+        # np.save appends .npy to names without it, so write via file objects
+        for name in ARRAYS:
+            with open(os.path.join(persist_dir, _filename(name) + ".tmp"), "wb") as f:
+                np.save(f, arrays[name])
+        for name in ARRAYS:
+            os.replace(
+                os.path.join(persist_dir, _filename(name) + ".tmp"),
+                os.path.join(persist_dir, _filename(name)),
+            )
+        meta = {
+            "window_size": self.window_size,
+            "window_metadata_key": self.window_metadata_key,
+            "original_text_metadata_key": self.original_text_metadata_key,
+            "rows": rows,
+            "documents": documents,
+            "deleted_rows": deleted_rows,
+            "overrides": overrides,
+            "verbatim": verbatim,
+            "document_hashes": self._hashes,
+        }
+        self._load(persist_dir, meta)
+        # the added nodes now have rows: keep the ones not rebuilt exactly
+        # (self._overrides is meta["overrides"])
+        for nodes in groups.values():
+            for node in nodes:
+                if _comparable(self._build(self._row(node.node_id))) != _comparable(node):
+                    self._overrides[node.node_id] = doc_to_json(node)
+        with open(os.path.join(persist_dir, META_FILENAME + ".tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(persist_dir, META_FILENAME + ".tmp"),
+                   os.path.join(persist_dir, META_FILENAME))
+        logger.info("persisted %d sentences of %d documents (%d stored verbatim) to %s",
+                    rows, len(documents), len(self._overrides) + len(self._verbatim), persist_dir)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "nodes": self.num_nodes,
+            "documents": len(self._documents),
+            "text_bytes": len(self._text),
+            "verbatim": len(self._overrides) + len(self._verbatim),
+        }
+
+
+def migrate(persist_dir: str, keep_json: bool = False, **kwargs: Any) -> Tuple[int, int]:
+    """Convert the JSON docstore of ``persist_dir`` to a sentence store.
+
+    Every node is read back and compared with the original before the
+    JSON file is removed (renamed to ``docstore.json.bak`` with
+    ``keep_json``). Returns the two sizes in bytes.
+    """
+    json_path = os.path.join(persist_dir, DEFAULT_PERSIST_FNAME)
+    simple = SimpleDocumentStore.from_persist_path(json_path)
+    docs = simple.docs
+    store = SentenceDocumentStore.from_nodes(list(docs.values()), **kwargs)
+    # node hashes are recomputed; keep those of inserted documents
+    store.set_document_hashes({
+        doc_id: doc_hash for doc_hash, doc_id in simple.get_all_document_hashes().items()
+        if doc_id not in docs
+    })
+    store.persist(os.path.join(persist_dir, DEFAULT_PERSIST_FNAME))
+
+    store = SentenceDocumentStore.from_persist_dir(persist_dir)
+    for node_id, node in docs.items():
+        if _comparable(store.get_document(node_id)) != _comparable(node):
+            raise RuntimeError(f"node {node_id} does not survive the migration")
+    old_size = os.path.getsize(json_path)
+    new_size = sum(
+        os.path.getsize(os.path.join(persist_dir, name))
+        for name in [META_FILENAME] + [_filename(name) for name in ARRAYS]
+    )
+    if keep_json:
+        os.replace(json_path, json_path + ".bak")
+    else:
+        os.remove(json_path)
+    logger.info("migrated %d nodes: %d -> %d bytes, %s", len(docs), old_size, new_size, store.stats())
+    return old_size, new_size
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert a JSON docstore to the compact sentence store.")
+    parser.add_argument('persist_dir', help="index directory with a docstore.json")
+    parser.add_argument('--window-size', type=int, default=3, help="window size of the node parser")
+    parser.add_argument('--keep-json', action='store_true', help="keep the JSON docstore as docstore.json.bak")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    start = time.perf_counter()
+    old_size, new_size = migrate(args.persist_dir, keep_json=args.keep_json, window_size=args.window_size)
+    print(f"docstore: {old_size / 1e6:.2f}MB -> {new_size / 1e6:.2f}MB "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
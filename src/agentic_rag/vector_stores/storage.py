@@ -0,0 +1,83 @@
+"""Storage contexts for the supported vector store and docstore backends."""
+import os
+from typing import Any, Optional
+
+from llama_index.core import StorageContext
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+
+from src.agentic_rag.vector_stores.numpy_vector_store import NumpyVectorStore
+from src.agentic_rag.vector_stores.sentence_store import SentenceDocumentStore
+
+VECTOR_STORES = ("simple", "numpy")
+DOCSTORES = ("simple", "sentences")
+
+
+def detect_vector_store(persist_dir: str) -> str:
+    return "numpy" if NumpyVectorStore.exists(persist_dir) else "simple"
+
+
+def detect_docstore(persist_dir: str) -> str:
+    return "sentences" if SentenceDocumentStore.exists(persist_dir) else "simple"
+
+
+def is_persisted(persist_dir: str) -> bool:
+    return SentenceDocumentStore.exists(persist_dir) or os.path.exists(
+        os.path.join(persist_dir, "docstore.json")
+    )
+
+
+def get_docstore(persist_dir: str, docstore: Optional[str] = None) -> Optional[BaseDocumentStore]:
+    """The sentence docstore of ``persist_dir`` (new or persisted), or None
+    for the JSON docstore ``StorageContext`` loads by default."""
+    detected = detect_docstore(persist_dir)
+    docstore = docstore or detected
+    if docstore not in DOCSTORES:
+        raise ValueError(f"docstore must be one of {DOCSTORES}, got {docstore!r}")
+    if is_persisted(persist_dir) and docstore != detected:
+        raise ValueError(
+            f"{persist_dir} was built with the {detected!r} docstore, not {docstore!r}"
+        )
+    if docstore == "simple":
+        return None
+    if SentenceDocumentStore.exists(persist_dir):
+        return SentenceDocumentStore.from_persist_dir(persist_dir)
+    return SentenceDocumentStore()
+
+
+def get_storage_context(
+    persist_dir: str,
+    vector_store: Optional[str] = None,
+    docstore: Optional[str] = None,
+    **store_kwargs: Any,
+) -> StorageContext:
+    """Storage context for ``persist_dir``, empty if nothing is persisted yet.
+
+    ``vector_store`` and ``docstore`` default to the backends the directory
+    was built with, so readers such as ``Engine`` do not need to know them.
+    """
+    persisted = is_persisted(persist_dir)
+    docs = get_docstore(persist_dir, docstore)
+    detected = detect_vector_store(persist_dir)
+    vector_store = vector_store or detected
+    if vector_store not in VECTOR_STORES:
+        raise ValueError(f"vector_store must be one of {VECTOR_STORES}, got {vector_store!r}")
+    if persisted and vector_store != detected:
+        raise ValueError(
+            f"{persist_dir} was built with the {detected!r} vector store, not {vector_store!r}"
+        )
+    if vector_store == "simple":
+        if store_kwargs:
+            raise ValueError(
+                f"{sorted(store_kwargs)} are only supported by the numpy vector store"
+            )
+        return StorageContext.from_defaults(
+            persist_dir=persist_dir if persisted else None, docstore=docs
+        )
+
+    if NumpyVectorStore.exists(persist_dir):
+        store = NumpyVectorStore.from_persist_dir(persist_dir, **store_kwargs)
+    else:
+        store = NumpyVectorStore(**store_kwargs)
+    return StorageContext.from_defaults(
+        persist_dir=persist_dir if persisted else None, docstore=docs, vector_store=store
+    )
@@ -0,0 +1,182 @@
+"""HTTP helpers shared by the remote model clients."""
+import asyncio
+import json
+import random
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+STREAM_DONE = "[DONE]"
+
+
+def build_session(
+    pool_maxsize: int = 10,
+    max_retries: int = 3,
+    backoff_factor: float = 0.5,
+    status_forcelist: Sequence[int] = RETRY_STATUS_CODES,
+    max_concurrency: Optional[int] = None,
+) -> requests.Session:
+    """Build a keep-alive ``requests.Session`` with retries and jittered backoff.
+
+    The colab/ngrok servers drop connections and return 502s while they warm
+    up, so POSTs are retried as well; every endpoint we call is idempotent.
+    The pool blocks: at most ``max_concurrency`` (default ``pool_maxsize``)
+    requests per host are in flight and further threads wait for a pooled
+    connection instead of opening, and then dropping, extra ones.
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        # desynchronizes the retries of the threads a failure hit together
+        backoff_jitter=backoff_factor,
+        status_forcelist=tuple(status_forcelist),
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_maxsize,
+        pool_maxsize=max_concurrency or pool_maxsize,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def backoff_delay(attempt: int, backoff_factor: float) -> float:
+    """Exponential backoff with full jitter for the given retry attempt."""
+    return random.uniform(0, backoff_factor * (2**attempt))
+
+
+async def apost_json(
+    client: Any,
+    url: str,
+    payload: Dict[str, Any],
+    timeout: float,
+    max_retries: int = 3,
+    backoff_factor: float = 0.5,
+    status_forcelist: Sequence[int] = RETRY_STATUS_CODES,
+) -> Any:
+    """POST ``payload`` with an ``httpx.AsyncClient`` and return the JSON body.
+
+    Mirrors the retry policy of :func:`build_session` for the async clients.
+    """
+    import httpx
+
+    for attempt in range(max_retries + 1):
+        try:
+            response = await client.post(url, json=payload, timeout=timeout)
+            if response.status_code not in status_forcelist or attempt == max_retries:
+                response.raise_for_status()
+                return response.json()
+        except httpx.TransportError:
+            if attempt == max_retries:
+                raise
+        await asyncio.sleep(backoff_delay(attempt, backoff_factor))
+
+
+def parse_stream_line(line: str) -> Optional[Any]:
+    """Decode one line of a server-sent event or JSON lines stream.
+
+    Returns the JSON payload, :data:`STREAM_DONE` at the end marker, or
+    None for lines carrying no data (blank lines, SSE comments, ``event:``).
+    """
+    line = line.strip()
+    if not line or line.startswith(":"):
+        return None
+    if line.startswith("data:"):
+        line = line[len("data:"):].strip()
+    elif line.startswith(("event:", "id:", "retry:")):
+        return None
+    if line == STREAM_DONE:
+        return STREAM_DONE
+    return json.loads(line)
+
+
+def iter_json_stream(lines: Iterable[str]) -> Iterator[Any]:
+    """Yield the JSON payloads of an SSE or JSON lines stream."""
+    for line in lines:
+        event = parse_stream_line(line)
+        if event is STREAM_DONE:
+            return
+        if event is not None:
+            yield event
+
+
+async def astream_json(
+    client: Any,
+    url: str,
+    payload: Dict[str, Any],
+    timeout: float,
+    max_retries: int = 3,
+    backoff_factor: float = 0.5,
+    status_forcelist: Sequence[int] = RETRY_STATUS_CODES,
+) -> AsyncIterator[Any]:
+    """POST ``payload`` and yield the JSON payloads of the streamed response.
+
+    Connecting is retried like :func:`apost_json`; once the first line has
+    arrived the stream is not restarted.
+    """
+    import httpx
+
+    for attempt in range(max_retries + 1):
+        try:
+            async with client.stream("POST", url, json=payload, timeout=timeout) as response:
+                if response.status_code in status_forcelist and attempt < max_retries:
+                    await response.aread()
+                else:
+                    if response.status_code >= 400:
+                        await response.aread()
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        event = parse_stream_line(line)
+                        if event is STREAM_DONE:
+                            return
+                        if event is not None:
+                            yield event
+                    return
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            if attempt == max_retries:
+                raise
+        await asyncio.sleep(backoff_delay(attempt, backoff_factor))
+
+
+class AsyncClientPool:
+    """Lazily created ``httpx.AsyncClient`` plus a semaphore bounding in-flight
+    requests.
+
+    Both are bound to the running event loop, so they are rebuilt when the
+    owner is used from a different loop (e.g. successive ``asyncio.run`` calls).
+    """
+
+    def __init__(self, max_concurrency: int = 16, pool_maxsize: int = 10) -> None:
+        self.max_concurrency = max_concurrency
+        self.pool_maxsize = pool_maxsize
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Any = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def get(self) -> Tuple[Any, asyncio.Semaphore]:
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            limits = httpx.Limits(
+                max_connections=max(self.pool_maxsize, self.max_concurrency),
+                max_keepalive_connections=self.pool_maxsize,
+            )
+            self._client = httpx.AsyncClient(limits=limits)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client, self._semaphore
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._loop = self._client = self._semaphore = None
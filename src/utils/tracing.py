@@ -0,0 +1,139 @@
+"""Per-stage latency of the request path.
+
+The code times its own stages with ``tracer.stage(name)``:
+
+* ``routing``: choosing the agent,
+* ``query_embedding``, ``vector_search`` (``hybrid_search`` with its
+  ``bm25_search`` in a hybrid ``Engine``): the retrieval,
+* ``window_replacement``, ``candidate_filter``, ``rerank``, ``packing``:
+  the node postprocessors,
+* ``synthesis``: prompt building and generation of the answer,
+* ``llm``: one completion request, whose time to first token and token
+  counts are recorded as well.
+
+They land in the ``stage_seconds`` histogram of the process registry, and
+in OpenTelemetry spans once :meth:`Tracer.enable_opentelemetry` was called.
+:class:`TracingHandler` times the llama-index events of the code paths the
+stages do not cover (chat engines, the indexer) as ``llama_event_seconds``.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from llama_index.core import Settings
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+
+from src.utils.metrics import REGISTRY, MetricsRegistry
+
+# latency buckets from sub-millisecond (a cached route) to an LLM answer
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Tracer:
+    """Stage timers and LLM counters on a :class:`MetricsRegistry`.
+
+    Prompt tokens are counted with ``Settings.tokenizer`` unless
+    ``count_prompt_tokens`` is off; completion tokens are the ones the
+    server returned.
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, count_prompt_tokens: bool = True) -> None:
+        self.registry = registry
+        self.count_prompt_tokens = count_prompt_tokens
+        self.stage_seconds = registry.histogram(
+            "stage_seconds", "Time spent per request stage.", ("stage",), STAGE_BUCKETS
+        )
+        self.first_token_seconds = registry.histogram(
+            "llm_first_token_seconds", "Time to the first streamed token of a completion.",
+            buckets=STAGE_BUCKETS,
+        )
+        self.tokens = registry.counter("llm_tokens_total", "Prompt and completion tokens.", ("kind",))
+        self.llama_event_seconds = registry.histogram(
+            "llama_event_seconds", "Duration of llama-index callback events.", ("event",), STAGE_BUCKETS
+        )
+        self._otel = None
+
+    def enable_opentelemetry(self, name: str = "agentic_rag") -> None:
+        """Also open an OpenTelemetry span per stage (needs ``opentelemetry-api``
+        and an SDK configured by the application)."""
+        from opentelemetry import trace
+
+        self._otel = trace.get_tracer(name)
+
+    @contextmanager
+    def stage(self, name: str, **attributes: Any) -> Iterator[None]:
+        """Time the block as ``name``; a block that raises is not recorded."""
+        start = time.perf_counter()
+        if self._otel is None:
+            yield
+        else:
+            with self._otel.start_as_current_span(name, attributes=attributes or None):
+                yield
+        self.stage_seconds.observe(time.perf_counter() - start, stage=name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        self.stage_seconds.observe(seconds, stage=name)
+
+    def record_completion(
+        self,
+        prompt: str,
+        completion_tokens: int,
+        seconds: float,
+        first_token_seconds: Optional[float] = None,
+    ) -> None:
+        self.stage_seconds.observe(seconds, stage="llm")
+        if first_token_seconds is not None:
+            self.first_token_seconds.observe(first_token_seconds)
+        if self.count_prompt_tokens:
+            self.tokens.inc(len(Settings.tokenizer(prompt)), kind="prompt")
+        self.tokens.inc(completion_tokens, kind="completion")
+
+
+tracer = Tracer()
+
+
+class TracingHandler(BaseCallbackHandler):
+    """Record the duration of every llama-index event by type."""
+
+    def __init__(self, tracer: Tracer = tracer) -> None:
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self.tracer = tracer
+        self._starts: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def on_event_start(
+        self,
+        event_type: Any,
+        payload: Optional[Dict[str, Any]] = None,
+        event_id: str = "",
+        parent_id: str = "",
+        **kwargs: Any,
+    ) -> str:
+        with self._lock:
+            self._starts[event_id] = time.perf_counter()
+        return event_id
+
+    def on_event_end(
+        self,
+        event_type: Any,
+        payload: Optional[Dict[str, Any]] = None,
+        event_id: str = "",
+        **kwargs: Any,
+    ) -> None:
+        with self._lock:
+            start = self._starts.pop(event_id, None)
+        if start is not None:
+            # legacy and core llama-index have distinct (same valued) enums
+            event = getattr(event_type, "value", str(event_type))
+            self.tracer.llama_event_seconds.observe(time.perf_counter() - start, event=event)
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(
+        self,
+        trace_id: Optional[str] = None,
+        trace_map: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        pass
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+from src.agentic_rag.llms.batching import CompletionBatcher
+
+
+class GatedSend:
+    """send_batch that blocks until released and records every batch."""
+
+    def __init__(self) -> None:
+        self.batches = []
+        self.release = threading.Event()
+
+    def __call__(self, prompts):
+        self.batches.append(list(prompts))
+        assert self.release.wait(5)
+        return [prompt.upper() for prompt in prompts]
+
+
+def test_identical_prompts_are_sent_once():
+    send = GatedSend()
+    batcher = CompletionBatcher(send, window_ms=50)
+    futures = [batcher.submit(prompt) for prompt in ("a", "b", "a", "a")]
+    send.release.set()
+    assert [future.result(5) for future in futures] == ["A", "B", "A", "A"]
+    assert sorted(prompt for batch in send.batches for prompt in batch) == ["a", "b"]
+    assert batcher.stats()["deduplicated"] == 2
+    assert len({id(future) for future in futures}) == 4
+    batcher.close()
+
+
+def test_cancelling_one_caller_does_not_cancel_the_others():
+    send = GatedSend()
+    batcher = CompletionBatcher(send, window_ms=1)
+    first, second, other = batcher.submit("a"), batcher.submit("a"), batcher.submit("b")
+    assert first.cancel()
+    send.release.set()
+    assert second.result(5) == "A"
+    assert other.result(5) == "B"
+    assert first.cancelled()
+    batcher.close()
+
+
+def test_errors_reach_every_caller():
+    def send(prompts):
+        return prompts[:-1]
+
+    batcher = CompletionBatcher(send, window_ms=20)
+    futures = [batcher.submit("a"), batcher.submit("a"), batcher.submit("b")]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(5)
+    # the failed prompts are no longer in flight
+    assert batcher.submit("a").exception(5) is not None
+    batcher.close()
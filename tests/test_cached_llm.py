@@ -0,0 +1,62 @@
+import asyncio
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.llms.mock import MockLLM
+
+from src.agentic_rag.llms.cache import ResponseCache
+from src.agentic_rag.llms.cached_llm import CachedLLM
+
+
+class CountingLLM(MockLLM):
+    calls: int = 0
+
+    def complete(self, prompt, formatted=False, **kwargs):
+        self.calls += 1
+        return super().complete(prompt, formatted=formatted, **kwargs)
+
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        self.calls += 1
+        return super().stream_complete(prompt, formatted=formatted, **kwargs)
+
+
+def test_complete_is_answered_from_the_cache(tmp_path):
+    llm = CountingLLM()
+    cached = CachedLLM(llm, cache=ResponseCache(str(tmp_path / "cache.sqlite")))
+    first = cached.complete("What is Lasso?")
+    assert cached.complete("What is Lasso?\n").text == first.text
+    assert llm.calls == 1
+    assert cached.stats()["exact_hits"] == 1
+
+
+def test_case_and_indentation_are_part_of_the_key(tmp_path):
+    llm = CountingLLM()
+    cached = CachedLLM(llm, cache=ResponseCache(str(tmp_path / "cache.sqlite")))
+    for prompt in ("df.groupby('a')", "df.Groupby('a')", "if x:\n    f()\ng()", "if x:\n    f()\n    g()"):
+        assert cached.complete(prompt).text == prompt
+    assert llm.calls == 4
+
+
+def test_keyword_arguments_are_part_of_the_key(tmp_path):
+    llm = CountingLLM()
+    cached = CachedLLM(llm, cache=ResponseCache(str(tmp_path / "cache.sqlite")))
+    cached.complete("hi", temperature=0.2)
+    cached.complete("hi", temperature=0.7)
+    cached.complete("hi", temperature=0.2)
+    assert llm.calls == 2
+    # not serializable: never cached
+    cached.complete("hi", callback=print)
+    cached.complete("hi", callback=print)
+    assert llm.calls == 4
+
+
+def test_streamed_chat_is_cached_once_complete(tmp_path):
+    llm = CountingLLM()
+    cached = CachedLLM(llm, cache=ResponseCache(str(tmp_path / "cache.sqlite")))
+    messages = [ChatMessage(role=MessageRole.USER, content="hello there")]
+
+    async def answer():
+        return [response.delta async for response in await cached.astream_chat(messages)]
+
+    deltas = asyncio.run(answer())
+    assert asyncio.run(answer()) == ["".join(deltas)]
+    assert llm.calls == 1
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+from src.agentic_rag.ml_agent.executor import ExecutorPool
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="workers are isolated on Linux")
+
+ESCAPES = """
+import _socket
+results = []
+try:
+    _socket.socket(2, 1).connect(("1.1.1.1", 80))
+    results.append("connected")
+except OSError:
+    results.append("no network")
+try:
+    open("/etc/passwd").read()
+    results.append("read /etc/passwd")
+except OSError:
+    results.append("no /etc")
+with open("scratch.txt", "w") as f:
+    f.write("ok")
+results.append(open("scratch.txt").read())
+results.append(int(np.arange(4).sum()))
+results
+"""
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ExecutorPool(workers=1, preload=(("np", "numpy"),), timeout=20) as pool:
+        yield pool
+
+
+def test_snippet_value_and_output(pool):
+    result = pool.run("print('hi')\n1 + 1")
+    assert result.ok
+    assert (result.stdout, result.value) == ("hi\n", "2")
+
+
+def test_worker_is_isolated(pool):
+    result = pool.run(ESCAPES)
+    assert result.ok, result.error
+    assert result.value == "['no network', 'no /etc', 'ok', 6]"
+
+
+def test_errors_are_reported(pool):
+    result = pool.run("1 / 0")
+    assert not result.ok
+    assert "ZeroDivisionError" in result.error
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="the user is only switched to as root")
+def test_pool_refuses_to_start_without_isolation():
+    with pytest.raises(RuntimeError, match="refusing to start"):
+        ExecutorPool(workers=1, preload=(), user="root")
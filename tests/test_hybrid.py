@@ -0,0 +1,58 @@
+from typing import List
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from llama_index.core.storage.docstore.simple_docstore import SimpleDocumentStore
+
+from src.agentic_rag.retrieval.hybrid import HybridRetriever
+from src.agentic_rag.vector_stores.bm25 import BM25Index
+
+
+class FixedRetriever(BaseRetriever):
+    def __init__(self, nodes: List[TextNode]) -> None:
+        super().__init__()
+        self.nodes = nodes
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return [NodeWithScore(node=node, score=1.0 - i / 10) for i, node in enumerate(self.nodes)]
+
+
+NODES = [
+    TextNode(id_="a", text="Random forests average many decision trees."),
+    TextNode(id_="b", text="The max_depth parameter of GradientBoostingClassifier limits each tree."),
+    TextNode(id_="c", text="Lasso adds an L1 penalty."),
+    TextNode(id_="d", text="GradientBoostingClassifier fits trees to the residuals."),
+]
+
+
+def retriever(dense: List[TextNode], docstore_nodes=NODES, **kwargs) -> HybridRetriever:
+    docstore = SimpleDocumentStore()
+    docstore.add_documents(docstore_nodes)
+    return HybridRetriever(FixedRetriever(dense), BM25Index.build(NODES), docstore, rrf_k=60, **kwargs)
+
+
+def test_nodes_in_both_rankings_come_first():
+    results = retriever([NODES[0], NODES[2], NODES[1]]).retrieve("max_depth GradientBoostingClassifier")
+    ids = [result.node.node_id for result in results]
+    # b: dense rank 3 + sparse rank 1 beats a: dense rank 1 only
+    assert ids[0] == "b"
+    assert set(ids) == {"a", "b", "c", "d"}
+    assert results[0].score == 1 / 63 + 1 / 61
+    assert [result.score for result in results] == sorted((result.score for result in results), reverse=True)
+
+
+def test_sparse_only_nodes_come_from_the_docstore():
+    results = retriever([NODES[0]], sparse_top_k=1).retrieve("residuals")
+    assert {result.node.node_id: result.node.get_content() for result in results} == {
+        "a": NODES[0].text, "d": NODES[3].text,
+    }
+
+
+def test_nodes_missing_from_the_docstore_are_skipped():
+    results = retriever([NODES[0]], docstore_nodes=NODES[:3]).retrieve("residuals")
+    assert [result.node.node_id for result in results] == ["a"]
+
+
+def test_top_k_truncates_the_fused_ranking():
+    results = retriever(NODES, top_k=2).retrieve("trees")
+    assert len(results) == 2
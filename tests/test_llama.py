@@ -0,0 +1,48 @@
+import pytest
+from llama_index.core import Settings
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.callbacks import CallbackManager, CBEventType, LlamaDebugHandler
+
+from src.agentic_rag.llms.llama import HuggingFaceLLM
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    llm = HuggingFaceLLM()
+    monkeypatch.setattr(
+        llm._session, "post", lambda url, json, timeout: FakeResponse({"text": json["text"].upper()})
+    )
+    return llm
+
+
+@pytest.fixture
+def settings():
+    saved = Settings._llm, Settings._callback_manager
+    yield Settings
+    Settings._llm, Settings._callback_manager = saved
+
+
+def test_settings_llm_keeps_the_core_callback_manager(llm, settings):
+    handler = LlamaDebugHandler()
+    settings.callback_manager = CallbackManager([handler])
+    settings.llm = llm
+    assert llm.callback_manager is settings.callback_manager
+    assert llm.complete("hi").text == "HI"
+    assert len(handler.get_event_pairs(CBEventType.LLM)) == 1
+
+
+def test_chat_formats_messages_into_one_prompt(llm):
+    response = llm.chat([ChatMessage(role=MessageRole.USER, content="what is lasso?")])
+    assert response.message.role == MessageRole.ASSISTANT
+    assert "WHAT IS LASSO?" in response.message.content
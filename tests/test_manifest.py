@@ -0,0 +1,49 @@
+import os
+
+from src.agentic_rag.indexer.manifest import Manifest
+
+
+def write(path, text, mtime=None):
+    with open(path, "w") as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_classify_added_updated_unchanged_removed(tmp_path):
+    index = tmp_path / "index"
+    index.mkdir()
+    kept = write(tmp_path / "kept.txt", "same", mtime=1000)
+    touched = write(tmp_path / "touched.txt", "same content", mtime=1000)
+    changed = write(tmp_path / "changed.txt", "old", mtime=1000)
+    gone = write(tmp_path / "gone.txt", "bye", mtime=1000)
+    manifest = Manifest(str(index))
+    for path in (kept, touched, changed, gone):
+        manifest.record(path, [f"{path}_part_0"], ["n1"])
+    manifest.save()
+
+    write(touched, "same content", mtime=2000)
+    write(changed, "new!", mtime=2000)
+    os.remove(gone)
+    new = write(tmp_path / "new.txt", "hello")
+
+    manifest = Manifest(str(index))
+    added, updated, unchanged, removed = manifest.classify([kept, touched, changed, new])
+    assert added == [new]
+    assert updated == [changed]
+    assert unchanged == [kept, touched]
+    assert removed == [gone]
+    # a touched file with the same content only has its mtime refreshed
+    assert manifest.get(touched)["mtime"] == 2000
+    assert manifest.remove(gone)["doc_ids"] == [f"{gone}_part_0"]
+    assert gone not in manifest
+
+
+def test_save_round_trips(tmp_path):
+    path = write(tmp_path / "a.txt", "text")
+    manifest = Manifest(str(tmp_path))
+    manifest.record(path, ["d"], ["n1", "n2"])
+    manifest.save()
+    assert Manifest(str(tmp_path)).get(path)["node_ids"] == ["n1", "n2"]
+    assert len(Manifest(str(tmp_path))) == 1
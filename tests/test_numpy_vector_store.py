@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from src.agentic_rag.vector_stores.ann import IVFIndex
+from src.agentic_rag.vector_stores.numpy_vector_store import NumpyVectorStore
+from src.agentic_rag.vector_stores.storage import get_storage_context
+
+VECTORS = [[1.0, 0.0, 0.0], [0.7, 0.7, 0.1], [0.7, 0.1, 0.7], [0.0, 1.0, 0.0]]
+
+
+def nodes(vectors, start=0):
+    return [TextNode(text="", id_=f"n{i}", embedding=v) for i, v in enumerate(vectors, start)]
+
+
+def persisted(tmp_path, **kwargs):
+    store = NumpyVectorStore(**kwargs)
+    store.add(nodes(VECTORS))
+    store.persist(os.path.join(str(tmp_path), "default__vector_store.json"))
+    return str(tmp_path)
+
+
+def top(store, k=3):
+    result = store.query(VectorStoreQuery(query_embedding=[1.0, 0.0, 0.0], similarity_top_k=k))
+    return result.ids, result.similarities
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_reopened_store_answers_like_the_new_one(tmp_path, dtype):
+    persist_dir = persisted(tmp_path, dtype=dtype)
+    ids, similarities = top(NumpyVectorStore.from_persist_dir(persist_dir))
+    assert ids == ["n0", "n1", "n2"]
+    expected = [v[0] / np.linalg.norm(v) for v in VECTORS[:3]]
+    np.testing.assert_allclose(similarities, expected, atol=0.02)
+
+
+def test_persisted_dtype_is_not_overridden(tmp_path):
+    persist_dir = persisted(tmp_path, dtype="int8", keep_float32=True)
+    with pytest.raises(ValueError, match="int8"):
+        NumpyVectorStore.from_persist_dir(persist_dir, dtype="float32")
+    with pytest.raises(ValueError, match="keeps"):
+        NumpyVectorStore.from_persist_dir(persist_dir, keep_float32=False)
+    store = NumpyVectorStore.from_persist_dir(persist_dir, dtype="int8")
+    assert (store.dtype, store.keep_float32) == ("int8", True)
+
+
+def test_incremental_update_keeps_the_quantized_store_intact(tmp_path):
+    persist_dir = persisted(tmp_path, dtype="int8")
+    # what the indexer does on a later run with --vector-store numpy
+    store = get_storage_context(persist_dir, "numpy").vector_store
+    store.add(nodes([[0.9, 0.1, 0.0]], start=len(VECTORS)))
+    store.persist(os.path.join(persist_dir, "default__vector_store.json"))
+    store = NumpyVectorStore.from_persist_dir(persist_dir)
+    assert store.dtype == "int8"
+    ids, similarities = top(store, k=2)
+    assert ids == ["n0", "n4"]
+    assert similarities[0] == pytest.approx(1.0, abs=0.02)
+
+
+def test_keep_float32_is_moot_for_float32_stores(tmp_path):
+    persist_dir = persisted(tmp_path, keep_float32=True)
+    assert NumpyVectorStore.from_persist_dir(persist_dir, keep_float32=True).dtype == "float32"
+
+
+@pytest.mark.parametrize("argv, expected", [
+    (["--vector-store", "numpy"], {}),
+    (["--dtype", "int8"], {"vector_store": "numpy", "dtype": "int8"}),
+    (["--keep-float32"], {"vector_store": "numpy", "keep_float32": True}),
+])
+def test_indexer_only_passes_the_store_options_asked_for(monkeypatch, tmp_path, argv, expected):
+    from llama_index.core.embeddings import MockEmbedding
+
+    from src.agentic_rag.indexer import indexer
+
+    calls = []
+    monkeypatch.setattr(indexer, "get_embed_model", lambda persist_dir: MockEmbedding(embed_dim=3))
+    monkeypatch.setattr(indexer, "build_index", lambda *args, **kwargs: calls.append(kwargs) or {
+        "skipped": 0, "added": 0, "updated": 0, "removed": 0,
+    })
+    indexer.main(["--root", str(tmp_path), "--persist-dir", str(tmp_path)] + argv)
+    options = {name: calls[0][name] for name in ("vector_store", "dtype", "keep_float32") if name in calls[0]}
+    assert options == {"vector_store": "numpy", **expected}
+
+
+def test_ivf_index_of_an_empty_matrix_finds_nothing():
+    index = IVFIndex.build(np.zeros((0, 3), dtype=np.float32))
+    rows, scores = index.search(np.zeros((0, 3), dtype=np.float32), np.ones(3, dtype=np.float32), 5)
+    assert len(rows) == len(scores) == 0
+
+
+def test_ivf_nlist_is_clamped_to_the_rows():
+    vectors = np.eye(3, dtype=np.float32)
+    index = IVFIndex.build(vectors, nlist=10)
+    assert len(index.centroids) == 3
+    assert index.search(vectors, vectors[1], 1)[0].tolist() == [1]
+
+
+def test_ann_is_not_built_over_an_empty_store(tmp_path):
+    store = NumpyVectorStore()
+    store.persist(os.path.join(str(tmp_path), "default__vector_store.json"))
+    store = NumpyVectorStore.from_persist_dir(str(tmp_path))
+    store.build_ann("ivf")
+    assert not store.ann_exists("ivf")
+    assert top(store) == ([], [])
+
+
+def test_ivf_search_matches_exact_search(tmp_path):
+    persist_dir = persisted(tmp_path)
+    store = NumpyVectorStore.from_persist_dir(persist_dir)
+    store.build_ann("ivf", nlist=2)
+    exact = top(NumpyVectorStore.from_persist_dir(persist_dir))
+    approximate = top(NumpyVectorStore.from_persist_dir(persist_dir, ann="ivf", nprobe=2))
+    assert approximate[0] == exact[0]
@@ -0,0 +1,66 @@
+import pytest
+
+from src.agentic_rag.llms import cache as cache_module
+from src.agentic_rag.llms.cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_exact_hit_and_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    key = ResponseCache.make_key("What is Lasso?")
+    assert cache.get(key) == (None, None)
+    cache.put(key, {"text": "L1"})
+    assert cache.get(ResponseCache.make_key("What is Lasso?")) == ({"text": "L1"}, "exact")
+    assert cache.stats()["exact_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl_seconds=60)
+    cache.put("k", {"text": "a"}, embedding=[1.0, 0.0], source_ids=["n1"])
+    clock[0] += 59
+    assert cache.get("k")[1] == "exact"
+    clock[0] += 2
+    assert cache.get("k") == (None, None)
+    assert cache.get("other", embedding=[1.0, 0.0], source_ids=["n1"]) == (None, None)
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_semantic_hit_needs_threshold_and_same_sources(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), similarity_threshold=0.95)
+    cache.put("k", {"text": "a"}, embedding=[1.0, 0.0], source_ids=["n1", "n2"])
+    # cosine 0.995, same sources in another order
+    assert cache.get("q1", embedding=[1.0, 0.1], source_ids=["n2", "n1"]) == ({"text": "a"}, "semantic")
+    # cosine 0.89: below the threshold
+    assert cache.get("q2", embedding=[1.0, 0.5], source_ids=["n1", "n2"]) == (None, None)
+    # same question, answered from other nodes
+    assert cache.get("q3", embedding=[1.0, 0.0], source_ids=["n3"]) == (None, None)
+
+
+def test_semantic_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    cache.put("k", {"text": "a"}, embedding=[0.0, 2.0], source_ids=["n1"])
+    cache.close()
+    assert ResponseCache(path).get("q", embedding=[0.0, 1.0], source_ids=["n1"])[1] == "semantic"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=10)
+    for i in range(10):
+        clock[0] += 1
+        cache.put(f"k{i}", {"i": i})
+    clock[0] += 1
+    cache.get("k0")
+    clock[0] += 1
+    cache.put("k10", {"i": 10})
+    assert cache.stats()["entries"] == 9
+    assert cache.get("k0")[1] == "exact"
+    assert cache.get("k1") == (None, None)
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, CompletionResponse, MessageRole
+
+from src.agentic_rag.memory.sessions import SUMMARY_PREFIX, SessionStore
+from src.agentic_rag.ml_agent.prompt import ROUTER_PROMPT
+from src.agentic_rag.ml_agent.router import Router
+
+
+class GatedLLM:
+    """Summarizer that blocks until released."""
+
+    def __init__(self) -> None:
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.prompts = []
+
+    def complete(self, prompt):
+        self.prompts.append(prompt)
+        self.started.set()
+        assert self.release.wait(5)
+        return f"summary {len(self.prompts)}"
+
+
+def store(path, llm, **kwargs):
+    return SessionStore(path, token_limit=20, keep_recent_tokens=5, llm=llm,
+                        tokenizer=str.split, **kwargs)
+
+
+def user(text):
+    return ChatMessage(role=MessageRole.USER, content=text)
+
+
+def test_older_turns_are_folded_into_the_summary(tmp_path):
+    llm = GatedLLM()
+    sessions = store(str(tmp_path / "sessions.sqlite"), llm)
+    for i in range(5):
+        sessions.append("s", user(f"turn {i} with four words"))
+    assert llm.started.wait(5)
+    # requests do not wait for the summary
+    sessions.append("s", user("turn 5 with four words"))
+    llm.release.set()
+    sessions.wait()
+    assert [m.content for m in sessions.messages("s")] == [
+        SUMMARY_PREFIX + "summary 1", "turn 4 with four words", "turn 5 with four words",
+    ]
+    assert "turn 3 with four words" in llm.prompts[0]
+    assert "turn 4 with four words" not in llm.prompts[0]
+    # persisted: a new store sees the same history
+    assert [m.content for m in store(str(tmp_path / "sessions.sqlite"), llm).messages("s")] == [
+        SUMMARY_PREFIX + "summary 1", "turn 4 with four words", "turn 5 with four words",
+    ]
+
+
+def test_history_drops_oldest_turns_to_fit():
+    sessions = store(":memory:", GatedLLM(), summarize_after_tokens=1000)
+    for i in range(6):
+        sessions.append("s", user(f"turn {i} with four words"))
+    assert [m.content for m in sessions.history("s", token_limit=10)] == [
+        "turn 4 with four words", "turn 5 with four words",
+    ]
+
+
+def test_clear_during_summarization_drops_the_summary(tmp_path):
+    llm = GatedLLM()
+    path = str(tmp_path / "sessions.sqlite")
+    sessions = store(path, llm)
+    for i in range(5):
+        sessions.append("s", user(f"old {i} with four words"))
+    assert llm.started.wait(5)
+    sessions.clear("s")
+    sessions.append("s", user("new 0"))
+    sessions.append("s", user("new 1"))
+    llm.release.set()
+    sessions.wait()
+    expected = ["new 0", "new 1"]
+    assert [m.content for m in sessions.messages("s")] == expected
+    assert [m.content for m in store(path, llm).messages("s")] == expected
+
+
+class TutorLLM:
+    """Routes everything to ``code``, answers with the question it got and
+    condenses follow-ups to a fixed question."""
+
+    def __init__(self, condensed: str = "How do I fit a random forest?") -> None:
+        self.condensed = condensed
+        self.condense_prompts = []
+        self.questions = []
+
+    async def acomplete(self, prompt):
+        self.condense_prompts.append(prompt)
+        return CompletionResponse(text=self.condensed)
+
+    async def achat(self, messages):
+        if messages[0].content == ROUTER_PROMPT[0]["content"]:
+            return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content='{"name": "code"}'))
+        self.questions.append(messages[-1].content)
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content="answer"))
+
+    async def astream_chat(self, messages):
+        self.questions.append(messages[-1].content)
+
+        async def gen():
+            for delta in ("ans", "wer"):
+                yield ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=""), delta=delta)
+
+        return gen()
+
+
+def test_router_condenses_follow_ups_with_the_session_history():
+    llm = TutorLLM()
+    sessions = SessionStore(":memory:", tokenizer=str.split)
+    router = Router(llm, session_store=sessions)
+    # the first message of a session has no history to condense
+    assert asyncio.run(router.arun("How do I fit a random forest?", session_id="s"))["answer"] == "answer"
+    assert llm.condense_prompts == []
+    asyncio.run(router.arun("and with sklearn?", session_id="s"))
+    assert "How do I fit a random forest?" in llm.condense_prompts[0]
+    assert "and with sklearn?" in llm.condense_prompts[0]
+    assert "How do I fit a random forest?" in llm.questions[-1]
+    assert [(m.role, m.content) for m in sessions.messages("s")] == [
+        (MessageRole.USER, "How do I fit a random forest?"), (MessageRole.ASSISTANT, "answer"),
+        (MessageRole.USER, "and with sklearn?"), (MessageRole.ASSISTANT, "answer"),
+    ]
+    # other sessions and messages without a session are independent
+    asyncio.run(router.arun("and with sklearn?"))
+    asyncio.run(router.arun("and with sklearn?", session_id="t"))
+    assert len(llm.condense_prompts) == 1
+    assert sessions.messages("t")[0].content == "and with sklearn?"
+    sessions.close()
+
+
+def test_only_complete_streamed_answers_are_recorded():
+    llm = TutorLLM()
+    sessions = SessionStore(":memory:", tokenizer=str.split)
+    router = Router(llm, session_store=sessions)
+
+    async def consume(events=None):
+        stream = router.astream("What is a random forest?", session_id="s")
+        seen = []
+        async for event in stream:
+            seen.append(event)
+            if len(seen) == events:
+                await stream.aclose()
+                break
+        return seen
+
+    asyncio.run(consume(events=2))
+    assert sessions.messages("s") == []
+    assert asyncio.run(consume())[1:] == [("delta", "ans"), ("delta", "wer")]
+    assert [m.content for m in sessions.messages("s")] == ["What is a random forest?", "answer"]
+    sessions.close()